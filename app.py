@@ -1,28 +1,32 @@
 # -*- coding: utf-8 -*-
 
-import yfinance as yf
-import numpy as np
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-import openai
-from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, LSTM, Input
-from flask import Flask, jsonify
-from pyngrok import ngrok
-from fredapi import Fred
+from flask import Flask, jsonify, request, Response, stream_with_context
 import logging
 import os
+import json
+from datetime import date
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
-from alpha_vantage.timeseries import TimeSeries
-from alpha_vantage.fundamentaldata import FundamentalData
-from fredapi import Fred
-import praw
-import tensorflow as tf
-
-# Sichere Nutzung der API-Keys über Environment Variables
-openai.api_key = os.environ.get('OPENAI_API_KEY')
+from forecasting import get_data_through, forecast_prepared
+from jobs import analyse_jobs, JobQueueFull
+from cache import ttl_cache, cache_stats
+from response_cache import response_cache, mark_degraded
+from price_store import price_store, slice_period, ALPHA_COLUMNS
+from indicators import indicator_store, MA_WINDOWS
+import llm
+from services import services
+from http_client import http_client, RateLimitExceeded
+from scheduler import scheduler, load_watchlist, SCHEDULER_ENABLED
+from macro_store import macro_store
+import training_pool
+from training_pool import TrainingPoolFull
+from forecasters import get_forecaster
+from metrics import metrics
+import reddit_ingest
+import news_sentiment
+import screener
+import portfolio
+
+# Sichere Nutzung der API-Keys über Environment Variables (OPENAI_API_KEY liest llm.py)
 ALPHA_API_KEY = os.environ.get('ALPHA_API_KEY')
 FRED_API_KEY = os.environ.get('FRED_API_KEY')
 FINNHUB_API_KEY = os.environ.get('FINNHUB_API_KEY')
@@ -31,13 +35,11 @@ API_KEY = os.getenv('API_KEY')
 if API_KEY is None:
     raise ValueError("API_KEY ist nicht gesetzt! Bitte Umgebungsvariable prüfen.")
 
-fred = Fred(api_key=FRED_API_KEY)
+# API-Clients (FRED, Reddit, CoinGecko, Alpha Vantage) werden erst bei Bedarf erzeugt, siehe services.py
 
-reddit = praw.Reddit(
-    client_id=os.environ.get('REDDIT_CLIENT_ID'),
-    client_secret=os.environ.get('REDDIT_SECRET'),
-    user_agent=os.environ.get('REDDIT_USER_AGENT')
-)
+# Bei "python app.py" importieren die Spawn-Worker des Trainings-Pools dieses Skript erneut als __mp_main__.
+# Sie rechnen nur training_pool-Aufträge, daher dort keine Executoren und keinen Scheduler aufbauen.
+POOL_WORKER_IMPORT = __name__ == '__mp_main__'
 
 logging.basicConfig(
     filename='analyse_logs.log',
@@ -45,28 +47,33 @@ logging.basicConfig(
     format='%(asctime)s:%(levelname)s:%(message)s'
 )
 
-from pycoingecko import CoinGeckoAPI
-cg = CoinGeckoAPI()
+# Cache-Lebensdauer je Datenquelle in Sekunden (bestimmt die Aktualität der einzelnen Felder)
+CACHE_TTL = {
+    "yahoo_info": 3600,               # KGV, Marktkapitalisierung, Branche, ESG-Score, Dividende Yahoo
+    "dividende": 24 * 3600,           # Alpha Vantage, Finnhub
+    "gpt_dividende": 24 * 3600,
+    "gpt_branche": 7 * 24 * 3600,
+    "rating": 24 * 3600
+}
 
+@metrics.timed()
 def get_crypto_data(ticker, days=365):  # Maximal 1 Jahr Datenhistorie erlaubt
-    coin_data = cg.get_coin_market_chart_by_id(id=ticker, vs_currency='usd', days=days)
-    prices = [price[1] for price in coin_data['prices']]
-    return prices
-
-from alpha_vantage.timeseries import TimeSeries
-import pandas as pd
+    bars = price_store.bars('coingecko', ticker)
+    return slice_period(bars, f"{days}d")[:, 4].tolist()
 
 def get_alpha_vantage_data(ticker):
-    ts = TimeSeries(key=API_KEY, output_format='pandas')
-    data, meta_data = ts.get_daily(symbol=ticker, outputsize='full')
+    # Aus dem lokalen Kursspeicher, im Originalformat von Alpha Vantage (neueste Zeile zuerst)
+    data = price_store.frame('alpha_vantage', ticker, api_key=API_KEY)
+    data = data.rename(columns={v: k for k, v in ALPHA_COLUMNS.items()}).iloc[::-1]
+    data.index.name = 'date'
     return data
 
-from alpha_vantage.fundamentaldata import FundamentalData
-
+@ttl_cache('dividend_alpha_vantage', CACHE_TTL["dividende"])
 def get_alpha_vantage_dividend(ticker):
-    fd = FundamentalData(key=API_KEY, output_format='json')
     try:
-        overview, _ = fd.get_company_overview(symbol=ticker)
+        http_client.acquire('alpha_vantage')
+        with metrics.span('upstream', provider='alpha_vantage'):
+            overview, _ = services.fundamental_data.get_company_overview(symbol=ticker)
         dividend_yield = overview.get("DividendYield")
         if dividend_yield:
             return float(dividend_yield) * 100  # Prozent
@@ -75,40 +82,31 @@ def get_alpha_vantage_dividend(ticker):
     except Exception as e:
         return f"Fehler: {e}"
 
+@metrics.timed()
 def get_stock_data(ticker, period="5y"):
-    df = yf.download(ticker, period=period, auto_adjust=True)
+    # Technische Indikatoren (MA50/MA100/MA200, RSI) werden inkrementell über die
+    # gespeicherte Historie fortgeschrieben, siehe indicators.py
+    df = indicator_store.frame('yahoo', ticker, period)
     if df.empty:
         print("⚠️ Keine Daten gefunden!")
         return df
 
-    # Technische Indikatoren
-    df['MA50'] = df['Close'].rolling(window=50).mean()
-    df['MA100'] = df['Close'].rolling(window=100).mean()
-    df['MA200'] = df['Close'].rolling(window=200).mean()
-
-    # RSI Berechnung
-    delta = df['Close'].diff(1)
-    up = delta.clip(lower=0)
-    down = -1 * delta.clip(upper=0)
-    ema_up = up.ewm(com=13, adjust=False).mean()
-    ema_down = down.ewm(com=13, adjust=False).mean()
-    rs = ema_up / ema_down
-    df['RSI'] = 100 - (100 / (1 + rs))
-
+    # Gleiche Zeilen wie früher mit yf.download(period): dort fehlte MA200 in den ersten 199 Tagen des Zeitraums
+    df = df.iloc[max(MA_WINDOWS) - 1:]
     df.dropna(inplace=True)
     return df
 
+@metrics.timed()
 def get_etf_data(ticker, period='3y'):
-    df = yf.download(ticker, period=period, auto_adjust=True)
+    df = price_store.frame('yahoo', ticker, period)
     df.reset_index(inplace=True)
     return df
 
-import requests
-
+@ttl_cache('dividend_finnhub', CACHE_TTL["dividende"])
 def get_dividend_finnhub(ticker):
     url = f'https://finnhub.io/api/v1/stock/metric?symbol={ticker}&metric=all&token={FINNHUB_API_KEY}'
 
-    response = requests.get(url)
+    response = http_client.get('finnhub', url)
     data = response.json()
 
     try:
@@ -120,94 +118,145 @@ def get_dividend_finnhub(ticker):
     except (KeyError, TypeError):
         return "N/A"
 
-from alpha_vantage.timeseries import TimeSeries
-
+@metrics.timed()
 def get_bond_data(symbol, outputsize='full'):
-    ts = TimeSeries(key=ALPHA_API_KEY, output_format='pandas')
-    data, _ = ts.get_daily(symbol=symbol, outputsize=outputsize)
+    data = price_store.frame('alpha_vantage', symbol, api_key=ALPHA_API_KEY)
+    if outputsize == 'compact':
+        data = data.tail(100)
     data.reset_index(inplace=True)
-    data.rename(columns={
-        'date': 'Date',
-        '1. open': 'Open',
-        '2. high': 'High',
-        '3. low': 'Low',
-        '4. close': 'Close',
-        '5. volume': 'Volume'
-    }, inplace=True)
     return data
 
-import functools
-import logging
 import time
-import yfinance as yf
-
-@functools.lru_cache(maxsize=100)
-def get_fundamentals(ticker, full_name):
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait, FIRST_COMPLETED
+
+YAHOO_RATE_LIMIT_PAUSE = float(os.environ.get('YAHOO_RATE_LIMIT_PAUSE', '10'))
+FUNDAMENTALS_CALL_TIMEOUT = float(os.environ.get('FUNDAMENTALS_CALL_TIMEOUT', '20'))  # Sekunden je Upstream-Aufruf
+fundamentals_executor = None if POOL_WORKER_IMPORT else ThreadPoolExecutor(
+    max_workers=int(os.environ.get('FUNDAMENTALS_WORKERS', '16')), thread_name_prefix='fundamentals')
+
+@ttl_cache('yahoo_info', CACHE_TTL["yahoo_info"])
+def get_yahoo_info(ticker):
+    import yfinance as yf
     stock = yf.Ticker(ticker)
 
-    info = {}
+    # Kein Warten im Worker: bei erschöpftem Kontingent leer zurück (wird nicht gecacht)
     try:
-        info = stock.info
+        http_client.acquire('yahoo')
+        with metrics.span('upstream', provider='yahoo'):
+            return stock.info
+    except RateLimitExceeded as e:
+        logging.warning(f"Yahoo-Abfrage für {ticker} übersprungen: {str(e)}")
+        return {}
     except yf.YFRateLimitError:
-        logging.warning(f"Rate Limit erreicht für {ticker}, warte 10 Sekunden und versuche erneut...")
-        time.sleep(10)
-        try:
-            info = stock.info
-        except Exception as e:
-            logging.error(f"Erneuter Fehler bei Yahoo-Abfrage für {ticker}: {str(e)}")
-            info = {}
+        logging.warning(f"Rate Limit erreicht für {ticker}, Yahoo-Abfragen pausieren {YAHOO_RATE_LIMIT_PAUSE} Sekunden")
+        metrics.count('upstream_rate_limited_total', provider='yahoo', reason='429')
+        http_client.penalize('yahoo', YAHOO_RATE_LIMIT_PAUSE)
+        return {}
     except Exception as e:
         logging.error(f"Allgemeiner Fehler bei Yahoo-Abfrage für {ticker}: {str(e)}")
-        info = {}
-
-    yahoo_dividend = info.get("dividendYield", 0) * 100 if info.get("dividendYield") else "N/A"
-
-    try:
-        alpha_dividend = get_alpha_vantage_dividend(ticker)
-    except Exception as e:
-        logging.error(f"Fehler Alpha Vantage Dividend {ticker}: {str(e)}")
-        alpha_dividend = "N/A"
-
-    try:
-        finnhub_dividend = get_dividend_finnhub(ticker)
-    except Exception as e:
-        logging.error(f"Fehler Finnhub Dividend {ticker}: {str(e)}")
-        finnhub_dividend = "N/A"
-
-    # GPT-Validierung
-    try:
-        dividend_validation = validate_dividend_extended(yahoo_dividend, alpha_dividend, finnhub_dividend)
-    except Exception as e:
-        logging.error(f"Fehler bei GPT-Dividendenvalidierung {ticker}: {str(e)}")
-        dividend_validation = f"GPT-Validierung Fehler: {str(e)}"
-
-    fundamentals = {
-        "KGV": info.get("trailingPE", "N/A"),
-        "Dividendenrendite (%) Yahoo": yahoo_dividend,
-        "Dividendenrendite (%) Alpha": alpha_dividend,
-        "Dividendenrendite (%) Finnhub": finnhub_dividend,
-        "Dividenden-Validierung (GPT)": dividend_validation,
-        "Marktkapitalisierung (Mrd.)": info.get("marketCap", 0) / 1e9 if info.get("marketCap") else "N/A",
-        "Branche (vorläufig)": info.get("industry", "N/A"),
-        "ESG-Score": info.get("esgScore", "N/A")
+        return {}
+
+@ttl_cache('gpt_branche', CACHE_TTL["gpt_branche"])
+def classify_industry_gpt(full_name, industry):
+    gpt_response = llm.chat([
+        {"role": "system", "content": "Klassifiziere präzise Branche und ESG-Relevanz."},
+        {"role": "user", "content": f"Unternehmen: {full_name}, Branche: {industry}"}
+    ], endpoint="classify_industry_gpt")
+    return gpt_response.strip()
+
+def iter_fundamentals(ticker, full_name):
+    # Unabhängige Upstream-Aufrufe parallel starten; abhängige Schritte beginnen, sobald ihre Eingaben da sind.
+    # Liefert (Abschnitt, Felder) in der Reihenfolge, in der die Ergebnisse eintreffen.
+    # Jede Quelle ist einzeln mit eigener Lebensdauer gecacht (CACHE_TTL), Fehler werden nie gecacht.
+    started = time.monotonic()
+    deadlines = {
+        fundamentals_executor.submit(get_yahoo_info, ticker): ("yahoo", started + FUNDAMENTALS_CALL_TIMEOUT),
+        fundamentals_executor.submit(get_alpha_vantage_dividend, ticker): ("alpha", started + FUNDAMENTALS_CALL_TIMEOUT),
+        fundamentals_executor.submit(get_dividend_finnhub, ticker): ("finnhub", started + FUNDAMENTALS_CALL_TIMEOUT)
     }
-
-    # GPT-Klassifizierung der Branche
-    try:
-        gpt_response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "Klassifiziere präzise Branche und ESG-Relevanz."},
-                {"role": "user", "content": f"Unternehmen: {full_name}, Branche: {fundamentals['Branche (vorläufig)']}"}
-            ]
-        )
-        fundamentals["Branche (GPT)"] = gpt_response.choices[0].message.content.strip()
-    except Exception as e:
-        logging.error(f"Fehler GPT Branchen-Klassifizierung {ticker}: {str(e)}")
-        fundamentals["Branche (GPT)"] = f"GPT-Fehler: {str(e)}"
-
+    dividends = {}
+
+    while deadlines:
+        next_deadline = min(deadline for _, deadline in deadlines.values())
+        done, _ = wait(list(deadlines), timeout=max(0.0, next_deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        now = time.monotonic()
+        finished = set(done) | {f for f, (_, deadline) in deadlines.items() if deadline <= now}
+
+        for future in finished:
+            step, _ = deadlines.pop(future)
+            try:
+                if not future.done():
+                    raise FuturesTimeout()
+                value, error = future.result(), None
+            except Exception as e:
+                value, error = None, e
+            timed_out = isinstance(error, FuturesTimeout)
+
+            if step == "yahoo":
+                if timed_out:
+                    logging.error(f"Zeitüberschreitung bei Yahoo-Abfrage für {ticker}")
+                elif error is not None:
+                    logging.error(f"Allgemeiner Fehler bei Yahoo-Abfrage für {ticker}: {str(error)}")
+                info = value or {}
+                dividends["yahoo"] = info.get("dividendYield", 0) * 100 if info.get("dividendYield") else "N/A"
+                industry = info.get("industry", "N/A")
+
+                # GPT-Klassifizierung der Branche braucht nur die Yahoo-Daten
+                deadlines[fundamentals_executor.submit(classify_industry_gpt, full_name, industry)] = \
+                    ("industry", time.monotonic() + FUNDAMENTALS_CALL_TIMEOUT)
+                yield "fundamentals_yahoo", {
+                    "KGV": info.get("trailingPE", "N/A"),
+                    "Dividendenrendite (%) Yahoo": dividends["yahoo"],
+                    "Marktkapitalisierung (Mrd.)": info.get("marketCap", 0) / 1e9 if info.get("marketCap") else "N/A",
+                    "Branche (vorläufig)": industry,
+                    "ESG-Score": info.get("esgScore", "N/A")
+                }
+
+            elif step in ("alpha", "finnhub"):
+                label = "Alpha Vantage" if step == "alpha" else "Finnhub"
+                if timed_out:
+                    logging.error(f"Zeitüberschreitung {label} Dividend {ticker}")
+                    value = "N/A"
+                elif error is not None:
+                    logging.error(f"Fehler {label} Dividend {ticker}: {str(error)}")
+                    value = "N/A"
+                dividends[step] = value
+                yield f"dividende_{step}", {f"Dividendenrendite (%) {'Alpha' if step == 'alpha' else 'Finnhub'}": value}
+
+            elif step == "validation":
+                if timed_out:
+                    logging.error(f"Zeitüberschreitung bei GPT-Dividendenvalidierung {ticker}")
+                    value = "GPT-Validierung Fehler: Zeitüberschreitung"
+                elif error is not None:
+                    logging.error(f"Fehler bei GPT-Dividendenvalidierung {ticker}: {str(error)}")
+                    value = f"GPT-Validierung Fehler: {str(error)}"
+                yield "dividenden_validierung", {"Dividenden-Validierung (GPT)": value}
+
+            elif step == "industry":
+                if timed_out:
+                    logging.error(f"Zeitüberschreitung GPT Branchen-Klassifizierung {ticker}")
+                    value = "GPT-Fehler: Zeitüberschreitung"
+                elif error is not None:
+                    logging.error(f"Fehler GPT Branchen-Klassifizierung {ticker}: {str(error)}")
+                    value = f"GPT-Fehler: {str(error)}"
+                yield "branche_gpt", {"Branche (GPT)": value}
+
+            # GPT-Validierung, sobald alle drei Dividendenquellen vorliegen
+            if step in ("yahoo", "alpha", "finnhub") and len(dividends) == 3:
+                deadlines[fundamentals_executor.submit(validate_dividend_extended, dividends["yahoo"],
+                                                       dividends["alpha"], dividends["finnhub"])] = \
+                    ("validation", time.monotonic() + FUNDAMENTALS_CALL_TIMEOUT)
+
+@metrics.timed()
+def get_fundamentals(ticker, full_name):
+    fundamentals = {}
+    for _, fields in iter_fundamentals(ticker, full_name):
+        fundamentals.update(fields)
     return fundamentals
 
+@ttl_cache('gpt_dividende', CACHE_TTL["gpt_dividende"])
 def validate_dividend_extended(yahoo_div, alpha_div, finnhub_div):
     yahoo_div = yahoo_div if isinstance(yahoo_div, (int, float)) else "N/A"
     alpha_div = alpha_div if isinstance(alpha_div, (int, float)) else "N/A"
@@ -224,15 +273,12 @@ def validate_dividend_extended(yahoo_div, alpha_div, finnhub_div):
     Liefere kurz eine Begründung dazu.
     """
 
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "Du validierst Dividenden gewissenhaft und präzise."},
-            {"role": "user", "content": prompt}
-        ]
-    )
+    response = llm.chat([
+        {"role": "system", "content": "Du validierst Dividenden gewissenhaft und präzise."},
+        {"role": "user", "content": prompt}
+    ], endpoint="validate_dividend_extended")
 
-    validated_response = response.choices[0].message.content.strip()
+    validated_response = response.strip()
 
     if "Keiner" in validated_response or all(div == "N/A" or (isinstance(div, (int, float)) and div > 20.0)
                                              for div in [yahoo_div, alpha_div, finnhub_div]):
@@ -252,163 +298,65 @@ def reduce_etf_data(raw_data):
         "branche": raw_data.get("SectorExposure", [])
     }
 
+@metrics.timed()
 def analyse_sentiment(ticker, full_name):
+    # Schlagzeilen aller Quellen parallel, lokale Lexikon-Bewertung; GPT nur bei uneindeutigem Bild (news_sentiment.py)
     try:
-        sources = ['Yahoo Finance', 'MarketWatch', 'Google News', 'Reuters', 'Finviz', 'Social Media']
-        sentiment_results = {}
-
-        for source in sources:
-            # hier sollte der echte API-Call stehen
-            sentiment_results[source] = "neutral"
-
-        # GPT-Validierung
-        final_sentiment = validate_sentiment_gpt(sentiment_results)
-
-        return {"Final (GPT-Validiert)": final_sentiment, **sentiment_results}
+        return news_sentiment.analyse(ticker, full_name)
 
     except Exception as e:
         logging.error(f"Fehler bei Sentimentanalyse {ticker}: {str(e)}")
         return {
+            'Final': 'nicht verfügbar',
             'Final (GPT-Validiert)': 'nicht verfügbar',
             'Fehler': f"Sentimentdaten nicht verfügbar: {str(e)}"
         }
 
-import openai
-
-def validate_sentiment_gpt(sentiments):
-    prompt = f"""
-    Du erhältst folgende Sentiment-Daten aus verschiedenen Quellen:
-    {sentiments}
-
-    Analysiere diese kurz und entscheide dich für eine finale Sentiment-Einschätzung:
-    positiv, negativ oder neutral.
-
-    Gib nur das finale Sentiment zurück.
-    """
+# Prognose-Backend je Anfrage wählbar (lstm, ridge, ets), siehe forecasters.py.
+# Das LSTM trainiert im Trainings-Pool (training_pool.py), die Prognose selbst läuft hier mit NumPy.
 
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "Du bist ein Sentiment-Analyse-Experte."},
-            {"role": "user", "content": prompt}
-        ]
-    )
-
-    validated_sentiment = response.choices[0].message.content.strip().lower()
-
-    # Sicherstellen, dass die Antwort immer gültig ist
-    if validated_sentiment not in ["positiv", "negativ", "neutral"]:
-        validated_sentiment = "neutral"
-
-    return validated_sentiment
-
-def predict_stock_price(df, days_to_predict=30, prediction_days=60, epochs=50):
+@metrics.timed()
+def predict_stock_price(df, days_to_predict=30, prediction_days=60, epochs=50, asset_type=None, ticker=None,
+                        cancelled=None, model=None):
+    _, forecaster = get_forecaster(model)
     try:
-        data = df['Close'].values.reshape(-1, 1)
-        scaler = MinMaxScaler()
-        scaled_data = scaler.fit_transform(data)
-
-        x_train, y_train = [], []
-
-        for i in range(prediction_days, len(scaled_data)):
-            x_train.append(scaled_data[i-prediction_days:i, 0])
-            y_train.append(scaled_data[i, 0])
-
-        x_train, y_train = np.array(x_train), np.array(y_train)
-        x_train = np.reshape(x_train, (x_train.shape[0], x_train.shape[1], 1))
-
-        model = Sequential()
-        model.add(Input(shape=(x_train.shape[1], 1)))
-        model.add(LSTM(units=50, activation='relu'))
-        model.add(Dense(1))
-        model.compile(optimizer='adam', loss='mean_squared_error')
-
-        model.fit(x_train, y_train, epochs=epochs, batch_size=32, verbose=0)
-
-        # Prognose erstellen
-        last_days = scaled_data[-prediction_days:]
-        prediction_list = []
-
-        for _ in range(days_to_predict):
-            pred_input = last_days[-prediction_days:].reshape(1, prediction_days, 1)
-            pred = model.predict(pred_input, verbose=0)[0, 0]
-            prediction_list.append(pred)
-            last_days = np.append(last_days, pred)
-
-        predicted_prices = scaler.inverse_transform(np.array(prediction_list).reshape(-1, 1))
-        return predicted_prices.flatten().tolist()
+        return forecaster(df['Close'].values, asset_type, ticker, get_data_through(df),
+                          days_to_predict, prediction_days, epochs, cancelled=cancelled)
 
+    except TrainingPoolFull:
+        raise
     except Exception as e:
         logging.error(f"Fehler bei Prognoseberechnung: {str(e)}")
         return ["Prognosedaten nicht verfügbar"]
 
-def predict_crypto_price(prices, days_to_predict=30, prediction_days=60, epochs=50):
-    data = np.array(prices).reshape(-1, 1)
-    scaler = MinMaxScaler()
-    scaled_data = scaler.fit_transform(data)
-
-    x_train, y_train = [], []
-
-    for i in range(prediction_days, len(scaled_data)):
-        x_train.append(scaled_data[i-prediction_days:i, 0])
-        y_train.append(scaled_data[i, 0])
-
-    x_train, y_train = np.array(x_train), np.array(y_train)
-    x_train = np.reshape(x_train, (x_train.shape[0], x_train.shape[1], 1))
-
-    model = Sequential()
-    model.add(Input(shape=(x_train.shape[1], 1)))
-    model.add(LSTM(units=50, activation='relu'))
-    model.add(Dense(1))
-    model.compile(optimizer='adam', loss='mean_squared_error')
-
-    model.fit(x_train, y_train, epochs=epochs, batch_size=32, verbose=0)
-
-    last_days = scaled_data[-prediction_days:]
-    prediction_list = []
-
-    for _ in range(days_to_predict):
-        pred_input = last_days[-prediction_days:].reshape(1, prediction_days, 1)
-        pred = model.predict(pred_input, verbose=0)[0, 0]
-        prediction_list.append(pred)
-        last_days = np.append(last_days, pred)
-
-    predicted_prices = scaler.inverse_transform(np.array(prediction_list).reshape(-1, 1))
-    return predicted_prices.flatten().tolist()
-
-from alpha_vantage.fundamentaldata import FundamentalData
-import openai
-import logging
-
-fd = FundamentalData(key=API_KEY, output_format='json')
+@metrics.timed()
+def predict_crypto_price(prices, days_to_predict=30, prediction_days=60, epochs=50, ticker=None, cancelled=None,
+                         model=None):
+    _, forecaster = get_forecaster(model)
+    return forecaster(prices, 'crypto', ticker, date.today().isoformat(),
+                      days_to_predict, prediction_days, epochs, cancelled=cancelled)
 
+@ttl_cache('rating_alpha_vantage', CACHE_TTL["rating"], fallback="N/A")
 def get_rating_alpha_vantage(ticker):
-    try:
-        data, _ = fd.get_company_overview(symbol=ticker)
-        rating = data.get('CreditRating', 'N/A')
-        return rating
-    except Exception as e:
-        logging.error(f"Fehler Alpha Vantage Rating {ticker}: {str(e)}")
-        return "N/A"
+    http_client.acquire('alpha_vantage')
+    with metrics.span('upstream', provider='alpha_vantage'):
+        data, _ = services.fundamental_data.get_company_overview(symbol=ticker)
+    rating = data.get('CreditRating', 'N/A')
+    return rating
 
 def gpt_rating_fallback(entity):
     prompt = f"Wie lautet das aktuelle Kreditrating (S&P, Moody’s, Fitch) von {entity}? Gib nur die Rating-Stufen an (z.B. AA+, Baa1, BBB)."
 
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "Nenne nur die aktuelle Rating-Stufe ohne weitere Erklärungen."},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    return response.choices[0].message.content.strip()
-
-from alpha_vantage.timeseries import TimeSeries
-import pandas as pd
+    response = llm.chat([
+        {"role": "system", "content": "Nenne nur die aktuelle Rating-Stufe ohne weitere Erklärungen."},
+        {"role": "user", "content": prompt}
+    ], endpoint="gpt_rating_fallback", ttl=24 * 3600)
+    return response.strip()
 
 def get_commodity_data(symbol, interval='daily'):
-    ts = TimeSeries(key=API_KEY, output_format='pandas')
-    data, meta_data = ts.get_daily(symbol=symbol, outputsize='compact')
+    http_client.acquire('alpha_vantage')
+    with metrics.span('upstream', provider='alpha_vantage'):
+        data, meta_data = services.timeseries.get_daily(symbol=symbol, outputsize='compact')
     data.rename(columns={
         '1. open': 'Open',
         '2. high': 'High',
@@ -428,7 +376,6 @@ symbols = {
     "Erdgas": "NG"
 }
 
-import openai
 
 def get_commodity_sentiment(rohstoff, preis_trend):
     prompt = f"""
@@ -438,87 +385,439 @@ def get_commodity_sentiment(rohstoff, preis_trend):
     Fasse die aktuelle Marktentwicklung kurz zusammen und erläutere wichtige Einflüsse auf den Markt in maximal 2-3 Sätzen.
     """
 
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "Du bist ein Rohstoffmarkt-Analyst."},
-            {"role": "user", "content": prompt}
-        ]
-    )
+    response = llm.chat([
+        {"role": "system", "content": "Du bist ein Rohstoffmarkt-Analyst."},
+        {"role": "user", "content": prompt}
+    ], endpoint="get_commodity_sentiment")
 
-    return response.choices[0].message.content.strip()
+    return response.strip()
 
-import praw
-import openai
+def get_reddit_sentiment(subreddit_name, keyword, num_posts=100):
+    # Aus den gespeicherten Einzelbewertungen, siehe reddit_ingest.py
+    result = reddit_ingest.subreddit_sentiment(subreddit_name, keyword, limit=num_posts)
+    return result["sentiment"] or "neutral"
 
-# Reddit API Credentials
+app = Flask(__name__)
 
-def get_reddit_sentiment(subreddit_name, keyword, num_posts=100):
-    subreddit = reddit.subreddit(subreddit_name)
-    posts = subreddit.search(keyword, limit=num_posts)
+# Antwort-Cache: Endpunkt -> (max-age, stale-while-revalidate) in Sekunden
+RESPONSE_CACHE_POLICIES = {
+    "analyse": (15 * 60, 60 * 60),
+    "inflation": (6 * 3600, 24 * 3600),          # Monatsdaten
+    "leitzins": (6 * 3600, 24 * 3600),
+    "makro_overview": (6 * 3600, 24 * 3600),
+    "rating": (24 * 3600, 24 * 3600),
+    "get_rohstoff": (15 * 60, 60 * 60),
+    "rohstoff_sentiment": (60 * 60, 3 * 3600),
+    "politisches_sentiment": (60 * 60, 3 * 3600),
+    "handelskonflikte": (60 * 60, 3 * 3600),
+    "insider_trading": (60 * 60, 3 * 3600),
+    "reddit_sentiment": (30 * 60, 60 * 60)
+}
+# Metriken vor dem Antwort-Cache registrieren, damit auch Cache-Treffer gemessen werden
+metrics.init_app(app)
+response_cache.init_app(app, RESPONSE_CACHE_POLICIES)
 
-    texts = [post.title + " " + post.selftext for post in posts]
+# --- Analyse-Endpunkte ---
 
-    prompt = f"Analysiere das allgemeine Sentiment aus diesen Reddit-Posts zu {keyword}: {texts}"
+def run_analyse(asset_type, ticker, full_name, model=None):
+    fundamentals = {}
+    prognose = []
 
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "system", "content": "Analysiere präzise das Sentiment (positiv, neutral, negativ)."},
-                  {"role": "user", "content": prompt}]
-    )
+    if asset_type.lower() == 'crypto':
+        prices = get_crypto_data(ticker)
+        prognose = predict_crypto_price(prices, ticker=ticker, model=model)
 
-    sentiment = response.choices[0].message.content.strip()
-    return sentiment
+    elif asset_type.lower() == 'etf':
+        data = get_etf_data(ticker)
+        prognose = predict_stock_price(data, asset_type='etf', ticker=ticker, model=model)
 
-from flask import Flask, jsonify
-from pyngrok import ngrok
-import logging
-from fredapi import Fred
-import numpy as np
-import requests
-from bs4 import BeautifulSoup
-import openai
-import praw
-import tweepy
+    elif asset_type.lower() == 'bond':
+        data = get_bond_data(ticker)
+        prognose = predict_stock_price(data, asset_type='bond', ticker=ticker, model=model)
 
-app = Flask(__name__)
+    else:  # Aktien (Standardfall)
+        data = get_stock_data(ticker)
+        fundamentals = get_fundamentals(ticker, full_name)
+        prognose = predict_stock_price(data, asset_type='stock', ticker=ticker, model=model)
 
-# --- Analyse-Endpunkte ---
+    sentiment = analyse_sentiment(ticker, full_name)
+
+    return {
+        "fundamentals": fundamentals,
+        "sentiment": sentiment,
+        "prognose": prognose
+    }
+
+def requested_model():
+    # ?model=lstm|ridge|ets, sonst FORECAST_MODEL; unbekannte Namen -> ValueError
+    model, _ = get_forecaster(request.args.get('model'))
+    return model
 
 @app.route('/analyse/<asset_type>/<ticker>/<full_name>')
 def analyse(asset_type, ticker, full_name):
     try:
-        fundamentals = {}
-        prognose = []
+        model = requested_model()
+    except ValueError as e:
+        return jsonify({"Fehler": str(e)}), 400
 
-        if asset_type.lower() == 'crypto':
-            prices = get_crypto_data(ticker)
-            prognose = predict_crypto_price(prices)
+    try:
+        return jsonify(run_analyse(asset_type, ticker, full_name, model))
 
-        elif asset_type.lower() == 'etf':
-            data = get_etf_data(ticker)
-            prognose = predict_stock_price(data)
+    except TrainingPoolFull as e:
+        logging.error(f"Analyse für {ticker} abgelehnt: {str(e)}")
+        return jsonify({"Fehler": "Prognose-Kapazität ausgelastet, bitte später erneut versuchen"}), 503, \
+            {'Retry-After': '30'}
+    except Exception as e:
+        logging.error(f"Allgemeiner Fehler bei Analyse für {ticker}: {str(e)}")
+        return jsonify({"Fehler": f"Analyse fehlgeschlagen: {str(e)}"}), 500
 
-        elif asset_type.lower() == 'bond':
-            data = get_bond_data(ticker)
-            prognose = predict_stock_price(data)
+# Streaming-Analyse: jeder Abschnitt wird gesendet, sobald er fertig ist (NDJSON oder Server-Sent Events)
 
-        else:  # Aktien (Standardfall)
-            data = get_stock_data(ticker)
-            fundamentals = get_fundamentals(ticker, full_name)
-            prognose = predict_stock_price(data)
+ANALYSE_STREAM_WORKERS = int(os.environ.get('ANALYSE_STREAM_WORKERS', '24'))
+STREAM_PRICE_ROWS = 30
+analyse_stream_executor = None if POOL_WORKER_IMPORT else ThreadPoolExecutor(
+    max_workers=ANALYSE_STREAM_WORKERS, thread_name_prefix='analyse-stream')
 
-        sentiment = analyse_sentiment(ticker, full_name)
+def price_section(data):
+    df = data.tail(STREAM_PRICE_ROWS).reset_index() if 'Date' not in data.columns else data.tail(STREAM_PRICE_ROWS)
+    columns = [c for c in ['Date', 'Open', 'High', 'Low', 'Close', 'Volume'] if c in df.columns]
+    return {"Stand": get_data_through(data), "Kurse": json.loads(df[columns].to_json(orient='records', date_format='iso'))}
 
-        return jsonify({
-            "fundamentals": fundamentals,
-            "sentiment": sentiment,
-            "prognose": prognose
-        })
+def emit_forecast(emit, forecast, *args, **kwargs):
+    # Fehler der Prognose als eigenes "prognose"-Ereignis, die Kurse sind zu diesem Zeitpunkt schon gesendet
+    ticker = kwargs.get('ticker')
+    try:
+        emit("prognose", forecast(*args, **kwargs))
+    except TrainingPoolFull as e:
+        logging.error(f"Prognose {ticker} im Analyse-Stream abgelehnt: {str(e)}")
+        emit("prognose", {"Fehler": "Prognose-Kapazität ausgelastet"})
+    except Exception as e:
+        logging.error(f"Fehler bei Prognoseberechnung im Analyse-Stream für {ticker}: {str(e)}")
+        emit("prognose", {"Fehler": f"prognose nicht verfügbar: {str(e)}"})
+
+def stream_prices_and_forecast(asset_type, ticker, emit, cancelled, model=None):
+    if asset_type == 'crypto':
+        prices = get_crypto_data(ticker)
+        emit("kurse", {"Stand": date.today().isoformat(), "Schlusskurse": prices[-STREAM_PRICE_ROWS:]})
+        if cancelled.is_set():
+            return
+        emit_forecast(emit, predict_crypto_price, prices, ticker=ticker, cancelled=cancelled, model=model)
+        return
+
+    if asset_type == 'etf':
+        data = get_etf_data(ticker)
+    elif asset_type == 'bond':
+        data = get_bond_data(ticker)
+    else:
+        asset_type = 'stock'
+        data = get_stock_data(ticker)
+    emit("kurse", price_section(data))
+
+    if asset_type == 'stock' and not data.empty:
+        latest = data.iloc[-1]
+        emit("indikatoren", {name: float(latest[name]) for name in ['MA50', 'MA100', 'MA200', 'RSI']})
+
+    # Die Prognose ist der langsamste Abschnitt; bei abgebrochener Verbindung nicht mehr rechnen
+    if cancelled.is_set():
+        return
+    emit_forecast(emit, predict_stock_price, data, asset_type=asset_type, ticker=ticker, cancelled=cancelled, model=model)
+
+def stream_fundamentals(ticker, full_name, emit, cancelled):
+    for section, fields in iter_fundamentals(ticker, full_name):
+        emit(section, fields)
+        if cancelled.is_set():
+            return
+
+def run_analyse_stream(asset_type, ticker, full_name, sse=False, model=None):
+    asset_type = asset_type.lower()
+    started = time.monotonic()
+    events = queue.Queue()
+    cancelled = threading.Event()
+
+    def emit(section, data):
+        events.put((section, data))
+
+    def producer(name, fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            logging.error(f"Fehler im Analyse-Stream ({name}) für {ticker}: {str(e)}")
+            events.put((name, {"Fehler": f"{name} nicht verfügbar: {str(e)}"}))
+        finally:
+            events.put(None)
+
+    producers = [("kurse", stream_prices_and_forecast, asset_type, ticker, emit, cancelled, model),
+                 ("sentiment", lambda: emit("sentiment", analyse_sentiment(ticker, full_name)))]
+    if asset_type not in ('crypto', 'etf', 'bond'):
+        producers.append(("fundamentals", stream_fundamentals, ticker, full_name, emit, cancelled))
+    for name, fn, *args in producers:
+        analyse_stream_executor.submit(producer, name, fn, *args)
+
+    def encode(section, data):
+        payload = {"section": section, "t": round(time.monotonic() - started, 3), "data": data}
+        if sse:
+            return f"event: {section}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+        return json.dumps(payload, ensure_ascii=False, default=str) + "\n"
+
+    try:
+        remaining = len(producers)
+        while remaining:
+            item = events.get()
+            if item is None:
+                remaining -= 1
+                continue
+            yield encode(*item)
+        yield encode("fertig", {"asset_type": asset_type, "ticker": ticker, "model": model})
+    finally:
+        # Client hat die Verbindung getrennt (oder alles ist gesendet): laufende Erzeuger stoppen früh
+        cancelled.set()
+
+@app.route('/analyse/stream/<asset_type>/<ticker>/<full_name>')
+def analyse_stream(asset_type, ticker, full_name):
+    try:
+        model = requested_model()
+    except ValueError as e:
+        return jsonify({"Fehler": str(e)}), 400
+
+    sse = request.args.get('format') == 'sse' or \
+        request.accept_mimetypes.best_match(['application/x-ndjson', 'text/event-stream']) == 'text/event-stream'
+    mimetype = 'text/event-stream' if sse else 'application/x-ndjson'
+    return Response(stream_with_context(run_analyse_stream(asset_type, ticker, full_name, sse, model)), mimetype=mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Batch-Analyse für Watchlists
+
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', '4'))
+BATCH_MAX_ENTRIES = int(os.environ.get('BATCH_MAX_ENTRIES', '500'))
+
+def prepare_batch_entry(asset_type, ticker, full_name, cancelled=None, model=None):
+    # Alles außer der Prognose; das LSTM wird nur vorbereitet und später im Batch gerechnet,
+    # die NumPy-Backends (ridge, ets) rechnen direkt
+    asset_type = asset_type.lower()
+    result = {"asset_type": asset_type, "ticker": ticker, "fundamentals": {}}
+
+    if asset_type == 'crypto':
+        values = get_crypto_data(ticker)
+        data_through = date.today().isoformat()
+    else:
+        if asset_type == 'etf':
+            data = get_etf_data(ticker)
+        elif asset_type == 'bond':
+            data = get_bond_data(ticker)
+        else:
+            data = get_stock_data(ticker)
+            result["fundamentals"] = get_fundamentals(ticker, full_name)
+        values = data['Close'].values
+        data_through = get_data_through(data)
 
+    result["sentiment"] = analyse_sentiment(ticker, full_name)
+
+    model, forecaster = get_forecaster(model)
+    try:
+        if model == 'lstm':
+            prepared = training_pool.prepare(values, asset_type, ticker, data_through, cancelled=cancelled)
+        else:
+            result["prognose"] = forecaster(values, asset_type, ticker, data_through)
+            prepared = None
+    except TrainingPoolFull as e:
+        logging.error(f"Prognose {ticker} abgelehnt: {str(e)}")
+        result["prognose"] = ["Prognose-Kapazität ausgelastet"]
+        prepared = None
     except Exception as e:
-        logging.error(f"Allgemeiner Fehler bei Analyse für {ticker}: {str(e)}")
-        return jsonify({"Fehler": f"Analyse fehlgeschlagen: {str(e)}"}), 500
+        logging.error(f"Fehler bei Prognoseberechnung {ticker}: {str(e)}")
+        result["prognose"] = ["Prognosedaten nicht verfügbar"]
+        prepared = None
+
+    return result, prepared
+
+def run_batch(entries, model=None):
+    # Ein Sammel-Download je Quelle, danach parallele Verarbeitung; fertige Einträge werden
+    # gemeinsam prognostiziert und sofort als NDJSON-Zeile ausgeliefert
+    yahoo = [ticker for asset_type, ticker, _ in entries if asset_type not in ('crypto', 'bond')]
+    coins = [ticker for asset_type, ticker, _ in entries if asset_type == 'crypto']
+    if yahoo:
+        price_store.update_many('yahoo', yahoo)
+    if coins:
+        price_store.update_many('coingecko', coins)
+
+    cancelled = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='analyse-batch')
+    futures = {executor.submit(prepare_batch_entry, *entry, cancelled, model): entry for entry in entries}
+    pending = set(futures)
+
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            ready, prepared = [], []
+
+            for future in done:
+                asset_type, ticker, _ = futures[future]
+                try:
+                    result, prep = future.result()
+                except Exception as e:
+                    logging.error(f"Fehler bei Batch-Analyse für {ticker}: {str(e)}")
+                    yield json.dumps({"asset_type": asset_type, "ticker": ticker,
+                                      "Fehler": f"Analyse fehlgeschlagen: {str(e)}"}, ensure_ascii=False) + "\n"
+                    continue
+                if prep is None:
+                    yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+                else:
+                    ready.append(result)
+                    prepared.append(prep)
+
+            if prepared:
+                try:
+                    prognosen = forecast_prepared(prepared)
+                except Exception as e:
+                    logging.error(f"Fehler bei Batch-Prognose: {str(e)}")
+                    prognosen = [["Prognosedaten nicht verfügbar"]] * len(prepared)
+                for result, prognose in zip(ready, prognosen):
+                    result["prognose"] = prognose
+                    yield json.dumps(result, ensure_ascii=False, default=str) + "\n"
+    finally:
+        # Bei Verbindungsabbruch: wartende Einträge und noch nicht gestartete Trainings verwerfen
+        cancelled.set()
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+@app.route('/analyse/batch', methods=['POST'])
+def analyse_batch():
+    payload = request.get_json(silent=True)
+    raw_entries = payload.get('entries') if isinstance(payload, dict) else payload
+
+    if not isinstance(raw_entries, list) or not raw_entries:
+        return jsonify({"Fehler": "Erwartet eine Liste von Einträgen (asset_type, ticker, full_name)"}), 400
+    if len(raw_entries) > BATCH_MAX_ENTRIES:
+        return jsonify({"Fehler": f"Maximal {BATCH_MAX_ENTRIES} Einträge pro Batch"}), 400
+
+    entries = []
+    for raw in raw_entries:
+        if isinstance(raw, dict):
+            asset_type, ticker, full_name = raw.get('asset_type', 'stock'), raw.get('ticker'), raw.get('full_name')
+        elif isinstance(raw, (list, tuple)) and 2 <= len(raw) <= 3:
+            asset_type, ticker, full_name = (list(raw) + [None])[:3]
+        else:
+            return jsonify({"Fehler": f"Ungültiger Eintrag: {raw}"}), 400
+        if not ticker:
+            return jsonify({"Fehler": f"Eintrag ohne Ticker: {raw}"}), 400
+        if not isinstance(ticker, str) or not isinstance(asset_type, str):
+            return jsonify({"Fehler": f"Ticker und asset_type müssen Strings sein: {raw}"}), 400
+        entries.append((asset_type.lower(), ticker, str(full_name or ticker)))
+
+    try:
+        model, _ = get_forecaster(payload.get('model') if isinstance(payload, dict) else None)
+    except ValueError as e:
+        return jsonify({"Fehler": str(e)}), 400
+
+    entries = list(dict.fromkeys(entries))
+    return Response(stream_with_context(run_batch(entries, model)), mimetype='application/x-ndjson')
+
+# Asynchrone Analyse-Jobs
+
+@app.route('/analyse/jobs', methods=['POST'])
+def analyse_job_submit():
+    payload = request.get_json(silent=True) or {}
+    asset_type = str(payload.get('asset_type', 'stock'))
+    ticker = payload.get('ticker')
+
+    if not ticker:
+        return jsonify({"Fehler": "Feld 'ticker' fehlt"}), 400
+    if not isinstance(ticker, str):
+        return jsonify({"Fehler": "Feld 'ticker' muss ein String sein"}), 400
+    full_name = str(payload.get('full_name') or ticker)
+    try:
+        model, _ = get_forecaster(payload.get('model'))
+    except ValueError as e:
+        return jsonify({"Fehler": str(e)}), 400
+
+    try:
+        job, created = analyse_jobs.submit((asset_type.lower(), ticker.upper(), model),
+                                           run_analyse, asset_type, ticker, full_name, model)
+    except JobQueueFull as e:
+        logging.error(f"Analyse-Job abgelehnt für {ticker}: {str(e)}")
+        return jsonify({"Fehler": "Zu viele offene Analysen, bitte später erneut versuchen"}), 503, {'Retry-After': '30'}
+
+    return jsonify({**job, "coalesced": not created}), 202, {'Location': f"/analyse/jobs/{job['id']}"}
+
+@app.route('/analyse/jobs/<job_id>', methods=['GET'])
+def analyse_job_status(job_id):
+    job = analyse_jobs.get(job_id)
+    if job is None:
+        return jsonify({"Fehler": "Job nicht gefunden oder abgelaufen"}), 404
+    return jsonify(job)
+
+# Screener über gespeicherte Kurse, z. B. /screener?filter=close>ma200 and rsi<30&sort=rsi&limit=20
+# Universum: ?tickers=AAPL,MSFT,... oder ?universe=all (alle gespeicherten Ticker der Quelle), sonst die Watchlist.
+# Lädt nichts nach; fehlende Ticker stehen unter "ohne_daten" und kommen mit dem nächsten Prefetch.
+
+# Alpha Vantage liefert nur Anleihen (get_bond_data); optionaler Watchlist-Schlüssel "bonds"
+SCREENER_WATCHLIST_KEYS = {"yahoo": ("stocks", "etfs"), "alpha_vantage": ("bonds",), "coingecko": ("crypto",)}
+
+@app.route('/screener', methods=['GET'])
+def screener_route():
+    source = request.args.get('source', 'yahoo')
+    if request.args.get('tickers'):
+        tickers = request.args['tickers'].split(',')
+    elif request.args.get('universe') == 'all':
+        tickers = None
+    else:
+        watchlist = load_watchlist()
+        tickers = [ticker for key in SCREENER_WATCHLIST_KEYS.get(source, ())
+                   for ticker, _ in watchlist_entries(watchlist, key)]
+    limit = request.args.get('limit', type=int)
+    try:
+        with metrics.span('screener', source=source):
+            return jsonify(screener.screen(source, tickers, request.args.get('filter'),
+                                           request.args.get('sort'), limit))
+    except ValueError as e:
+        return jsonify({"Fehler": str(e)}), 400
+
+# Portfolio-Risiko: POST {"holdings": [{"asset_type": "stock", "ticker": "AAPL", "weight": 0.6}, ...],
+#                        "period": "3y", "confidence": 0.95, "horizon_days": 1, "simulations": 100000, "seed": 42}
+# Statt weight geht auch value (Marktwert) oder quantity (Stückzahl x letzter Schlusskurs).
+
+def portfolio_prices(holdings):
+    # Gespeicherte Kurse je Quelle, veraltete Reihen nur per Delta nachladen (ein Sammelabruf je Quelle)
+    by_source = {}
+    for asset_type, ticker, _, _ in holdings:
+        by_source.setdefault(portfolio.ASSET_SOURCES[asset_type], []).append(ticker)
+    loaded = {}
+    for source, tickers in by_source.items():
+        fetch_kwargs = {'api_key': ALPHA_API_KEY} if source == 'alpha_vantage' else {}
+        for ticker, bars in price_store.update_many(source, tickers, **fetch_kwargs).items():
+            loaded[(source, ticker)] = bars
+    return [loaded[(portfolio.ASSET_SOURCES[asset_type], ticker)] for asset_type, ticker, _, _ in holdings]
+
+@app.route('/portfolio', methods=['POST'])
+def portfolio_route():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"Fehler": "Erwartet ein JSON-Objekt mit holdings"}), 400
+
+    try:
+        holdings = portfolio.parse_holdings(payload.get('holdings'))
+        options = {
+            "period": str(payload.get('period', '3y')),
+            "confidence": float(payload.get('confidence', 0.95)),
+            "horizon": int(payload.get('horizon_days', 1)),
+            "simulations": int(payload.get('simulations', portfolio.PORTFOLIO_MC_SIMULATIONS)),
+            "seed": int(payload['seed']) if payload.get('seed') is not None else None
+        }
+    except (TypeError, ValueError) as e:
+        return jsonify({"Fehler": f"Ungültige Anfrage: {str(e)}"}), 400
+
+    series = portfolio_prices(holdings)
+    missing = [ticker for (_, ticker, _, _), bars in zip(holdings, series)
+               if isinstance(bars, Exception) or not len(bars)]
+    if missing:
+        return jsonify({"Fehler": f"Keine Kursdaten für {', '.join(missing)}"}), 502
+
+    try:
+        with metrics.span('portfolio'):
+            return jsonify(portfolio.analyse(holdings, series, **options))
+    except ValueError as e:
+        return jsonify({"Fehler": str(e)}), 400
 
 
 # --- OECD Inflation Integration ---
@@ -545,7 +844,7 @@ INFLATION_CONFIG_FRED = {
 def get_oecd_inflation(country_code):
     headers = {'Accept': 'application/json'}
     url = f"https://stats.oecd.org/SDMX-JSON/data/PRICES_CPI/{country_code}.CPALTT01.GY.M/all?lastNObservations=1"
-    response = requests.get(url, headers=headers)
+    response = http_client.get('oecd', url, headers=headers)
     response.raise_for_status()
     data = response.json()
     try:
@@ -558,14 +857,11 @@ def get_oecd_inflation(country_code):
 # GPT-Fallback bei OECD Fehler
 def gpt_inflation_fallback(region):
     prompt = f"Wie hoch ist aktuell die Inflationsrate in {region.capitalize()}? Bitte nenne nur die Zahl in Prozent."
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "Gib nur die Inflationsrate in Prozent zurück."},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    return response.choices[0].message.content.strip()
+    response = llm.chat([
+        {"role": "system", "content": "Gib nur die Inflationsrate in Prozent zurück."},
+        {"role": "user", "content": prompt}
+    ], endpoint="gpt_inflation_fallback", ttl=6 * 3600)
+    return response.strip()
 
 @app.route('/makro/inflation/<region>')
 def inflation(region):
@@ -574,10 +870,10 @@ def inflation(region):
     if region in INFLATION_CONFIG_FRED:
         series_id, display_name = INFLATION_CONFIG_FRED[region]
         try:
-            data = fred.get_series(series_id).dropna()
-            if len(data) < 13:
+            # Vorjahresrate wird beim Einlesen in den Makro-Speicher berechnet
+            inflation_rate = macro_store.latest(series_id, yoy_lag=12)["yoy"]
+            if inflation_rate is None:
                 raise ValueError("Nicht genügend Datenpunkte zur Berechnung")
-            inflation_rate = ((data.iloc[-1] - data.iloc[-13]) / data.iloc[-13]) * 100
 
             return jsonify({
                 "Land": display_name,
@@ -594,6 +890,7 @@ def inflation(region):
         except Exception as e:
             logging.error(f"OECD Fehler ({region}): {str(e)}")
             inflation_rate = gpt_inflation_fallback(region)
+            mark_degraded()  # GPT-Schätzung nicht 6h im Antwort-Cache halten
 
         return jsonify({
             "Land": region.capitalize(),
@@ -619,8 +916,7 @@ def leitzins(region):
     if region in LEITZINS_CONFIG_FRED:
         series_id, display_name = LEITZINS_CONFIG_FRED[region]
         try:
-            data = fred.get_series(series_id).dropna()
-            leitzins = data.iloc[-1]
+            leitzins = macro_store.latest(series_id, yoy_lag=None)["value"]
 
             return jsonify({
                 "Land": display_name,
@@ -636,21 +932,44 @@ def leitzins(region):
         # Region nicht in FRED, direkte GPT-Abfrage
         leitzins = gpt_leitzins_fallback(region)
 
+    mark_degraded()  # GPT-Schätzung nicht 6h im Antwort-Cache halten
+
     return jsonify({
         "Land": region.capitalize(),
         "Leitzins (%)": leitzins
     })
 
+@app.route('/makro/overview')
+def makro_overview():
+    # Alle FRED-Regionen in einer Antwort, direkt aus dem Makro-Speicher
+    def collect(config, yoy_lag, field):
+        result = {}
+        for region, (series_id, display_name) in config.items():
+            try:
+                latest = macro_store.latest(series_id, yoy_lag=yoy_lag)
+                value = latest["yoy"] if yoy_lag else latest["value"]
+                result[region] = {
+                    "Land": display_name,
+                    field: round(value, 2) if value is not None else "N/A",
+                    "Stand": latest["date"]
+                }
+            except Exception as e:
+                logging.error(f"Makro-Übersicht {series_id} fehlgeschlagen: {str(e)}")
+                result[region] = {"Land": display_name, "Fehler": f"FRED Datenfehler: {str(e)}"}
+        return result
+
+    return jsonify({
+        "Inflation": collect(INFLATION_CONFIG_FRED, 12, "Inflationsrate (%)"),
+        "Leitzins": collect(LEITZINS_CONFIG_FRED, None, "Leitzins (%)")
+    })
+
 def gpt_leitzins_fallback(region):
     prompt = f"Wie hoch ist aktuell der Leitzins in {region.capitalize()}? Bitte gib ausschließlich die Zahl in Prozent an."
-    response = openai.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "Gib nur den aktuellen Leitzins in Prozent an, ohne weitere Erklärungen."},
-            {"role": "user", "content": prompt}
-        ]
-    )
-    return response.choices[0].message.content.strip()
+    response = llm.chat([
+        {"role": "system", "content": "Gib nur den aktuellen Leitzins in Prozent an, ohne weitere Erklärungen."},
+        {"role": "user", "content": prompt}
+    ], endpoint="gpt_leitzins_fallback", ttl=6 * 3600)
+    return response.strip()
 
 # Politische Statements
 
@@ -659,15 +978,12 @@ def politisches_sentiment(land, person):
     try:
         prompt = f"Bewerte kurz, ob die aktuellsten Aussagen von {person.capitalize()} in {land.capitalize()} eher positive, negative oder neutrale Auswirkungen auf die Finanzmärkte haben. Gib nur an: 'positiv', 'negativ' oder 'neutral', plus eine kurze Begründung."
 
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "Bewerte präzise und knapp den Einfluss politischer Aussagen auf Finanzmärkte."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        response = llm.chat([
+            {"role": "system", "content": "Bewerte präzise und knapp den Einfluss politischer Aussagen auf Finanzmärkte."},
+            {"role": "user", "content": prompt}
+        ], endpoint="politisches_sentiment")
 
-        sentiment = response.choices[0].message.content.strip()
+        sentiment = response.strip()
 
         return jsonify({
             "Person": person.capitalize(),
@@ -686,15 +1002,12 @@ def handelskonflikte(land1, land2):
     try:
         prompt = f"Bewerte kurz die aktuellen Handelsbeziehungen zwischen {land1.capitalize()} und {land2.capitalize()}. Gib an, ob diese Handelskonflikte oder Zollmaßnahmen eher positiv, negativ oder neutral auf die globalen Märkte wirken könnten. Antworte mit 'positiv', 'negativ' oder 'neutral' sowie einer kurzen Erklärung."
 
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "Du bewertest Handelskonflikte und Zollmaßnahmen präzise und knapp hinsichtlich ihrer Auswirkungen auf globale Finanzmärkte."},
-                {"role": "user", "content": prompt}
-            ]
-        )
+        response = llm.chat([
+            {"role": "system", "content": "Du bewertest Handelskonflikte und Zollmaßnahmen präzise und knapp hinsichtlich ihrer Auswirkungen auf globale Finanzmärkte."},
+            {"role": "user", "content": prompt}
+        ], endpoint="handelskonflikte")
 
-        handels_sentiment = response.choices[0].message.content.strip()
+        handels_sentiment = response.strip()
 
         return jsonify({
             "Land1": land1.capitalize(),
@@ -712,12 +1025,9 @@ def handelskonflikte(land1, land2):
 def rohstoff_sentiment(rohstoff):
     try:  # <-- hier fehlte try
         prompt = f"Wie ist aktuell der Markt für {rohstoff.capitalize()} einzuschätzen? Antworte mit 'steigend', 'fallend' oder 'stabil' plus kurze Begründung."
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "system", "content": "Analysiere präzise den Rohstoffmarkt."},
-                      {"role": "user", "content": prompt}]
-        )
-        markt_sentiment = response.choices[0].message.content.strip()
+        response = llm.chat([{"role": "system", "content": "Analysiere präzise den Rohstoffmarkt."},
+                             {"role": "user", "content": prompt}], endpoint="rohstoff_sentiment")
+        markt_sentiment = response.strip()
         return jsonify({
             "Rohstoff": rohstoff.capitalize(),
             "Marktentwicklung": markt_sentiment
@@ -761,7 +1071,7 @@ def get_rohstoff(commodity):
 def insider_trading(ticker):
     try:
         url = f'https://finnhub.io/api/v1/stock/insider-transactions?symbol={ticker}&token={FINNHUB_API_KEY}'
-        response = requests.get(url)
+        response = http_client.get('finnhub', url)
         data = response.json()
 
         recent_trades = data.get('data', [])[:5]
@@ -772,15 +1082,12 @@ def insider_trading(ticker):
             for trade in recent_trades
         ])
 
-        gpt_response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "Analysiere kurz Insider-Trades hinsichtlich Markt-Signal."},
-                {"role": "user", "content": f"Insider-Trades für {ticker}:\n{summary}\n\nSind diese Trades eher ein positives, negatives oder neutrales Signal?"}
-            ]
-        )
+        gpt_response = llm.chat([
+            {"role": "system", "content": "Analysiere kurz Insider-Trades hinsichtlich Markt-Signal."},
+            {"role": "user", "content": f"Insider-Trades für {ticker}:\n{summary}\n\nSind diese Trades eher ein positives, negatives oder neutrales Signal?"}
+        ], endpoint="insider_trading")
 
-        insider_sentiment = gpt_response.choices[0].message.content.strip()
+        insider_sentiment = gpt_response.strip()
 
         return jsonify({
             "Ticker": ticker,
@@ -788,6 +1095,10 @@ def insider_trading(ticker):
             "Markt-Signal": insider_sentiment
         })
 
+    except RateLimitExceeded as e:
+        logging.warning(f"Insider Trading {ticker}: {str(e)}")
+        return jsonify({"Fehler": f"Insiderdaten vorübergehend nicht verfügbar: {str(e)}"}), 429, \
+            {"Retry-After": str(int(e.retry_after) + 1)}
     except Exception as e:
         logging.error(f"Fehler Insider Trading {ticker}: {str(e)}")
         return jsonify({"Fehler": f"Insiderdaten nicht verfügbar: {str(e)}"}), 500
@@ -805,18 +1116,67 @@ def rating(ticker):
         "Rating": rating_av
     })
 
+# Cache-Statistik
+
+# Prometheus-Endpunkt: eigene Spans/Zähler plus Cache-, LLM- und Trainings-Pool-Statistiken
+
+def cache_collector():
+    stats = cache_stats()
+    return [
+        ("cache_lookups_total", "counter", "Cache-Abfragen je Namespace und Ergebnis",
+         [({"namespace": ns, "outcome": outcome}, c[outcome]) for ns, c in stats.items()
+          for outcome in ("hits", "misses", "errors")]),
+        ("cache_hit_ratio", "gauge", "Trefferquote je Namespace",
+         [({"namespace": ns}, c["hit_ratio"]) for ns, c in stats.items() if c["hit_ratio"] is not None])
+    ]
+
+def llm_collector():
+    stats = llm.gateway.metrics()
+    return [
+        (f"llm_{name}_total", "counter", f"LLM-Gateway: {name} je Endpunkt",
+         [({"endpoint": endpoint}, m[name]) for endpoint, m in stats.items()])
+        for name in ("calls", "cache_hits", "coalesced", "errors", "prompt_tokens", "completion_tokens")
+    ]
+
+def training_collector():
+    stats = training_pool.training_pool.stats()
+    return [
+        ("training_pool_pending", "gauge", "Offene Aufträge im Trainings-Pool", [({}, stats["pending"])]),
+        ("training_pool_jobs_total", "counter", "Trainings-Aufträge nach Ergebnis",
+         [({"outcome": k}, stats[k]) for k in ("submitted", "rejected", "cancelled", "failed", "completed")])
+    ]
+
+metrics.register_collector(cache_collector)
+metrics.register_collector(llm_collector)
+metrics.register_collector(training_collector)
+
+@app.route('/metrics', methods=['GET'])
+def metriken():
+    if not metrics.enabled:
+        return jsonify({"Fehler": "Metriken sind deaktiviert (METRICS_ENABLED=0)"}), 404
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_statistik():
+    return jsonify(cache_stats())
+
+@app.route('/training/stats', methods=['GET'])
+def training_statistik():
+    return jsonify(training_pool.training_pool.stats())
+
+@app.route('/llm/stats', methods=['GET'])
+def llm_statistik():
+    return jsonify(llm.gateway.metrics())
+
 # Reddit Anbindung
-import praw
 
 @app.route('/sentiment/reddit/<string:subreddit_name>/<string:keyword>')
 def reddit_sentiment(subreddit_name, keyword):
     try:
-        subreddit = reddit.subreddit(subreddit_name)
-        posts = subreddit.search(keyword, limit=50)
+        # Beiträge werden dedupliziert gespeichert und einzeln bewertet; nur neue Beiträge kosten LLM-Aufrufe
+        result = reddit_ingest.subreddit_sentiment(subreddit_name, keyword, limit=50)
 
-        texts = [f"{post.title} {post.selftext}" for post in posts]
-
-        if not texts:
+        if not result["beitraege"]:
             return jsonify({
                 "subreddit": subreddit_name,
                 "keyword": keyword,
@@ -824,35 +1184,120 @@ def reddit_sentiment(subreddit_name, keyword):
                 "beispiele": []
             })
 
-        # GPT-Sentimentanalyse
-        prompt = f"""
-        Analysiere das allgemeine Sentiment (positiv, neutral, negativ) der folgenden Reddit-Beiträge zum Thema "{keyword}":
-        {texts}
-
-        Gib prägnant zurück: "positiv", "neutral" oder "negativ" plus kurze Begründung.
-        """
-
-        response = openai.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "Analysiere das Sentiment der Reddit-Beiträge präzise und knapp."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-
-        sentiment = response.choices[0].message.content.strip()
-
         return jsonify({
             "subreddit": subreddit_name,
             "keyword": keyword,
-            "sentiment": sentiment,
-            "beispiele": texts[:5]  # Die ersten 5 Beiträge als Beispiele
+            **result,
+            "sentiment": result["sentiment"] or "Noch keine Bewertung verfügbar."
         })
 
     except Exception as e:
         logging.error(f"Fehler bei Reddit-Sentiment für {subreddit_name}/{keyword}: {str(e)}")
         return jsonify({"Fehler": f"Sentimentanalyse fehlgeschlagen: {str(e)}"}), 500
 
+# --- Hintergrund-Prefetch ---
+# Wärmt vor Handelsbeginn die Caches für die Watchlist (watchlist.json), damit die ersten
+# Anfragen am Morgen nicht auf Upstream-Aufrufe warten. Aktiv mit SCHEDULER_ENABLED=1.
+
+PREFETCH_SCHEDULE = {
+    "kurse": "30 7 * * 1-5",          # Kurse, Indikatoren, ggf. Modelltraining
+    "fundamentaldaten": "0 7 * * 1-5",
+    "makro": "0 6 * * *",             # Inflation und Leitzins (FRED/OECD)
+    "rohstoffe": "45 7 * * 1-5"
+}
+
+def watchlist_entries(watchlist, key):
+    # Einträge als (ticker, full_name); erlaubt sind Strings oder {"ticker": ..., "full_name": ...}
+    entries = []
+    for raw in watchlist.get(key, []):
+        if isinstance(raw, dict):
+            entries.append((raw["ticker"], raw.get("full_name") or raw["ticker"]))
+        else:
+            entries.append((raw, raw))
+    return entries
+
+def wait_for_quota(*providers):
+    # Im Scheduler-Thread warten, bis alle Kontingente ein Token frei haben; False beim Beenden
+    while True:
+        delay = max(http_client.available_in(provider) for provider in providers)
+        if delay <= 0:
+            return True
+        if scheduler.wait(delay):
+            return False
+
+def prefetch_prices():
+    watchlist = load_watchlist()
+    stocks = watchlist_entries(watchlist, "stocks")
+    etfs = watchlist_entries(watchlist, "etfs")
+    coins = watchlist_entries(watchlist, "crypto")
+
+    if stocks or etfs:
+        price_store.update_many('yahoo', [ticker for ticker, _ in stocks + etfs])
+    if coins and wait_for_quota('coingecko'):
+        price_store.update_many('coingecko', [ticker for ticker, _ in coins])
+
+    series = []
+    loaders = [('stock', ticker, get_stock_data) for ticker, _ in stocks] + \
+        [('etf', ticker, get_etf_data) for ticker, _ in etfs]  # get_stock_data schreibt auch die Indikatoren fort
+    for asset_type, ticker, loader in loaders:
+        try:
+            data = loader(ticker)
+            series.append((asset_type, ticker, data['Close'].values, get_data_through(data)))
+        except Exception as e:
+            logging.error(f"Prefetch Kursdaten {ticker} fehlgeschlagen: {str(e)}")
+    for ticker, _ in coins:
+        try:
+            series.append(('crypto', ticker, get_crypto_data(ticker), date.today().isoformat()))
+        except Exception as e:
+            logging.error(f"Prefetch Kursdaten {ticker} fehlgeschlagen: {str(e)}")
+
+    if not watchlist.get("retrain_models", True):
+        return
+    for asset_type, ticker, values, data_through in series:
+        if scheduler.stopping:
+            return
+        try:
+            if training_pool.refresh(values, asset_type, ticker, data_through):
+                logging.info(f"Modell für {ticker} zum Stand {data_through} neu trainiert")
+        except Exception as e:
+            logging.error(f"Modelltraining im Prefetch für {ticker} fehlgeschlagen: {str(e)}")
+
+def prefetch_fundamentals():
+    for ticker, full_name in watchlist_entries(load_watchlist(), "stocks"):
+        if not wait_for_quota('alpha_vantage', 'finnhub', 'yahoo'):
+            return
+        get_fundamentals(ticker, full_name)
+
+def prefetch_macro():
+    watchlist = load_watchlist()
+    macro_store.update_many([series_id for series_id, _ in INFLATION_CONFIG_FRED.values()], yoy_lag=12)
+    macro_store.update_many([series_id for series_id, _ in LEITZINS_CONFIG_FRED.values()], yoy_lag=None)
+    response_cache.warm("/makro/overview")
+    for region in watchlist.get("inflation", []):
+        response_cache.warm(f"/makro/inflation/{region}")
+    for region in watchlist.get("leitzins", []):
+        response_cache.warm(f"/makro/leitzins/{region}")
+
+def prefetch_commodities():
+    for commodity in load_watchlist().get("rohstoffe", []):
+        if not wait_for_quota('alpha_vantage'):
+            return
+        response_cache.warm(f"/rohstoffe/preis/{commodity}")
+
+if not POOL_WORKER_IMPORT:
+    prefetch_schedule = {**PREFETCH_SCHEDULE, **load_watchlist().get("schedule", {})}
+    scheduler.add("kurse", prefetch_schedule["kurse"], prefetch_prices)
+    scheduler.add("fundamentaldaten", prefetch_schedule["fundamentaldaten"], prefetch_fundamentals)
+    scheduler.add("makro", prefetch_schedule["makro"], prefetch_macro)
+    scheduler.add("rohstoffe", prefetch_schedule["rohstoffe"], prefetch_commodities)
+
+@app.route('/scheduler/status', methods=['GET'])
+def scheduler_status():
+    return jsonify(scheduler.status())
+
+if SCHEDULER_ENABLED and not POOL_WORKER_IMPORT:
+    scheduler.start()
+
 # Twitter Anbindung - geht nicht wg free account
 
 @app.route('/twitter/test')
@@ -883,6 +1328,7 @@ def twitter_test():
 # --- Hauptausführung ---
 
 if __name__ == '__main__':
+    from pyngrok import ngrok
     public_url = ngrok.connect(5000).public_url
     print("🔗 ngrok URL:", public_url)
     app.run()
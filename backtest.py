@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+# Walk-Forward-Backtest des LSTM-Prognosemodells auf gespeicherter Kurshistorie (price_store, kein Download).
+# Je Ticker werden --folds Prognosezeitpunkte gewählt, deren Testfenster (--horizon Tage) lückenlos bis
+# zum letzten Balken reichen. Für jeden Zeitpunkt wird nur mit den Kursen davor trainiert, dann wie in
+# predict_stock_price rekursiv prognostiziert und mit den tatsächlichen Kursen verglichen.
+# Warmstart: der erste Fold trainiert mit --epochs von Grund auf, jeder weitere trainiert das Modell des
+# vorigen Folds mit --warm-epochs auf dem erweiterten Fenster weiter (mit dem Skalierer des ersten Folds).
+# Je (Ticker, prediction_days, epochs) läuft ein Auftrag in einem eigenen Prozess (Kern-Budget wie im
+# Trainings-Pool); mehrere Werte für --prediction-days/--epochs ergeben ein Gitter zum Abstimmen.
+# Kennzahlen je Fold: MAE, MAPE, Richtungstreffer (Vorzeichen der Veränderung gegenüber dem letzten
+# bekannten Kurs), MAE der naiven Prognose "letzter Kurs bleibt" und Laufzeit (Training, Prognose, gesamt).
+#
+# Aufruf: python backtest.py [--tickers AAPL,MSFT] [--source yahoo] [--limit 10] [--folds 6] [--horizon 30]
+#         [--prediction-days 30,60] [--epochs 25,50] [--warm-epochs 5] [--train-window 1260]
+#         [--workers 4] [--json ergebnisse.json]
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from price_store import price_store
+from training_pool import _init_worker
+
+BACKTEST_WORKERS = int(os.environ.get('BACKTEST_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+MIN_TRAIN_DAYS = 252  # mindestens ein Jahr Trainingsdaten vor dem ersten Prognosezeitpunkt
+
+
+def fold_origins(length, folds, horizon, prediction_days):
+    # Startindizes der Testfenster, ältester zuerst; das letzte Testfenster endet mit dem letzten Balken
+    origins = [length - horizon * (folds - k) for k in range(folds)]
+    return [origin for origin in origins if origin >= prediction_days + MIN_TRAIN_DAYS]
+
+
+def fold_metrics(predicted, actual, last_close):
+    errors = np.abs(predicted - actual)
+    return {
+        "mae": float(errors.mean()),
+        "mape": float((errors / np.abs(actual)).mean() * 100),
+        "richtung": float((np.sign(predicted - last_close) == np.sign(actual - last_close)).mean()),
+        "mae_naiv": float(np.abs(actual - last_close).mean())
+    }
+
+
+def walk_forward(ticker, closes, prediction_days=60, epochs=50, warm_epochs=5, folds=6, horizon=30,
+                 train_window=1260):
+    # Läuft im Worker-Prozess; Rückgabe: Liste mit einem Eintrag je Fold
+    from sklearn.preprocessing import MinMaxScaler
+    from forecasting import train_lstm_model, extract_lstm_weights, forecast_prepared
+
+    closes = np.asarray(closes, dtype=float)
+    model = scaler = None
+    results = []
+    for fold, origin in enumerate(fold_origins(len(closes), folds, horizon, prediction_days)):
+        started = time.perf_counter()
+        train = closes[max(0, origin - train_window):origin].reshape(-1, 1)
+        if scaler is None:
+            scaler = MinMaxScaler().fit(train)
+        # Warmstart-Folds behalten die Skalierung des ersten Folds, auf der die Gewichte trainiert wurden
+        scaled = scaler.transform(train)
+        fold_epochs = epochs if model is None else warm_epochs
+        model = train_lstm_model(scaled, prediction_days, fold_epochs, model=model)
+        trained = time.perf_counter()
+
+        prepared = {"weights": extract_lstm_weights(model), "scaler": scaler, "window": scaled[-prediction_days:, 0]}
+        predicted = np.asarray(forecast_prepared([prepared], horizon)[0])
+        finished = time.perf_counter()
+
+        results.append({
+            "ticker": ticker,
+            "prediction_days": prediction_days,
+            "epochs": epochs,
+            "fold": fold,
+            "warmstart": fold > 0,
+            "trainings_epochen": fold_epochs,
+            "trainingstage": len(train),
+            **fold_metrics(predicted, closes[origin:origin + horizon], train[-1, 0]),
+            "training_s": round(trained - started, 3),
+            "prognose_s": round(finished - trained, 3),
+            "gesamt_s": round(finished - started, 3)
+        })
+    return results
+
+
+def summarize(records):
+    # Mittelwerte je (prediction_days, epochs), sortiert nach MAPE
+    configs = {}
+    for record in records:
+        configs.setdefault((record["prediction_days"], record["epochs"]), []).append(record)
+
+    rows = []
+    for (prediction_days, epochs), group in configs.items():
+        cold = [r["training_s"] for r in group if not r["warmstart"]]
+        warm = [r["training_s"] for r in group if r["warmstart"]]
+        rows.append({
+            "prediction_days": prediction_days,
+            "epochs": epochs,
+            "folds": len(group),
+            **{key: float(np.mean([r[key] for r in group])) for key in ("mae", "mape", "richtung", "mae_naiv")},
+            "training_kalt_s": float(np.mean(cold)) if cold else None,
+            "training_warm_s": float(np.mean(warm)) if warm else None,
+            "gesamt_s": float(np.sum([r["gesamt_s"] for r in group]))
+        })
+    return sorted(rows, key=lambda row: row["mape"])
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-Forward-Backtest des LSTM-Prognosemodells")
+    parser.add_argument('--tickers', help="Kommagetrennt; ohne Angabe alle gespeicherten Ticker der Quelle")
+    parser.add_argument('--source', default='yahoo')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--folds', type=int, default=6)
+    parser.add_argument('--horizon', type=int, default=30)
+    parser.add_argument('--prediction-days', type=_int_list, default=[60])
+    parser.add_argument('--epochs', type=_int_list, default=[50])
+    parser.add_argument('--warm-epochs', type=int, default=5)
+    parser.add_argument('--train-window', type=int, default=5 * 252)
+    parser.add_argument('--workers', type=int, default=BACKTEST_WORKERS)
+    parser.add_argument('--threads', type=int, default=1, help="TensorFlow/BLAS-Threads je Worker")
+    parser.add_argument('--json', help="Alle Fold-Ergebnisse und die Zusammenfassung als JSON speichern")
+    args = parser.parse_args()
+
+    tickers = args.tickers.split(',') if args.tickers else price_store.tickers(args.source)[:args.limit]
+    histories = {}
+    for ticker in tickers:
+        bars = price_store.load(args.source, ticker)
+        if bars is None or len(bars) < MIN_TRAIN_DAYS + max(args.prediction_days) + args.horizon:
+            print(f"⚠️ {ticker}: zu wenig gespeicherte Historie, übersprungen")
+            continue
+        histories[ticker] = np.array(bars[:, 4])
+    if not histories:
+        print("Keine Ticker mit ausreichender Historie im Kursspeicher")
+        sys.exit(1)
+
+    jobs = [(ticker, prediction_days, epochs) for ticker in histories
+            for prediction_days in args.prediction_days for epochs in args.epochs]
+    print(f"{len(histories)} Ticker, {len(jobs)} Aufträge, {args.folds} Folds à {args.horizon} Tage, "
+          f"{args.workers} Prozesse\n")
+
+    records = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(args.threads,)) as executor:
+        futures = {executor.submit(walk_forward, ticker, histories[ticker], prediction_days, epochs,
+                                   args.warm_epochs, args.folds, args.horizon, args.train_window):
+                   (ticker, prediction_days, epochs) for ticker, prediction_days, epochs in jobs}
+        for future in as_completed(futures):
+            ticker, prediction_days, epochs = futures[future]
+            try:
+                folds = future.result()
+            except Exception as e:
+                print(f"❌ {ticker} (prediction_days={prediction_days}, epochs={epochs}): {str(e)}")
+                continue
+            records.extend(folds)
+            for r in folds:
+                print(f"{ticker:<12}pd={prediction_days:<4}ep={epochs:<4}Fold {r['fold']}  MAE {r['mae']:>9.4f}  "
+                      f"MAPE {r['mape']:>6.2f} %  Richtung {r['richtung']:>5.1%}  "
+                      f"Training {r['training_s']:>6.1f} s  gesamt {r['gesamt_s']:>6.1f} s")
+    wall = time.perf_counter() - started
+
+    summary = summarize(records)
+    print(f"\n{'pred_days':>10}{'epochs':>8}{'Folds':>7}{'MAE':>11}{'MAPE (%)':>10}{'Richtung':>10}"
+          f"{'MAE naiv':>11}{'kalt (s)':>10}{'warm (s)':>10}")
+    for row in summary:
+        cold = f"{row['training_kalt_s']:.1f}" if row['training_kalt_s'] is not None else "-"
+        warm = f"{row['training_warm_s']:.1f}" if row['training_warm_s'] is not None else "-"
+        print(f"{row['prediction_days']:>10}{row['epochs']:>8}{row['folds']:>7}{row['mae']:>11.4f}"
+              f"{row['mape']:>10.2f}{row['richtung']:>10.1%}{row['mae_naiv']:>11.4f}{cold:>10}{warm:>10}")
+    print(f"\nWanduhrzeit gesamt: {wall:.1f} s")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"folds": records, "zusammenfassung": summary, "wanduhr_s": round(wall, 2)}, f, indent=2)
+        print(f"Ergebnisse gespeichert: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+
+# Offline-Lastbenchmark für die Flask-Endpunkte. Alle Anbieter (yfinance, Alpha Vantage, FRED, OECD,
+# Finnhub, CoinGecko, Reddit, OpenAI) werden über benchmarks/replay.py aus lokalen Fixtures bedient,
+# Daten- und Cache-Verzeichnisse liegen in einem temporären Ordner. Je Szenario werden die Anfragen mit
+# --concurrency parallelen Clients abgeschickt; gemessen werden p50/p95/p99, Durchsatz und Peak-RSS.
+#
+# --tickers steuert die Cache-Wärme: wenige Ticker = überwiegend Cache-Treffer,
+# so viele Ticker wie Anfragen = jede Anfrage kalt. Der Antwort-Cache ist standardmäßig aus,
+# damit die eigentliche Verarbeitung gemessen wird (--response-cache schaltet ihn ein).
+# Die Spalte "Upstream" zählt die Aufrufe an die Stellvertreter einschließlich LLM.
+# Mit --save schreibt der Lauf eine Baseline, mit --baseline wird gegen sie verglichen
+# (Exit-Code 1, wenn ein p95 um mehr als --max-regression schlechter ist).
+#
+# Aufruf: python benchmarks/bench_endpoints.py [--concurrency 8] [--requests 100] [--scenarios analyse_stock,insider]
+#         [--tickers 5] [--latency-ms 50] [--llm-latency-ms 300] [--model ridge] [--save baseline.json]
+#         [--baseline baseline.json --max-regression 0.2]
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Szenario -> Pfad-Vorlage; {ticker} und {model} werden je Anfrage eingesetzt
+SCENARIOS = {
+    "analyse_stock": "/analyse/stock/{ticker}/{ticker}?model={model}",
+    "analyse_etf": "/analyse/etf/{ticker}/{ticker}?model={model}",
+    "analyse_bond": "/analyse/bond/{ticker}/{ticker}?model={model}",
+    "analyse_crypto": "/analyse/crypto/{ticker}/{ticker}?model={model}",
+    "makro_inflation_fred": "/makro/inflation/usa",
+    "makro_inflation_oecd": "/makro/inflation/frankreich",
+    "makro_leitzins": "/makro/leitzins/eurozone",
+    "makro_overview": "/makro/overview",
+    "rohstoffe_preis": "/rohstoffe/preis/gold",
+    "rohstoffe_sentiment": "/rohstoffe/sentiment/kupfer",
+    "insider": "/insider/{ticker}",
+    "reddit": "/sentiment/reddit/wallstreetbets/{ticker}"
+}
+
+
+def prepare_environment(workdir, keep_rate_limits):
+    # Muss vor dem Import der Projektmodule laufen, die Pfade und Limits werden beim Import gelesen
+    os.environ.update({
+        'API_KEY': 'benchmark',
+        'LLM_BACKEND': 'fake',
+        'SCHEDULER_ENABLED': '0',
+        'PRICE_STORE_DIR': os.path.join(workdir, 'prices'),
+        'MACRO_STORE_DIR': os.path.join(workdir, 'macro'),
+        'MODEL_REGISTRY_DIR': os.path.join(workdir, 'models'),
+        'CACHE_DB_PATH': os.path.join(workdir, 'cache.sqlite'),
+        'REDDIT_DB_PATH': os.path.join(workdir, 'reddit.sqlite'),
+        'HTTP_CACHE_PATH': os.path.join(workdir, 'http_cache'),
+        'SCHEDULER_LOCK_PATH': os.path.join(workdir, 'scheduler.lock')
+    })
+    if not keep_rate_limits:
+        for name in ('FINNHUB_RATE_PER_MIN', 'ALPHA_RATE_PER_MIN', 'COINGECKO_RATE_PER_MIN', 'YAHOO_RATE_PER_MIN'):
+            os.environ[name] = '1000000'
+
+
+def peak_rss_mib():
+    # ru_maxrss ist unter Linux in KiB; Trainings-Worker zählen als Kindprozesse
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, children / 1024
+
+
+def run_scenario(flask_app, template, args):
+    local = threading.local()
+    tickers = [f"BENCH{i:03d}" for i in range(args.tickers)]
+
+    def request(i):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = flask_app.test_client()
+        path = template.format(ticker=tickers[i % len(tickers)], model=args.model)
+        started = time.perf_counter()
+        response = client.get(path)
+        response.get_data()
+        return time.perf_counter() - started, response.status_code
+
+    for i in range(args.warmup):
+        request(i)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        started = time.perf_counter()
+        results = list(executor.map(request, range(args.warmup, args.warmup + args.requests)))
+        wall = time.perf_counter() - started
+
+    latencies = np.array([seconds for seconds, _ in results])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    own, children = peak_rss_mib()
+    return {
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "rps": round(len(results) / wall, 2),
+        "errors": sum(1 for _, status in results if status >= 400),
+        "peak_rss_mib": round(own, 1),
+        "peak_rss_children_mib": round(children, 1)
+    }
+
+
+def compare(results, baseline, max_regression):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference and result["p95_ms"] > reference["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {reference['p95_ms']:.1f} ms -> {result['p95_ms']:.1f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--tickers', type=int, default=5)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--llm-latency-ms', type=float, default=300)
+    parser.add_argument('--model', default='ridge')
+    parser.add_argument('--keep-rate-limits', action='store_true')
+    parser.add_argument('--response-cache', action='store_true')
+    parser.add_argument('--keep-data', action='store_true')
+    parser.add_argument('--save')
+    parser.add_argument('--baseline')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios.split(',') if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unbekannte Szenarien: {', '.join(unknown)} (verfügbar: {', '.join(SCENARIOS)})")
+
+    workdir = tempfile.mkdtemp(prefix='finanzcoach-bench-')
+    prepare_environment(workdir, args.keep_rate_limits)
+
+    import replay
+    calls = replay.install(latency=args.latency_ms / 1000, llm_latency=args.llm_latency_ms / 1000,
+                           llm_responder=replay.llm_reply)
+    import app
+    if not args.response_cache:
+        app.response_cache.policies.clear()
+    llm_calls = app.llm.gateway.backend.calls
+
+    def upstream_calls():
+        return sum(calls.values()) + len(llm_calls)
+
+    print(f"{args.requests} Anfragen je Szenario, {args.concurrency} parallel, {args.tickers} Ticker, "
+          f"Upstream-Latenz {args.latency_ms:.0f} ms, LLM {args.llm_latency_ms:.0f} ms, Modell {args.model}\n")
+    print(f"{'Szenario':<24}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'req/s':>9}{'Fehler':>8}"
+          f"{'RSS (MiB)':>11}{'Upstream':>10}")
+
+    results = {}
+    try:
+        for name in args.scenarios.split(','):
+            before = upstream_calls()
+            result = run_scenario(app.app, SCENARIOS[name], args)
+            result["upstream_calls"] = upstream_calls() - before
+            results[name] = result
+            print(f"{name:<24}{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}"
+                  f"{result['rps']:>9.1f}{result['errors']:>8}{result['peak_rss_mib']:>11.1f}"
+                  f"{result['upstream_calls']:>10}")
+    finally:
+        app.training_pool.training_pool.shutdown()
+        if not args.keep_data:
+            shutil.rmtree(workdir, ignore_errors=True)
+        else:
+            print(f"\nDaten liegen in {workdir}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline gespeichert: {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print("\n❌ Regressionen (p95):\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print(f"\n✅ Keine p95-Regression über {args.max_regression:.0%}")
+
+
+if __name__ == '__main__':
+    main()
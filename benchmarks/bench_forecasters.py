@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# Vergleich der Prognose-Backends (forecasters.py) auf gespeicherter Kurshistorie:
+# je Ticker werden die letzten --horizon Schlusskurse zurückgehalten, aus dem Rest prognostiziert
+# und MAE, MAPE sowie die Rechenzeit gemessen. Quelle ist der Kursspeicher (data/prices);
+# ist dort nichts abgelegt, werden synthetische Random-Walk-Reihen verwendet.
+# Das LSTM wird ohne Modell-Registry frisch trainiert und nur gerechnet, wenn TensorFlow installiert ist.
+#
+# Aufruf: python benchmarks/bench_forecasters.py [--horizon 30] [--epochs 50] [--limit 10] [--models ridge,ets,lstm]
+
+import os
+import sys
+import time
+import argparse
+import importlib.util
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from forecasting import forecast_series
+from price_store import PriceStore, FETCHERS
+from forecasters import forecast_ridge, forecast_ets
+
+PREDICTION_DAYS = 60
+MIN_HISTORY = 2 * 252
+
+
+def load_histories(store_dir, limit):
+    # Schlusskurse (Spalte 4 der Balken) aus dem Kursspeicher, höchstens limit Reihen.
+    # Über PriceStore statt Dateiglob, damit Indikator- (.ind.npy) und Temp-Dateien nicht mitgelesen werden
+    store = PriceStore(store_dir)
+    histories = {}
+    for source in FETCHERS:
+        for ticker in store.tickers(source):
+            bars = store.load(source, ticker)
+            if bars is None or len(bars) < MIN_HISTORY:
+                continue
+            histories[f"{source}__{ticker}"] = np.array(bars[-MIN_HISTORY * 2:, 4])
+            if len(histories) >= limit:
+                return histories
+    return histories
+
+
+def synthetic_histories(count, length=MIN_HISTORY * 2):
+    rng = np.random.default_rng(42)
+    return {f"synthetisch_{i}": 100 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, size=length)))
+            for i in range(count)}
+
+
+def run_lstm(values, horizon, epochs):
+    return forecast_series(values, days_to_predict=horizon, prediction_days=PREDICTION_DAYS, epochs=epochs)
+
+
+def evaluate(fn, histories, horizon):
+    errors, pct_errors, seconds = [], [], []
+    for values in histories.values():
+        train, actual = values[:-horizon], values[-horizon:]
+        started = time.perf_counter()
+        predicted = np.asarray(fn(train), dtype=np.float64)
+        seconds.append(time.perf_counter() - started)
+        errors.append(np.abs(predicted - actual))
+        pct_errors.append(np.abs(predicted - actual) / np.abs(actual))
+    return {
+        "mae": float(np.mean(errors)),
+        "mape": float(np.mean(pct_errors) * 100),
+        "ms": float(np.median(seconds) * 1000)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--horizon', type=int, default=30)
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--models', default='ridge,ets,lstm')
+    parser.add_argument('--store', default=os.path.join(REPO_DIR, 'data', 'prices'))
+    args = parser.parse_args()
+
+    histories = load_histories(args.store, args.limit)
+    source = args.store
+    if not histories:
+        histories = synthetic_histories(args.limit)
+        source = "synthetische Reihen"
+    print(f"{len(histories)} Reihen aus {source}, Prognosehorizont {args.horizon} Tage\n")
+
+    models = {
+        "ridge": lambda train: forecast_ridge(train, days_to_predict=args.horizon, prediction_days=PREDICTION_DAYS),
+        "ets": lambda train: forecast_ets(train, days_to_predict=args.horizon),
+        "lstm": lambda train: run_lstm(train, args.horizon, args.epochs)
+    }
+
+    print(f"{'Modell':<10}{'MAE':>12}{'MAPE (%)':>12}{'Zeit/Reihe (ms)':>18}")
+    for name in args.models.split(','):
+        if name == 'lstm' and importlib.util.find_spec('tensorflow') is None:
+            print(f"{name:<10}{'übersprungen (TensorFlow nicht installiert)':>42}")
+            continue
+        result = evaluate(models[name], histories, args.horizon)
+        print(f"{name:<10}{result['mae']:>12.4f}{result['mape']:>12.2f}{result['ms']:>18.1f}")
+
+
+if __name__ == '__main__':
+    main()
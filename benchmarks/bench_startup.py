@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+# Startzeit-Benchmark: misst in frischen Interpretern, wie lange "import app" dauert,
+# und prüft, dass dabei keine schweren Pakete (TensorFlow, scikit-learn, praw, ...) geladen werden.
+# Beendet sich mit Exit-Code 1 bei Überschreitung des Schwellwerts oder verbotenen Imports.
+#
+# Aufruf: python benchmarks/bench_startup.py [--runs 5] [--max-seconds 3.0]
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Diese Pakete dürfen erst beim ersten Aufruf des jeweiligen Pfads importiert werden
+LAZY_MODULES = [
+    'tensorflow', 'keras', 'sklearn', 'yfinance', 'praw', 'tweepy',
+    'alpha_vantage', 'pyngrok', 'fredapi', 'pycoingecko', 'openai', 'bs4'
+]
+
+PROBE = """
+import sys, time, json
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def measure():
+    env = dict(os.environ)
+    env.setdefault('API_KEY', 'benchmark')
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=float(os.environ.get('STARTUP_MAX_SECONDS', '3.0')))
+    args = parser.parse_args()
+
+    samples = [measure() for _ in range(args.runs)]
+    seconds = sorted(s["seconds"] for s in samples)
+    loaded = sorted({m for s in samples for m in s["loaded"]})
+
+    print(f"import app: Median {statistics.median(seconds) * 1000:.0f} ms, "
+          f"Min {seconds[0] * 1000:.0f} ms, Max {seconds[-1] * 1000:.0f} ms ({args.runs} Läufe)")
+    print(f"Schwellwert: {args.max_seconds * 1000:.0f} ms")
+
+    failed = False
+    if loaded:
+        print(f"❌ Beim Start geladen, sollte lazy sein: {', '.join(loaded)}")
+        failed = True
+    if statistics.median(seconds) > args.max_seconds:
+        print("❌ Startzeit über dem Schwellwert")
+        failed = True
+    if not failed:
+        print("✅ Startzeit in Ordnung")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
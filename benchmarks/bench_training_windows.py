@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+# Mikro-Benchmark: Aufbau der LSTM-Trainingsfenster per Listen-Schleife (alt)
+# gegen sliding_window_view (forecasting.build_training_windows).
+#
+# Aufruf: python benchmarks/bench_training_windows.py
+
+import timeit
+import tracemalloc
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+PREDICTION_DAYS = 60
+
+SERIES = {
+    "Aktie 5y täglich": 5 * 252,
+    "Krypto 1y täglich": 366,
+}
+
+
+def windows_loop(scaled_data, prediction_days=PREDICTION_DAYS):
+    # Bisherige Variante aus predict_stock_price / predict_crypto_price
+    x_train, y_train = [], []
+    for i in range(prediction_days, len(scaled_data)):
+        x_train.append(scaled_data[i-prediction_days:i, 0])
+        y_train.append(scaled_data[i, 0])
+    x_train, y_train = np.array(x_train), np.array(y_train)
+    x_train = np.reshape(x_train, (x_train.shape[0], x_train.shape[1], 1))
+    return x_train, y_train
+
+
+def windows_view(scaled_data, prediction_days=PREDICTION_DAYS):
+    # Entspricht forecasting.build_training_windows, ohne TensorFlow-Import
+    series = np.asarray(scaled_data, dtype=np.float32).reshape(-1)
+    x_train = sliding_window_view(series[:-1], prediction_days)[..., np.newaxis]
+    y_train = series[prediction_days:]
+    return x_train, y_train
+
+
+def peak_memory(fn, data):
+    tracemalloc.start()
+    result = fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak
+
+
+def main():
+    rng = np.random.default_rng(42)
+    print(f"{'Serie':<20}{'Variante':<10}{'Zeit (ms)':>12}{'Peak-Speicher (KiB)':>22}")
+
+    for name, length in SERIES.items():
+        prices = 100 + np.cumsum(rng.normal(size=length))
+        scaled = ((prices - prices.min()) / (prices.max() - prices.min())).reshape(-1, 1)
+
+        x_loop, y_loop = windows_loop(scaled)
+        x_view, y_view = windows_view(scaled)
+        assert np.allclose(x_loop, x_view, atol=1e-6) and np.allclose(y_loop, y_view, atol=1e-6)
+
+        for label, fn in (("Schleife", windows_loop), ("View", windows_view)):
+            runs = 200
+            seconds = timeit.timeit(lambda: fn(scaled), number=runs) / runs
+            print(f"{name:<20}{label:<10}{seconds * 1000:>12.3f}{peak_memory(fn, scaled) / 1024:>22.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+
+# Lokale Stellvertreter für alle Upstream-Anbieter, damit Benchmarks ohne Netz und reproduzierbar laufen.
+# Antworten kommen aus den Fixtures in benchmarks/fixtures (aufgezeichnete Anbieter-Antworten);
+# Kurs- und FRED-Reihen werden je Ticker/Reihe deterministisch erzeugt, weil sie zu groß zum Einchecken sind.
+# Jeder Aufruf wartet latency Sekunden, um die Netzlatenz nachzubilden.
+#
+# Eingehängt wird über die vorhandenen Erweiterungspunkte:
+#   Finnhub, OECD, News -> Transport-Adapter auf den Sessions von http_client (Retry/Limiter laufen mit)
+#   Kursspeicher        -> price_store.FETCHERS / BULK_FETCHERS
+#   FRED, Alpha Vantage,
+#   CoinGecko, Reddit   -> services.register(...)
+#   OpenAI              -> llm.gateway.use_backend(FakeBackend)
+#   yfinance (Ticker)   -> Ersatzmodul in sys.modules
+# install() muss vor "import app" aufgerufen werden.
+
+import os
+import re
+import sys
+import json
+import time
+import types
+import zlib
+import threading
+from datetime import date
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import BaseAdapter
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Host + Pfad -> Fixture-Datei
+HTTP_FIXTURES = {
+    ('finnhub.io', '/api/v1/stock/metric'): 'finnhub_metric.json',
+    ('finnhub.io', '/api/v1/stock/insider-transactions'): 'finnhub_insider.json',
+    ('stats.oecd.org', None): 'oecd_cpi.json',
+    ('feeds.finance.yahoo.com', None): os.path.join('news', 'yahoo_rss.xml'),
+    ('news.google.com', None): os.path.join('news', 'google_news_rss.xml'),
+    ('www.marketwatch.com', None): os.path.join('news', 'marketwatch.html'),
+    ('www.reuters.com', None): os.path.join('news', 'reuters.html'),
+    ('finviz.com', None): os.path.join('news', 'finviz.html')
+}
+CONTENT_TYPES = {'.json': 'application/json', '.xml': 'application/rss+xml', '.html': 'text/html; charset=utf-8'}
+
+HISTORY_DAYS = 10 * 365
+EPOCH = date(1970, 1, 1)
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _rng(*keys):
+    return np.random.default_rng(zlib.crc32('|'.join(str(k) for k in keys).encode('utf-8')))
+
+
+def synthetic_bars(ticker, start=None, today=None):
+    # Werktägliche OHLCV-Balken als Random Walk, für denselben Ticker immer identisch
+    today = today or date.today()
+    days = np.arange((today - EPOCH).days - HISTORY_DAYS, (today - EPOCH).days + 1, dtype=np.float64)
+    days = days[(days + 3) % 7 < 5]  # 1970-01-01 war ein Donnerstag
+    rng = _rng('kurs', ticker.upper())
+    close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, size=len(days))))
+    open_ = close * (1 + rng.normal(0, 0.004, size=len(days)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.006, size=len(days))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.006, size=len(days))))
+    volume = rng.integers(1_000_000, 50_000_000, size=len(days)).astype(np.float64)
+    bars = np.column_stack([days, open_, high, low, close, volume])
+    if start is not None:
+        bars = bars[bars[:, 0] >= (start - EPOCH).days]
+    return bars
+
+
+def synthetic_fred(series_id, observation_start=None):
+    # Monatliche Reihe: Preisindex mit ~2-4 % Jahresrate bzw. Zinssatz zwischen 0 und 6 %
+    rng = _rng('fred', series_id)
+    index = pd.date_range(end=pd.Timestamp(date.today()).to_period('M').to_timestamp(), periods=12 * 10, freq='MS')
+    if 'CPI' in series_id.upper():
+        values = 100 * np.exp(np.cumsum(rng.normal(0.0025, 0.002, size=len(index))))
+    else:
+        values = np.clip(2.5 + np.cumsum(rng.normal(0, 0.15, size=len(index))), 0, 6)
+    series = pd.Series(values, index=index)
+    if observation_start:
+        series = series[series.index >= pd.Timestamp(observation_start)]
+    return series
+
+
+class FixtureAdapter(BaseAdapter):
+
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    def send(self, request, **kwargs):
+        url = urlparse(request.url)
+        Replay(url.hostname, self.latency)._call()
+        name = HTTP_FIXTURES.get((url.hostname, url.path)) or HTTP_FIXTURES.get((url.hostname, None))
+
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        if name is None:
+            response.status_code = 404
+            response.headers['Content-Type'] = 'application/json'
+            response._content = b'{"error": "keine Fixture"}'
+        else:
+            response.status_code = 200
+            response.headers['Content-Type'] = CONTENT_TYPES[os.path.splitext(name)[1]]
+            with open(os.path.join(FIXTURE_DIR, name), 'rb') as f:
+                response._content = f.read()
+        return response
+
+    def close(self):
+        pass
+
+
+class Replay:
+    # Gemeinsame Basis: Latenz und Aufrufzähler je Anbieter
+
+    calls = {}
+    _lock = threading.Lock()
+
+    def __init__(self, provider, latency):
+        self.provider = provider
+        self.latency = latency
+
+    def _call(self):
+        with Replay._lock:
+            Replay.calls[self.provider] = Replay.calls.get(self.provider, 0) + 1
+        time.sleep(self.latency)
+
+
+class FredReplay(Replay):
+
+    def get_series(self, series_id, observation_start=None, **kwargs):
+        self._call()
+        return synthetic_fred(series_id, observation_start)
+
+
+class FundamentalDataReplay(Replay):
+
+    def get_company_overview(self, symbol):
+        self._call()
+        return {**load_fixture('alpha_overview.json'), "Symbol": symbol}, None
+
+
+class TimeSeriesReplay(Replay):
+
+    def get_daily(self, symbol, outputsize='compact'):
+        self._call()
+        bars = synthetic_bars(symbol)[-100 if outputsize == 'compact' else 0:][::-1]
+        data = pd.DataFrame(bars[:, 1:], columns=['1. open', '2. high', '3. low', '4. close', '5. volume'],
+                            index=pd.to_datetime(bars[:, 0].astype('int64'), unit='D'))
+        data.index.name = 'date'
+        return data, {"2. Symbol": symbol}
+
+
+class CoinGeckoReplay(Replay):
+
+    def get_coin_market_chart_by_id(self, id, vs_currency='usd', days=365, **kwargs):
+        self._call()
+        bars = synthetic_bars(id)[-int(days):]
+        return {"prices": [[int(day) * 86400000, close] for day, close in zip(bars[:, 0], bars[:, 4])]}
+
+    def get_price(self, ids, vs_currencies='usd', **kwargs):
+        self._call()
+        ids = ids if isinstance(ids, list) else ids.split(',')
+        return {coin: {vs_currencies: float(synthetic_bars(coin)[-1, 4])} for coin in ids}
+
+
+class RedditReplay(Replay):
+
+    class _Subreddit:
+
+        def __init__(self, replay, name):
+            self.replay = replay
+            self.display_name = name
+
+        def search(self, keyword, limit=100, **kwargs):
+            # Wie praw: Iterator, der erst beim Durchlaufen "lädt"
+            self.replay._call()
+            posts = load_fixture('reddit_posts.json')
+            created = time.time() - 3600
+            for i in range(limit):
+                post = posts[i % len(posts)]
+                yield types.SimpleNamespace(
+                    id=f"{post['id']}_{keyword}_{i // len(posts)}".lower(),
+                    title=f"{keyword}: {post['title']}",
+                    selftext=post['selftext'],
+                    score=int(_rng('reddit', keyword, i).integers(0, 500)),
+                    num_comments=int(_rng('kommentare', keyword, i).integers(0, 80)),
+                    created_utc=created - i * 600,
+                    subreddit=self
+                )
+
+    def subreddit(self, name):
+        return RedditReplay._Subreddit(self, name)
+
+
+def yfinance_module(latency):
+    # Ersatz für das yfinance-Paket (Ticker.info, download), gleiche Aufrufschnittstelle
+    module = types.ModuleType('yfinance')
+    replay = Replay('yahoo', latency)
+
+    class YFRateLimitError(Exception):
+        pass
+
+    class Ticker:
+
+        def __init__(self, ticker):
+            self.ticker = ticker
+
+        @property
+        def info(self):
+            replay._call()
+            return {**load_fixture('yahoo_info.json'), "symbol": self.ticker}
+
+    def download(tickers, start=None, period=None, group_by='column', **kwargs):
+        replay._call()
+        tickers = tickers if isinstance(tickers, list) else [tickers]
+        start = date.fromisoformat(start) if start else None
+        frames = {}
+        for ticker in tickers:
+            bars = synthetic_bars(ticker, start)
+            frames[ticker] = pd.DataFrame(bars[:, 1:], columns=['Open', 'High', 'Low', 'Close', 'Volume'],
+                                          index=pd.to_datetime(bars[:, 0].astype('int64'), unit='D'))
+        if group_by == 'ticker' and len(tickers) > 1:
+            return pd.concat(frames, axis=1)
+        return frames[tickers[0]]
+
+    module.Ticker = Ticker
+    module.download = download
+    module.YFRateLimitError = YFRateLimitError
+    return module
+
+
+REDDIT_LABELS = ("positiv", "neutral", "negativ")
+
+
+def llm_reply(messages):
+    # Antwort des Fake-LLM: Reddit-Stapel ("[id] text" je Zeile) bekommen ein JSON-Objekt {id: label}
+    # wie von reddit_ingest.parse_labels erwartet, deterministisch je ID; alles andere "neutral"
+    prompt = messages[-1].get("content", "") if messages else ""
+    ids = re.findall(r'^\[([^\]]+)\] ', prompt, flags=re.MULTILINE)
+    if not ids:
+        return "neutral"
+    return json.dumps({post_id: REDDIT_LABELS[zlib.crc32(post_id.encode('utf-8')) % 3] for post_id in ids})
+
+
+def install(latency=0.05, llm_latency=0.3, llm_responder=None):
+    import llm
+    import price_store
+    from services import services
+    from http_client import http_client
+
+    sys.modules['yfinance'] = yfinance_module(latency)
+
+    for provider in ('finnhub', 'oecd', 'news'):
+        http_client.session(provider).mount('https://', FixtureAdapter(latency))
+
+    fetch_replay = Replay('kurse', latency)
+
+    def fetch(ticker, start=None, **kwargs):
+        fetch_replay._call()
+        return synthetic_bars(ticker, start)
+
+    def fetch_bulk(full, delta):
+        fetch_replay._call()
+        result = {ticker: synthetic_bars(ticker) for ticker in full}
+        result.update({ticker: synthetic_bars(ticker, start) for ticker, start in delta.items()})
+        return result
+
+    for source in list(price_store.FETCHERS):
+        price_store.FETCHERS[source] = fetch
+    for source in list(price_store.BULK_FETCHERS):
+        price_store.BULK_FETCHERS[source] = fetch_bulk
+
+    services.register('fred', lambda: FredReplay('fred', latency))
+    services.register('fundamental_data', lambda: FundamentalDataReplay('alpha_vantage', latency))
+    services.register('timeseries', lambda: TimeSeriesReplay('alpha_vantage', latency))
+    services.register('coingecko', lambda: CoinGeckoReplay('coingecko', latency))
+    services.register('reddit', lambda: RedditReplay('reddit', latency))
+
+    llm.gateway.use_backend(llm.FakeBackend(responder=llm_responder, latency=llm_latency))
+    return Replay.calls
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+# Prozessübergreifender TTL-Cache auf Basis einer lokalen SQLite-Datei.
+# Alle Gunicorn-Worker teilen sich dieselbe Datei; Fehlerergebnisse werden nie gespeichert.
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import functools
+import threading
+
+CACHE_DB_PATH = os.environ.get('CACHE_DB_PATH', os.path.join('data', 'cache.sqlite'))
+CACHE_PURGE_EVERY = int(os.environ.get('CACHE_PURGE_EVERY', '1000'))        # Schreibvorgänge je Aufräumlauf
+CACHE_PURGE_GRACE = int(os.environ.get('CACHE_PURGE_GRACE', str(24 * 3600)))  # >= längstes stale-while-revalidate
+
+FAILURE_PREFIXES = ("Fehler", "GPT-Fehler", "GPT-Validierung Fehler")
+
+_NO_FALLBACK = object()
+
+
+def _json_default(value):
+    # NumPy-/Pandas-Skalare und Zeitstempel serialisierbar machen
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def is_failure(value):
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.startswith(FAILURE_PREFIXES)
+    if isinstance(value, dict):
+        return not value or any(is_failure(v) for v in value.values() if isinstance(v, str))
+    return False
+
+
+class CacheStore:
+
+    def __init__(self, path=CACHE_DB_PATH, purge_every=CACHE_PURGE_EVERY, purge_grace=CACHE_PURGE_GRACE):
+        self.path = path
+        self.purge_every = purge_every
+        self.purge_grace = purge_grace
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key, allow_stale=False):
+        # Liefert (value, stored_at, expires_at) oder None; abgelaufene Einträge nur mit allow_stale
+        row = self._conn().execute(
+            "SELECT value, stored_at, expires_at FROM cache WHERE namespace = ? AND key = ?",
+            (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        if not allow_stale and row[2] <= time.time():
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def set(self, namespace, key, value, ttl):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO cache (namespace, key, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (namespace, key, json.dumps(value, default=_json_default), now, now + ttl)
+        )
+        self._maybe_purge()
+
+    def _maybe_purge(self):
+        # Abgelaufene Einträge nach jedem purge_every-ten Schreibvorgang (je Prozess) löschen
+        if self.purge_every <= 0:
+            return
+        with self._lock:
+            self._writes += 1
+            if self._writes < self.purge_every:
+                return
+            self._writes = 0
+        try:
+            self.purge_expired(self.purge_grace)
+        except sqlite3.Error as e:
+            logging.error(f"Cache-Aufräumen fehlgeschlagen: {str(e)}")
+
+    def delete(self, namespace, key=None):
+        if key is None:
+            self._conn().execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+        else:
+            self._conn().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def purge_expired(self, grace=0):
+        self._conn().execute("DELETE FROM cache WHERE expires_at < ?", (time.time() - grace,))
+
+
+cache_store = CacheStore()
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def record(namespace, outcome):
+    with _stats_lock:
+        counters = _stats.setdefault(namespace, {"hits": 0, "misses": 0, "errors": 0})
+        counters[outcome] += 1
+
+
+def cache_stats():
+    with _stats_lock:
+        result = {}
+        for namespace, counters in _stats.items():
+            lookups = counters["hits"] + counters["misses"]
+            result[namespace] = {**counters, "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else None}
+        return result
+
+
+def make_key(args, kwargs):
+    return json.dumps([args, sorted(kwargs.items())], default=_json_default, ensure_ascii=False)
+
+
+def ttl_cache(namespace, ttl, fallback=_NO_FALLBACK, failure=is_failure, store=None):
+    # Decorator: Ergebnis für ttl Sekunden im gemeinsamen Store halten.
+    # Wirft die Funktion und ist ein fallback gesetzt, wird dieser (ungecacht) zurückgegeben.
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            backend = store or cache_store
+            key = make_key(args, kwargs)
+
+            try:
+                entry = backend.get(namespace, key)
+            except Exception as e:
+                logging.error(f"Cache-Lesefehler {namespace}: {str(e)}")
+                entry = None
+
+            if entry is not None:
+                record(namespace, "hits")
+                return entry[0]
+            record(namespace, "misses")
+
+            try:
+                value = fn(*args, **kwargs)
+            except Exception as e:
+                if fallback is _NO_FALLBACK:
+                    raise
+                record(namespace, "errors")
+                logging.error(f"Fehler in {fn.__name__}{tuple(args)}: {str(e)}")
+                return fallback
+
+            if failure(value):
+                record(namespace, "errors")
+                return value
+
+            try:
+                backend.set(namespace, key, value, ttl)
+            except Exception as e:
+                logging.error(f"Cache-Schreibfehler {namespace}: {str(e)}")
+            return value
+
+        def invalidate(*args, **kwargs):
+            (store or cache_store).delete(namespace, make_key(args, kwargs) if args or kwargs else None)
+
+        wrapper.invalidate = invalidate
+        wrapper.cache_namespace = namespace
+        return wrapper
+    return decorator
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+# Austauschbare Prognose-Backends hinter predict_stock_price / predict_crypto_price.
+# "lstm" ist das bisherige Keras-Modell (Training im Trainings-Pool), "ridge" und "ets" sind
+# geschlossene NumPy-Verfahren ohne TensorFlow, die in Millisekunden rechnen:
+#   ridge - lineares AR-Modell mit Ridge-Regularisierung auf denselben 60-Tage-Fenstern
+#   ets   - Holt-Glättung mit gedämpftem Trend, Parameter per Gittersuche auf dem Ein-Schritt-Fehler
+# Auswahl je Anfrage über ?model=, Standard über FORECAST_MODEL.
+
+import os
+
+import numpy as np
+
+import training_pool
+from forecasting import build_training_windows, forecast_prepared
+
+FORECAST_MODEL = os.environ.get('FORECAST_MODEL', 'lstm')
+RIDGE_ALPHA = float(os.environ.get('RIDGE_ALPHA', '1e-3'))
+ETS_DAMPING = 0.98
+ETS_ALPHAS = np.linspace(0.1, 0.9, 9)
+ETS_BETAS = np.array([0.01, 0.05, 0.1, 0.2, 0.3])
+
+
+def _min_max(values):
+    values = np.asarray(values, dtype=np.float64).reshape(-1)
+    low, high = values.min(), values.max()
+    scale = high - low if high > low else 1.0
+    return (values - low) / scale, low, scale
+
+
+def forecast_lstm(values, asset_type=None, ticker=None, data_through=None,
+                  days_to_predict=30, prediction_days=60, epochs=50, cancelled=None):
+    prepared = training_pool.prepare(values, asset_type, ticker, data_through, prediction_days, epochs,
+                                     cancelled=cancelled)
+    return forecast_prepared([prepared], days_to_predict)[0]
+
+
+def fit_ridge(scaled, prediction_days=60, alpha=RIDGE_ALPHA):
+    # Geschlossene Lösung (X'X + alpha*I)^-1 X'y, Achsenabschnitt unregularisiert
+    x_train, y_train = build_training_windows(scaled, prediction_days)
+    x = np.column_stack([x_train[..., 0].astype(np.float64), np.ones(len(x_train))])
+    penalty = alpha * np.eye(x.shape[1])
+    penalty[-1, -1] = 0.0
+    return np.linalg.solve(x.T @ x + penalty, x.T @ y_train.astype(np.float64))
+
+
+def forecast_ridge(values, asset_type=None, ticker=None, data_through=None,
+                   days_to_predict=30, prediction_days=60, epochs=None, cancelled=None):
+    scaled, low, scale = _min_max(values)
+    coef = fit_ridge(scaled, prediction_days)
+
+    # Rekursiv wie beim LSTM: jede Prognose wird an das Fenster angehängt
+    buffer = np.empty(prediction_days + days_to_predict)
+    buffer[:prediction_days] = scaled[-prediction_days:]
+    for day in range(days_to_predict):
+        buffer[prediction_days + day] = buffer[day:day + prediction_days] @ coef[:-1] + coef[-1]
+    return (buffer[prediction_days:] * scale + low).tolist()
+
+
+def fit_ets(series, alphas=ETS_ALPHAS, betas=ETS_BETAS, phi=ETS_DAMPING):
+    # Alle (alpha, beta)-Kombinationen gleichzeitig durchrechnen, die mit kleinstem Ein-Schritt-Fehler gewinnt
+    alpha, beta = (g.reshape(-1) for g in np.meshgrid(alphas, betas))
+    level = np.full(alpha.shape, series[0])
+    trend = np.full(alpha.shape, series[1] - series[0] if len(series) > 1 else 0.0)
+    sse = np.zeros(alpha.shape)
+
+    for value in series[1:]:
+        predicted = level + phi * trend
+        sse += (value - predicted) ** 2
+        new_level = alpha * value + (1 - alpha) * predicted
+        trend = beta * (new_level - level) + (1 - beta) * phi * trend
+        level = new_level
+
+    best = np.argmin(sse)
+    return {"alpha": alpha[best], "beta": beta[best], "phi": phi, "level": level[best], "trend": trend[best]}
+
+
+def forecast_ets(values, asset_type=None, ticker=None, data_through=None,
+                 days_to_predict=30, prediction_days=None, epochs=None, cancelled=None):
+    series = np.asarray(values, dtype=np.float64).reshape(-1)
+    if len(series) < 3:
+        raise ValueError("Zu wenige Datenpunkte für exponentielle Glättung")
+    params = fit_ets(series)
+    # Gedämpfter Trend: h-Schritt-Prognose = level + (phi + phi^2 + ... + phi^h) * trend
+    damping = np.cumsum(params["phi"] ** np.arange(1, days_to_predict + 1))
+    return (params["level"] + damping * params["trend"]).tolist()
+
+
+FORECASTERS = {
+    "lstm": forecast_lstm,
+    "ridge": forecast_ridge,
+    "ets": forecast_ets
+}
+
+
+def get_forecaster(name=None):
+    name = name or FORECAST_MODEL
+    if not isinstance(name, str):
+        raise ValueError(f"Prognosemodell muss als String angegeben werden, erlaubt: {', '.join(FORECASTERS)}")
+    name = name.lower()
+    if name not in FORECASTERS:
+        raise ValueError(f"Unbekanntes Prognosemodell '{name}', erlaubt: {', '.join(FORECASTERS)}")
+    return name, FORECASTERS[name]
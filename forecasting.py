@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+# Gemeinsamer Prognosekern für Aktien, ETFs, Anleihen und Krypto:
+# Trainingsfenster, LSTM-Training, Modell-Registry und Prognose-Engine.
+# Die Engine rollt den LSTM-Schritt direkt auf den Modellgewichten ab,
+# statt für jeden Prognosetag model.predict aufzurufen.
+# TensorFlow und scikit-learn werden erst beim ersten Training bzw. Laden importiert.
+
+import logging
+from datetime import date
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from model_registry import model_registry
+
+ACTIVATIONS = {
+    "relu": lambda x: np.maximum(x, 0),
+    "tanh": np.tanh,
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "linear": lambda x: x,
+}
+
+
+def extract_lstm_weights(model):
+    # Gewichte einer Sequential(LSTM, Dense(1))-Architektur als NumPy-Arrays (float32)
+    lstm = next(layer for layer in model.layers if type(layer).__name__ == 'LSTM')
+    dense = next(layer for layer in model.layers if type(layer).__name__ == 'Dense')
+    config = lstm.get_config()
+
+    kernel, recurrent_kernel, bias = [w.astype(np.float32) for w in lstm.get_weights()]
+    dense_kernel, dense_bias = [w.astype(np.float32) for w in dense.get_weights()]
+
+    return {
+        "kernel": kernel,
+        "recurrent_kernel": recurrent_kernel,
+        "bias": bias,
+        "dense_kernel": dense_kernel,
+        "dense_bias": dense_bias,
+        "activation": config.get("activation", "tanh"),
+        "recurrent_activation": config.get("recurrent_activation", "sigmoid"),
+    }
+
+
+def _stack(weights_list):
+    first = weights_list[0]
+    for w in weights_list[1:]:
+        if (w["recurrent_kernel"].shape != first["recurrent_kernel"].shape
+                or w["activation"] != first["activation"]
+                or w["recurrent_activation"] != first["recurrent_activation"]):
+            raise ValueError("Batch-Prognose nur für Modelle gleicher Architektur möglich")
+
+    return (
+        np.stack([w["kernel"][0] for w in weights_list]),          # (B, 4u)
+        np.stack([w["recurrent_kernel"] for w in weights_list]),   # (B, u, 4u)
+        np.stack([w["bias"] for w in weights_list]),               # (B, 4u)
+        np.stack([w["dense_kernel"][:, 0] for w in weights_list]), # (B, u)
+        np.stack([w["dense_bias"][0] for w in weights_list]),      # (B,)
+        ACTIVATIONS[first["activation"]],
+        ACTIVATIONS[first["recurrent_activation"]],
+    )
+
+
+def forecast_batch(weights_list, windows, days_to_predict=30):
+    # Mehrstufige Prognose für viele Ticker in einem Aufruf.
+    # windows: (B, prediction_days) bereits skalierte Startfenster, Ergebnis: (B, days_to_predict)
+    windows = np.asarray(windows, dtype=np.float32)
+    if windows.ndim == 1:
+        windows = windows[None, :]
+    batch, prediction_days = windows.shape
+    if len(weights_list) != batch:
+        raise ValueError("Anzahl Modelle und Startfenster stimmt nicht überein")
+
+    kernel, recurrent_kernel, bias, dense_kernel, dense_bias, activation, recurrent_activation = _stack(weights_list)
+    units = recurrent_kernel.shape[1]
+
+    # Vorab allokierter Puffer: Startfenster + alle Prognosetage, kein np.append pro Tag
+    buffer = np.empty((batch, prediction_days + days_to_predict), dtype=np.float32)
+    buffer[:, :prediction_days] = windows
+
+    for day in range(days_to_predict):
+        h = np.zeros((batch, units), dtype=np.float32)
+        c = np.zeros((batch, units), dtype=np.float32)
+
+        for t in range(day, day + prediction_days):
+            z = buffer[:, t:t + 1] * kernel + np.matmul(h[:, None, :], recurrent_kernel)[:, 0, :] + bias
+            i = recurrent_activation(z[:, :units])
+            f = recurrent_activation(z[:, units:2 * units])
+            g = activation(z[:, 2 * units:3 * units])
+            o = recurrent_activation(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * activation(c)
+
+        buffer[:, prediction_days + day] = np.einsum('bu,bu->b', h, dense_kernel) + dense_bias
+
+    return buffer[:, prediction_days:]
+
+
+def forecast(model, scaled_data, prediction_days=60, days_to_predict=30):
+    window = np.asarray(scaled_data, dtype=np.float32).reshape(-1)[-prediction_days:]
+    return forecast_batch([extract_lstm_weights(model)], window, days_to_predict)[0]
+
+
+def build_training_windows(scaled_data, prediction_days=60):
+    # Zero-Copy-Sicht auf die Zeitreihe: x[i] = scaled[i:i+prediction_days], y[i] = scaled[i+prediction_days]
+    series = np.asarray(scaled_data, dtype=np.float32).reshape(-1)
+    if len(series) <= prediction_days:
+        raise ValueError(f"Zu wenige Datenpunkte für ein Fenster von {prediction_days} Tagen")
+
+    x_train = sliding_window_view(series[:-1], prediction_days)[..., np.newaxis]
+    y_train = series[prediction_days:]
+    return x_train, y_train
+
+
+def train_lstm_model(scaled_data, prediction_days=60, epochs=50, model=None):
+    # model: bereits trainiertes Modell mit gleicher Fensterlänge, wird weitertrainiert (Warmstart)
+    x_train, y_train = build_training_windows(scaled_data, prediction_days)
+
+    if model is None:
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense, LSTM, Input
+
+        model = Sequential()
+        model.add(Input(shape=(x_train.shape[1], 1)))
+        model.add(LSTM(units=50, activation='relu'))
+        model.add(Dense(1))
+        model.compile(optimizer='adam', loss='mean_squared_error')
+
+    model.fit(x_train, y_train, epochs=epochs, batch_size=32, verbose=0)
+    return model
+
+
+def get_data_through(df):
+    # Datum des letzten Kursbalkens (Index oder Date-Spalte), sonst heute
+    if hasattr(df, 'columns') and not df.empty:
+        last = df['Date'].max() if 'Date' in df.columns else df.index.max()
+        if hasattr(last, 'date'):
+            return last.date().isoformat()
+    return date.today().isoformat()
+
+
+def _train(data, prediction_days=60, epochs=50):
+    from sklearn.preprocessing import MinMaxScaler
+    scaler = MinMaxScaler()
+    scaled = scaler.fit_transform(data)
+    return train_lstm_model(scaled, prediction_days, epochs), scaler, epochs
+
+
+def fit_or_load_model(data, asset_type=None, ticker=None, data_through=None, prediction_days=60, epochs=50,
+                      on_stale=None):
+    # Gespeichertes Modell aus der Registry laden, nur bei Bedarf neu trainieren.
+    # Veraltetes Modell: on_stale() meldet den Refit an den Aufrufer (Trainings-Pool), ohne on_stale
+    # wird im eigenen Prozess im Hintergrund nachtrainiert
+    def train():
+        return _train(data, prediction_days, epochs)
+
+    if ticker is None:
+        model, scaler, _ = train()
+        return model, scaler
+
+    asset_type = asset_type or 'stock'
+    data_through = data_through or date.today().isoformat()
+
+    entry = None
+    try:
+        entry = model_registry.lookup(asset_type, ticker, prediction_days, data_through)
+    except Exception as e:
+        logging.error(f"Fehler beim Lesen der Modell-Registry {ticker}: {str(e)}")
+
+    if entry is not None:
+        try:
+            model, scaler = model_registry.load(entry)
+            if not entry["fresh"]:
+                if on_stale is not None:
+                    on_stale()
+                else:
+                    model_registry.refit_async(asset_type, ticker, prediction_days, data_through, train)
+            return model, scaler
+        except Exception as e:
+            logging.error(f"Gespeichertes Modell für {ticker} nicht ladbar, trainiere neu: {str(e)}")
+
+    model, scaler, _ = train()
+    try:
+        model_registry.save(asset_type, ticker, prediction_days, data_through, model, scaler, epochs)
+    except Exception as e:
+        logging.error(f"Modell für {ticker} konnte nicht gespeichert werden: {str(e)}")
+    return model, scaler
+
+
+def refresh_model(values, asset_type, ticker, data_through, prediction_days=60, epochs=50):
+    # Für geplante Aktualisierungen: Modell zum aktuellen Datenstand synchron trainieren,
+    # falls die Registry noch keins hat. Rückgabe True, wenn neu trainiert wurde
+    entry = model_registry.lookup(asset_type, ticker, prediction_days, data_through)
+    if entry is not None and entry["fresh"]:
+        return False
+
+    data = np.asarray(values, dtype=float).reshape(-1, 1)
+    model, scaler, _ = _train(data, prediction_days, epochs)
+    model_registry.save(asset_type, ticker, prediction_days, data_through, model, scaler, epochs)
+    return True
+
+
+def prepare_forecast(values, asset_type=None, ticker=None, data_through=None, prediction_days=60, epochs=50,
+                     on_stale=None):
+    # Modell laden/trainieren und Startfenster skalieren; die eigentliche Prognose läuft
+    # über forecast_prepared, damit mehrere Ticker in einem Batch gerechnet werden können
+    data = np.asarray(values, dtype=float).reshape(-1, 1)
+    model, scaler = fit_or_load_model(data, asset_type, ticker, data_through, prediction_days, epochs, on_stale)
+    return {
+        "weights": extract_lstm_weights(model),
+        "scaler": scaler,
+        "window": scaler.transform(data)[-prediction_days:, 0]
+    }
+
+
+def forecast_prepared(prepared, days_to_predict=30):
+    if not prepared:
+        return []
+    scaled = forecast_batch([p["weights"] for p in prepared], np.stack([p["window"] for p in prepared]),
+                            days_to_predict)
+    return [p["scaler"].inverse_transform(row.reshape(-1, 1)).flatten().tolist()
+            for p, row in zip(prepared, scaled)]
+
+
+def forecast_series(values, asset_type=None, ticker=None, data_through=None,
+                    days_to_predict=30, prediction_days=60, epochs=50):
+    # Einheitlicher Einstieg für alle Asset-Typen: Schlusskurse rein, Prognose in Kurswerten raus
+    prepared = prepare_forecast(values, asset_type, ticker, data_through, prediction_days, epochs)
+    return forecast_prepared([prepared], days_to_predict)[0]
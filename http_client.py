@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+# Gemeinsame HTTP-Transportschicht für externe Datenquellen.
+# Je Anbieter eine Session mit Keep-Alive-Verbindungspool, festen Timeouts und
+# Wiederholungen mit exponentiellem Backoff (Retry-After wird beachtet, aber gedeckelt).
+# Token-Bucket-Limiter halten die Kontingente ein, ohne Worker-Threads schlafen zu legen:
+# ist kein Token frei, wird sofort RateLimitExceeded ausgelöst.
+
+import os
+import time
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import metrics
+
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', '16'))
+HTTP_MAX_RETRIES = int(os.environ.get('HTTP_MAX_RETRIES', '3'))
+HTTP_BACKOFF_FACTOR = float(os.environ.get('HTTP_BACKOFF_FACTOR', '0.5'))
+HTTP_MAX_RETRY_AFTER = float(os.environ.get('HTTP_MAX_RETRY_AFTER', '5'))  # längeres Retry-After -> nicht warten
+HTTP_CACHE_PATH = os.environ.get('HTTP_CACHE_PATH', os.path.join('data', 'http_cache'))
+
+# Anbieter -> Timeouts (connect, read), Kontingent (Aufrufe pro Minute, None = unbegrenzt), HTTP-Cache in Sekunden
+PROVIDERS = {
+    "finnhub": {"timeout": (3.05, 10), "per_minute": int(os.environ.get('FINNHUB_RATE_PER_MIN', '60')), "cache": None},
+    "alpha_vantage": {"timeout": (3.05, 20), "per_minute": int(os.environ.get('ALPHA_RATE_PER_MIN', '5')), "cache": None},
+    "coingecko": {"timeout": (3.05, 20), "per_minute": int(os.environ.get('COINGECKO_RATE_PER_MIN', '30')), "cache": None},
+    "oecd": {"timeout": (3.05, 15), "per_minute": None, "cache": int(os.environ.get('OECD_HTTP_CACHE_TTL', str(6 * 3600)))},
+    "yahoo": {"timeout": (3.05, 15), "per_minute": int(os.environ.get('YAHOO_RATE_PER_MIN', '120')), "cache": None},
+    "news": {"timeout": (3.05, 10), "per_minute": int(os.environ.get('NEWS_RATE_PER_MIN', '120')), "cache": None},
+}
+
+
+class RateLimitExceeded(Exception):
+
+    def __init__(self, provider, retry_after):
+        super().__init__(f"Kontingent für {provider} erschöpft, erneut in {retry_after:.1f} s")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity):
+        self.rate = rate              # Tokens pro Sekunde
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        # Liefert 0.0 bei Erfolg, sonst die Wartezeit in Sekunden bis genug Tokens frei sind
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def available_in(self, tokens=1):
+        # Wartezeit bis genug Tokens frei sind, ohne etwas zu verbrauchen
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def penalize(self, seconds):
+        # Nach einem 429 des Anbieters bis zum angegebenen Zeitpunkt keine Tokens vergeben
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class CappedRetry(Retry):
+    # Retry-After wird nur bis HTTP_MAX_RETRY_AFTER abgewartet; längere Sperren gehen sofort an den Aufrufer
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is not None and retry_after > HTTP_MAX_RETRY_AFTER:
+            raise RateLimitExceeded("upstream", retry_after)
+        return retry_after
+
+
+def _build_session(provider, config):
+    session = None
+    if config["cache"]:
+        try:
+            import requests_cache
+            os.makedirs(os.path.dirname(HTTP_CACHE_PATH) or '.', exist_ok=True)
+            session = requests_cache.CachedSession(f"{HTTP_CACHE_PATH}_{provider}", backend='sqlite',
+                                                   expire_after=config["cache"], allowable_codes=(200,))
+        except ImportError:
+            logging.warning(f"requests-cache nicht installiert, {provider} wird ohne HTTP-Cache abgefragt")
+    session = session or requests.Session()
+
+    retries = CappedRetry(total=HTTP_MAX_RETRIES, backoff_factor=HTTP_BACKOFF_FACTOR,
+                          status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(['GET', 'HEAD']),
+                          respect_retry_after_header=True, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class HTTPClient:
+
+    def __init__(self, providers=PROVIDERS):
+        self.providers = providers
+        self._sessions = {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+        for provider, config in providers.items():
+            if config["per_minute"]:
+                self._buckets[provider] = TokenBucket(config["per_minute"] / 60.0, config["per_minute"])
+
+    def session(self, provider):
+        with self._lock:
+            if provider not in self._sessions:
+                self._sessions[provider] = _build_session(provider, self.providers[provider])
+            return self._sessions[provider]
+
+    def acquire(self, provider, tokens=1):
+        # Nicht blockierend: löst RateLimitExceeded aus, wenn das Kontingent gerade erschöpft ist
+        bucket = self._buckets.get(provider)
+        if bucket is None:
+            return
+        wait = bucket.try_acquire(tokens)
+        if wait > 0:
+            metrics.count('upstream_rate_limited_total', provider=provider, reason='kontingent')
+            raise RateLimitExceeded(provider, wait)
+
+    def available_in(self, provider, tokens=1):
+        bucket = self._buckets.get(provider)
+        return bucket.available_in(tokens) if bucket is not None else 0.0
+
+    def penalize(self, provider, seconds):
+        bucket = self._buckets.get(provider)
+        if bucket is not None:
+            bucket.penalize(seconds)
+
+    def get(self, provider, url, **kwargs):
+        self.acquire(provider)
+        kwargs.setdefault('timeout', self.providers[provider]["timeout"])
+        try:
+            with metrics.span('upstream', provider=provider):
+                response = self.session(provider).get(url, **kwargs)
+        except RateLimitExceeded as e:
+            metrics.count('upstream_rate_limited_total', provider=provider, reason='429')
+            self.penalize(provider, e.retry_after)
+            raise RateLimitExceeded(provider, e.retry_after)
+
+        metrics.count('upstream_responses_total', provider=provider, status=response.status_code)
+        if response.status_code == 429:
+            metrics.count('upstream_rate_limited_total', provider=provider, reason='429')
+            retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+            self.penalize(provider, retry_after)
+            raise RateLimitExceeded(provider, retry_after)
+        return response
+
+
+def _parse_retry_after(value, default=HTTP_MAX_RETRY_AFTER):
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+http_client = HTTPClient()
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+
+# Inkrementelle technische Indikatoren (MA50/MA100/MA200, RSI) mit persistiertem Zustand.
+# Die Rechenschritte bilden pandas' rolling(window).mean() (Kahan-Summe mit getrennter
+# Kompensation für Hinzufügen/Entfernen) und ewm(com=13, adjust=False).mean() exakt nach,
+# damit die Ergebnisse bitgleich zu get_stock_data bleiben. Alle Zustände sind Vektoren,
+# dieselbe Routine rechnet also einen Ticker oder ein ganzes (T, N)-Panel.
+# Erstbefüllung und Neuberechnung (Full-Refresh, Dividendenanpassung) laufen vektorisiert über pandas
+# (compute_history), der Zustand wird aus dem Ende der Reihe abgeleitet; step rechnet nur angehängte Balken.
+# Die MA-Summen beginnen dabei mit dem letzten Fenster statt mit der Kahan-Kompensation der ganzen
+# Historie, angehängte Werte können deshalb in der letzten Stelle von einer Komplettrechnung abweichen.
+
+import os
+import json
+import fcntl
+import logging
+
+import numpy as np
+import pandas as pd
+
+from price_store import price_store, bars_to_frame, slice_period
+
+MA_WINDOWS = (50, 100, 200)
+RSI_COM = 13
+INDICATOR_COLUMNS = ['MA50', 'MA100', 'MA200', 'RSI']
+STATE_VERSION = 1
+
+
+def init_state(n_series, max_window=max(MA_WINDOWS)):
+    zeros = lambda: np.zeros(n_series)
+    state = {
+        "count": 0,
+        "history": np.full((max_window, n_series), np.nan),  # Ringpuffer der letzten Schlusskurse
+        "last_close": np.full(n_series, np.nan),
+        "ma": {},
+        "ewm": {}
+    }
+    for window in MA_WINDOWS:
+        state["ma"][window] = {
+            "sum": zeros(), "comp_add": zeros(), "comp_remove": zeros(),
+            "nobs": zeros(), "neg_ct": zeros(), "same": zeros(), "prev": np.full(n_series, np.nan)
+        }
+    for side in ("up", "down"):
+        state["ewm"][side] = {"weighted": np.full(n_series, np.nan), "old_wt": np.ones(n_series), "nobs": zeros()}
+    return state
+
+
+def _add_mean(ma, val):
+    obs = val == val
+    y = val - ma["comp_add"]
+    t = ma["sum"] + y
+    ma["comp_add"] = np.where(obs, t - ma["sum"] - y, ma["comp_add"])
+    ma["sum"] = np.where(obs, t, ma["sum"])
+    ma["nobs"] = ma["nobs"] + obs
+    ma["neg_ct"] = ma["neg_ct"] + (obs & np.signbit(val))
+    ma["same"] = np.where(obs, np.where(val == ma["prev"], ma["same"] + 1, 1), ma["same"])
+    ma["prev"] = np.where(obs, val, ma["prev"])
+
+
+def _remove_mean(ma, val):
+    obs = val == val
+    y = -val - ma["comp_remove"]
+    t = ma["sum"] + y
+    ma["comp_remove"] = np.where(obs, t - ma["sum"] - y, ma["comp_remove"])
+    ma["sum"] = np.where(obs, t, ma["sum"])
+    ma["nobs"] = ma["nobs"] - obs
+    ma["neg_ct"] = ma["neg_ct"] - (obs & np.signbit(val))
+
+
+def _calc_mean(ma, window):
+    nobs = ma["nobs"]
+    result = ma["sum"] / np.where(nobs > 0, nobs, 1)
+    result = np.where(ma["same"] >= nobs, ma["prev"],
+                      np.where((ma["neg_ct"] == 0) & (result < 0), 0.0,
+                               np.where((ma["neg_ct"] == nobs) & (result > 0), 0.0, result)))
+    return np.where((nobs >= window) & (nobs > 0), result, np.nan)
+
+
+def _ewm_step(ewm, cur, alpha):
+    # Ein Schritt aus pandas' ewm(adjust=False, ignore_na=False) für den Mittelwert
+    obs = cur == cur
+    ewm["nobs"] = ewm["nobs"] + obs
+    has_weight = ewm["weighted"] == ewm["weighted"]
+
+    old_wt = np.where(has_weight, ewm["old_wt"] * (1. - alpha), ewm["old_wt"])
+    update = has_weight & obs & (ewm["weighted"] != cur)
+    blended = (old_wt * ewm["weighted"] + alpha * cur) / (old_wt + alpha)
+
+    ewm["weighted"] = np.where(update, blended, np.where(~has_weight & obs, cur, ewm["weighted"]))
+    ewm["old_wt"] = np.where(has_weight & obs, 1., old_wt)
+    return np.where(ewm["nobs"] >= 1, ewm["weighted"], np.nan)
+
+
+def step(state, close):
+    # Verarbeitet einen Balken (Vektor über alle Reihen) und liefert (4, N): MA50, MA100, MA200, RSI
+    close = np.asarray(close, dtype=np.float64)
+    count = state["count"]
+    history = state["history"]
+    max_window = history.shape[0]
+    out = np.empty((len(INDICATOR_COLUMNS), len(close)))
+
+    for k, window in enumerate(MA_WINDOWS):
+        ma = state["ma"][window]
+        if count == 0:
+            ma["prev"] = close.copy()
+        elif count >= window:
+            _remove_mean(ma, history[(count - window) % max_window])
+        _add_mean(ma, close)
+        out[k] = _calc_mean(ma, window)
+
+    # RSI: diff(1) -> clip -> ewm(com=13, adjust=False)
+    delta = close - state["last_close"]
+    up = np.clip(delta, 0, None)
+    down = -1 * np.clip(delta, None, 0)
+    alpha = 1. / (1. + RSI_COM)
+    ema_up = _ewm_step(state["ewm"]["up"], up, alpha)
+    ema_down = _ewm_step(state["ewm"]["down"], down, alpha)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = ema_up / ema_down
+        out[3] = 100 - (100 / (1 + rs))
+
+    history[count % max_window] = close
+    state["last_close"] = close
+    state["count"] = count + 1
+    return out
+
+
+def compute_panel(closes, state=None):
+    # Batch-Modus: closes (T, N) -> dict Spaltenname -> (T, N); NaN steht für "kein Balken"
+    closes = np.asarray(closes, dtype=np.float64)
+    if closes.ndim == 1:
+        closes = closes[:, None]
+    state = state or init_state(closes.shape[1])
+
+    result = np.empty((len(INDICATOR_COLUMNS), closes.shape[0], closes.shape[1]))
+    for t in range(closes.shape[0]):
+        result[:, t, :] = step(state, closes[t])
+    return {name: result[k] for k, name in enumerate(INDICATOR_COLUMNS)}
+
+
+def compute_latest(closes):
+    # Nur die letzte Zeile von compute_panel, ohne Schleife über die Zeit: MA als Fenstermittel,
+    # RSI-Glättung als gewichtete Summe (ewm adjust=False ausgeschrieben). Gleich bis auf Rundung
+    # (keine Kahan-Summe). Führende NaN bedeuten "Reihe beginnt später", Lücken mittendrin werden nicht unterstützt.
+    closes = np.asarray(closes, dtype=np.float64)
+    if closes.ndim == 1:
+        closes = closes[:, None]
+    n_rows, n_series = closes.shape
+    result = {}
+    for window in MA_WINDOWS:
+        result[f"MA{window}"] = closes[-window:].mean(axis=0) if n_rows >= window else np.full(n_series, np.nan)
+
+    result["RSI"] = np.full(n_series, np.nan)
+    if n_rows < 2:
+        return result
+    delta = np.diff(closes, axis=0)
+    valid = delta == delta
+    first = valid.argmax(axis=0)  # erste gültige Differenz je Reihe = Startwert der ewm
+    columns = np.arange(n_series)
+
+    alpha = 1. / (1. + RSI_COM)
+    decay = (1. - alpha) ** np.arange(len(delta) - 1, -1, -1)
+    weights = alpha * decay
+    smoothed = []
+    for side in (np.clip(delta, 0, None), -1 * np.clip(delta, None, 0)):
+        side = np.where(valid, side, 0.)
+        # Startwert geht mit (1-alpha)^k statt alpha*(1-alpha)^k ein
+        smoothed.append(weights @ side + (decay[first] - weights[first]) * side[first, columns])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - (100 / (1 + smoothed[0] / smoothed[1]))
+    result["RSI"] = np.where(valid.any(axis=0), rsi, np.nan)
+    return result
+
+
+def _trailing_run(values):
+    # Anzahl gleicher Werte am Ende der (NaN-freien) Reihe
+    if not len(values):
+        return 0
+    different = np.flatnonzero(values != values[-1])
+    return len(values) - (different[-1] + 1 if len(different) else 0)
+
+
+def compute_history(closes):
+    # Ganze Reihe (T,) vektorisiert wie get_stock_data -> ((T, 4) Indikatorwerte, Zustand für step)
+    closes = np.asarray(closes, dtype=np.float64).reshape(-1)
+    n = len(closes)
+    state = init_state(1)
+    values = np.empty((n, len(INDICATOR_COLUMNS)))
+    if not n:
+        return values, state
+
+    series = pd.Series(closes)
+    for k, window in enumerate(MA_WINDOWS):
+        values[:, k] = series.rolling(window=window).mean().to_numpy()
+    delta = series.diff(1)
+    sides = {"up": delta.clip(lower=0), "down": -1 * delta.clip(upper=0)}
+    smoothed = {side: side_values.ewm(com=RSI_COM, adjust=False).mean() for side, side_values in sides.items()}
+    rs = smoothed["up"] / smoothed["down"]
+    values[:, 3] = (100 - (100 / (1 + rs))).to_numpy()
+
+    # Zustand nach dem letzten Balken: Ringpuffer, Fenstersummen und ewm-Gewichte aus dem Ende der Reihe
+    history = state["history"]
+    max_window = history.shape[0]
+    start = max(0, n - max_window)
+    history[np.arange(start, n) % max_window, 0] = closes[start:]
+
+    observed = closes[closes == closes]
+    for window in MA_WINDOWS:
+        in_window = closes[-window:]
+        in_window = in_window[in_window == in_window]
+        ma = state["ma"][window]
+        ma["sum"] = np.array([in_window.sum()])
+        ma["nobs"] = np.array([float(len(in_window))])
+        ma["neg_ct"] = np.array([float(np.signbit(in_window).sum())])
+        ma["same"] = np.array([float(_trailing_run(observed))])
+        ma["prev"] = np.array([observed[-1] if len(observed) else closes[0]])
+
+    alpha = 1. / (1. + RSI_COM)
+    for side, side_values in sides.items():
+        raw = side_values.to_numpy()
+        obs = np.flatnonzero(raw == raw)
+        ewm = state["ewm"][side]
+        ewm["nobs"] = np.array([float(len(obs))])
+        if len(obs):
+            old_wt = 1.
+            for _ in range(n - 1 - obs[-1]):  # Lücken am Ende verringern das Gewicht wie in _ewm_step
+                old_wt *= (1. - alpha)
+            ewm["weighted"] = np.array([smoothed[side].iloc[-1]])
+            ewm["old_wt"] = np.array([old_wt])
+
+    state["last_close"] = closes[-1:].copy()
+    state["count"] = n
+    return values, state
+
+
+def compute_series(closes, state=None):
+    panel = compute_panel(np.asarray(closes, dtype=np.float64).reshape(-1, 1), state)
+    return np.column_stack([panel[name][:, 0] for name in INDICATOR_COLUMNS])
+
+
+def state_to_json(state):
+    return {
+        "version": STATE_VERSION,
+        "count": state["count"],
+        "history": state["history"].tolist(),
+        "last_close": state["last_close"].tolist(),
+        "ma": {str(w): {k: v.tolist() for k, v in ma.items()} for w, ma in state["ma"].items()},
+        "ewm": {side: {k: v.tolist() for k, v in ewm.items()} for side, ewm in state["ewm"].items()}
+    }
+
+
+def state_from_json(data):
+    if data.get("version") != STATE_VERSION:
+        raise ValueError("Indikator-Zustand hat eine veraltete Version")
+    return {
+        "count": data["count"],
+        "history": np.array(data["history"], dtype=np.float64),
+        "last_close": np.array(data["last_close"], dtype=np.float64),
+        "ma": {int(w): {k: np.array(v, dtype=np.float64) for k, v in ma.items()} for w, ma in data["ma"].items()},
+        "ewm": {side: {k: np.array(v, dtype=np.float64) for k, v in ewm.items()} for side, ewm in data["ewm"].items()}
+    }
+
+
+def _copy_state(state):
+    return state_from_json(json.loads(json.dumps(state_to_json(state))))
+
+
+class IndicatorStore:
+    # Persistiert Indikatorwerte und Zustand neben der Kurshistorie im price_store.
+    # Der Zustand wird beim vorletzten Balken gesichert, weil der letzte ein Intraday-Balken sein kann.
+
+    def __init__(self, store=price_store):
+        self.store = store
+
+    def _path(self, source, ticker):
+        return self.store.path(source, ticker) + ".ind"
+
+    def _load(self, source, ticker):
+        path = self._path(source, ticker)
+        try:
+            with open(path + ".json", encoding='utf-8') as f:
+                meta = json.load(f)
+            values = np.load(path + ".npy")
+            return meta, state_from_json(meta["state"]), values
+        except (OSError, ValueError, KeyError):
+            return None, None, None
+
+    def _save(self, source, ticker, meta, values):
+        path = self._path(source, ticker)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        np.save(tmp + ".npy", values)
+        os.replace(tmp + ".npy", path + ".npy")
+        with open(tmp + ".json", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp + ".json", path + ".json")
+
+    def indicators(self, source, ticker, bars):
+        # Liefert (len(bars), 4) Indikatorwerte; berechnet nur Balken nach dem gespeicherten Stand neu
+        n = len(bars)
+        closes = np.asarray(bars[:, 4], dtype=np.float64)
+        checkpoint = max(n - 1, 0)
+        os.makedirs(self.store.base_dir, exist_ok=True)
+
+        with open(self._path(source, ticker) + ".lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                meta, state, values = self._load(source, ticker)
+                done = meta["count"] if meta else 0
+                valid = (meta is not None and 0 < done <= checkpoint
+                         and meta["last_day"] == float(bars[done - 1, 0])
+                         and meta["last_close"] == float(closes[done - 1]))
+                if not valid:
+                    if meta is not None:
+                        logging.warning(f"Indikator-Zustand {ticker} passt nicht zur Kurshistorie, berechne neu")
+                    values, state = compute_history(closes[:checkpoint])
+                    done = checkpoint
+
+                pending = compute_series(closes[done:checkpoint], state) if checkpoint > done else \
+                    np.empty((0, len(INDICATOR_COLUMNS)))
+                values = np.concatenate([values[:done], pending])
+
+                if checkpoint > done or not valid:
+                    self._save(source, ticker, {
+                        "count": checkpoint,
+                        "last_day": float(bars[checkpoint - 1, 0]) if checkpoint else None,
+                        "last_close": float(closes[checkpoint - 1]) if checkpoint else None,
+                        "state": state_to_json(state)
+                    }, values)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        # Letzten (evtl. unvollständigen) Balken auf einer Kopie des Zustands rechnen
+        tail = compute_series(closes[checkpoint:], _copy_state(state)) if n > checkpoint else \
+            np.empty((0, len(INDICATOR_COLUMNS)))
+        return np.concatenate([values, tail])
+
+    def frame(self, source, ticker, period=None, **fetch_kwargs):
+        # Kurse + Indikatoren über die gesamte gespeicherte Historie, danach auf period zugeschnitten
+        bars = self.store.bars(source, ticker, **fetch_kwargs)
+        if not len(bars):
+            return bars_to_frame(bars)
+
+        values = self.indicators(source, ticker, bars)
+        sliced = slice_period(bars, period)
+        df = bars_to_frame(sliced)
+        for k, name in enumerate(INDICATOR_COLUMNS):
+            df[name] = values[len(bars) - len(sliced):, k]
+        return df
+
+
+indicator_store = IndicatorStore()
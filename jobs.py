@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# Hintergrund-Jobs für lang laufende Analysen.
+# Begrenzter Worker-Pool, identische laufende Jobs werden zusammengelegt.
+
+import os
+import uuid
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ANALYSE_JOB_WORKERS = int(os.environ.get('ANALYSE_JOB_WORKERS', '2'))
+ANALYSE_JOB_MAX_PENDING = int(os.environ.get('ANALYSE_JOB_MAX_PENDING', '50'))
+ANALYSE_JOB_TTL = int(os.environ.get('ANALYSE_JOB_TTL', '3600'))  # Sekunden, wie lange Ergebnisse abrufbar bleiben
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobManager:
+
+    def __init__(self, max_workers=ANALYSE_JOB_WORKERS, max_pending=ANALYSE_JOB_MAX_PENDING, ttl=ANALYSE_JOB_TTL):
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analyse-job')
+        self._jobs = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args):
+        # Gibt (job, neu_angelegt) zurück; läuft bereits ein Job mit gleichem Schlüssel, wird dieser geteilt
+        with self._lock:
+            self._purge()
+
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                return self._snapshot(self._jobs[job_id]), False
+
+            pending = sum(1 for job in self._jobs.values() if job["status"] in ("queued", "running"))
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"Zu viele offene Analyse-Jobs ({pending})")
+
+            job = {
+                "id": uuid.uuid4().hex,
+                "key": key,
+                "status": "queued",
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None
+            }
+            self._jobs[job["id"]] = job
+            self._inflight[key] = job["id"]
+
+        self._executor.submit(self._run, job, fn, args)
+        return self._snapshot(job), True
+
+    def _run(self, job, fn, args):
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        try:
+            job["result"] = fn(*args)
+            job["status"] = "done"
+        except Exception as e:
+            logging.error(f"Fehler in Analyse-Job {job['id']} {job['key']}: {str(e)}")
+            job["error"] = str(e)
+            job["status"] = "failed"
+        finally:
+            with self._lock:
+                job["finished_at"] = time.time()
+                if self._inflight.get(job["key"]) == job["id"]:
+                    del self._inflight[job["key"]]
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def _purge(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] is not None and now - job["finished_at"] > self.ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _snapshot(self, job):
+        return {k: v for k, v in job.items() if k != "key"}
+
+
+analyse_jobs = JobManager()
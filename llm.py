@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+# Zentrales Gateway für alle LLM-Aufrufe.
+# Antwort-Cache über einen Hash aus Modell und Nachrichten (mit TTL), Zusammenlegen
+# identischer gleichzeitiger Prompts, Begrenzung paralleler Aufrufe und Metriken je Endpunkt.
+# Mit LLM_BACKEND=fake läuft alles gegen ein lokales Backend ohne OpenAI-Zugriff.
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from cache import cache_store, record
+from metrics import metrics
+
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'openai')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'gpt-4o')
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '8'))
+LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', '3600'))
+
+NAMESPACE = 'llm'
+
+
+class OpenAIBackend:
+
+    def __init__(self):
+        import openai
+        openai.api_key = os.environ.get('OPENAI_API_KEY')
+        self.client = openai
+
+    def complete(self, model, messages):
+        response = self.client.chat.completions.create(model=model, messages=messages)
+        usage = getattr(response, 'usage', None)
+        return response.choices[0].message.content, {
+            "prompt_tokens": getattr(usage, 'prompt_tokens', 0) or 0,
+            "completion_tokens": getattr(usage, 'completion_tokens', 0) or 0
+        }
+
+
+class FakeBackend:
+    # Lokales Backend für Tests und Benchmarks: deterministische Antworten, optionale Latenz
+
+    def __init__(self, responder=None, latency=0.0):
+        self.responder = responder
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def complete(self, model, messages):
+        with self._lock:
+            self.calls.append((model, messages))
+        if self.latency:
+            time.sleep(self.latency)
+        content = self.responder(messages) if self.responder else "neutral"
+        prompt_chars = sum(len(m.get("content", "")) for m in messages)
+        return content, {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4}
+
+
+def prompt_key(model, messages):
+    return hashlib.sha256(json.dumps([model, messages], ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class LLMGateway:
+
+    def __init__(self, backend=None, store=None, max_concurrency=LLM_MAX_CONCURRENCY, default_ttl=LLM_CACHE_TTL):
+        self._backend = backend
+        self.store = store or cache_store
+        self.default_ttl = default_ttl
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='llm')
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = FakeBackend() if LLM_BACKEND == 'fake' else OpenAIBackend()
+        return self._backend
+
+    def use_backend(self, backend):
+        self._backend = backend
+
+    def _count(self, endpoint, **values):
+        with self._lock:
+            m = self._metrics.setdefault(endpoint, {
+                "calls": 0, "cache_hits": 0, "coalesced": 0, "errors": 0,
+                "latency_total": 0.0, "latency_max": 0.0, "prompt_tokens": 0, "completion_tokens": 0
+            })
+            for name, value in values.items():
+                if name == "latency_max":
+                    m[name] = max(m[name], value)
+                else:
+                    m[name] += value
+
+    def chat(self, messages, endpoint, model=None, ttl=None, cache=True):
+        # Liefert den Antworttext; Fehler des Backends werden weitergereicht und nie gecacht
+        model = model or LLM_MODEL
+        ttl = self.default_ttl if ttl is None else ttl
+        key = prompt_key(model, messages)
+
+        if cache:
+            try:
+                entry = self.store.get(NAMESPACE, key)
+            except Exception as e:
+                logging.error(f"LLM-Cache Lesefehler ({endpoint}): {str(e)}")
+                entry = None
+            if entry is not None:
+                record(NAMESPACE, "hits")
+                self._count(endpoint, cache_hits=1)
+                return entry[0]
+            record(NAMESPACE, "misses")
+
+        # Single-Flight: identische Prompts, die gerade laufen, teilen sich ein Ergebnis
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            self._count(endpoint, coalesced=1)
+            return future.result()
+
+        try:
+            with self._semaphore, metrics.span('upstream', provider='llm'):
+                started = time.monotonic()
+                content, usage = self.backend.complete(model, messages)
+                latency = time.monotonic() - started
+
+            self._count(endpoint, calls=1, latency_total=latency, latency_max=latency,
+                        prompt_tokens=usage.get("prompt_tokens", 0), completion_tokens=usage.get("completion_tokens", 0))
+
+            if cache and content:
+                try:
+                    self.store.set(NAMESPACE, key, content, ttl)
+                except Exception as e:
+                    logging.error(f"LLM-Cache Schreibfehler ({endpoint}): {str(e)}")
+
+            future.set_result(content)
+            return content
+        except Exception as e:
+            self._count(endpoint, errors=1)
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def chat_many(self, requests, endpoint, model=None, ttl=None):
+        # Mehrere Prompts gebündelt abschicken (parallel im Rahmen des Limits); Ergebnis in Eingabereihenfolge.
+        # Fehlgeschlagene Einträge liefern die Exception statt eines Texts.
+        futures = [self._pool.submit(self.chat, messages, endpoint, model, ttl) for messages in requests]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def metrics(self):
+        with self._lock:
+            result = {}
+            for endpoint, m in self._metrics.items():
+                result[endpoint] = {**m, "latency_avg": round(m["latency_total"] / m["calls"], 4) if m["calls"] else None}
+            return result
+
+
+gateway = LLMGateway()
+
+
+def chat(messages, endpoint, model=None, ttl=None, cache=True):
+    return gateway.chat(messages, endpoint, model=model, ttl=ttl, cache=cache)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+# Lokaler Speicher für FRED-Makroreihen (Inflation, Leitzins).
+# Je Reihe ein .npy mit den Spalten [Tag seit 1970-01-01, Wert, Veränderung ggü. Vorjahr in %],
+# aufsteigend sortiert. Nach der Erstbefüllung werden per observation_start nur neue
+# Beobachtungen geholt; die letzten REVISION_OBSERVATIONS Werte werden dabei mit abgeglichen,
+# weil FRED jüngere Daten nachträglich revidiert. Die Vorjahresrate wird beim Einlesen berechnet.
+
+import os
+import re
+import json
+import time
+import fcntl
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from services import services
+from metrics import metrics
+
+MACRO_STORE_DIR = os.environ.get('MACRO_STORE_DIR', os.path.join('data', 'macro'))
+MACRO_STORE_HISTORY_YEARS = int(os.environ.get('MACRO_STORE_HISTORY_YEARS', '10'))
+MACRO_STORE_CHECK_INTERVAL = int(os.environ.get('MACRO_STORE_CHECK_INTERVAL', str(6 * 3600)))
+MACRO_STORE_FULL_REFRESH_DAYS = int(os.environ.get('MACRO_STORE_FULL_REFRESH_DAYS', '30'))
+REVISION_OBSERVATIONS = 13
+
+EPOCH = date(1970, 1, 1)
+
+
+def _safe_name(value):
+    return re.sub(r'[^A-Za-z0-9._-]', '_', str(value))
+
+
+def series_to_rows(series):
+    # pandas-Serie (DatetimeIndex) -> (n, 2)-Array [Tag, Wert], aufsteigend, ohne NaN
+    if series is None or len(series) == 0:
+        return np.empty((0, 2))
+    series = pd.to_numeric(series, errors='coerce').dropna()
+    index = pd.to_datetime(series.index)
+    days = (index.normalize() - pd.Timestamp(EPOCH)).days.to_numpy(dtype=np.float64)
+    rows = np.column_stack([days, series.to_numpy(dtype=np.float64)])
+    rows = rows[np.argsort(rows[:, 0], kind='stable')]
+    keep = np.append(rows[1:, 0] != rows[:-1, 0], True) if len(rows) else np.array([], dtype=bool)
+    return rows[keep]
+
+
+def with_yoy(rows, yoy_lag=12):
+    # Vorjahresrate über yoy_lag Beobachtungen (monatliche Reihen: 12), wie zuvor iloc[-1] / iloc[-13]
+    yoy = np.full(len(rows), np.nan)
+    if yoy_lag and len(rows) > yoy_lag:
+        values = rows[:, 1]
+        yoy[yoy_lag:] = (values[yoy_lag:] - values[:-yoy_lag]) / values[:-yoy_lag] * 100
+    return np.column_stack([rows[:, :2], yoy])
+
+
+def fetch_fred(series_id, start=None):
+    with metrics.span('upstream', provider='fred'):
+        series = services.fred.get_series(series_id, observation_start=start.isoformat() if start else None)
+    return series_to_rows(series)
+
+
+class MacroStore:
+
+    def __init__(self, base_dir=MACRO_STORE_DIR):
+        self.base_dir = base_dir
+
+    def path(self, series_id):
+        return os.path.join(self.base_dir, f"fred__{_safe_name(series_id.upper())}")
+
+    def load(self, series_id):
+        path = self.path(series_id) + ".npy"
+        if not os.path.exists(path):
+            return None
+        return np.load(path)
+
+    def meta(self, series_id):
+        try:
+            with open(self.path(series_id) + ".json", encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write(self, series_id, rows, meta):
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = self.path(series_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        np.save(tmp + ".npy", np.ascontiguousarray(rows, dtype=np.float64))
+        os.replace(tmp + ".npy", path + ".npy")
+        with open(tmp + ".json", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp + ".json", path + ".json")
+
+    def update(self, series_id, yoy_lag=12, force=False, fetch=fetch_fred):
+        os.makedirs(self.base_dir, exist_ok=True)
+        with open(self.path(series_id) + ".lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                stored = self.load(series_id)
+                meta = self.meta(series_id)
+                now = time.time()
+
+                if (stored is not None and len(stored) and not force
+                        and now - meta.get("checked_at", 0) < MACRO_STORE_CHECK_INTERVAL
+                        and meta.get("yoy_lag") == yoy_lag):
+                    return stored
+
+                full = (force or stored is None or not len(stored) or meta.get("yoy_lag") != yoy_lag
+                        or now - meta.get("full_refresh_at", 0) > MACRO_STORE_FULL_REFRESH_DAYS * 86400)
+                if full:
+                    start = date.today() - timedelta(days=365 * MACRO_STORE_HISTORY_YEARS)
+                    rows = fetch(series_id, start=start)
+                    if not len(rows):
+                        raise ValueError(f"Keine Daten für {series_id}")
+                    meta = {"full_refresh_at": now}
+                else:
+                    # Ab der ältesten noch revidierbaren Beobachtung nachladen
+                    anchor = stored[max(len(stored) - REVISION_OBSERVATIONS, 0), 0]
+                    fresh = fetch(series_id, start=EPOCH + timedelta(days=int(anchor)))
+                    rows = np.concatenate([stored[stored[:, 0] < anchor, :2], fresh]) if len(fresh) else stored[:, :2]
+
+                rows = with_yoy(rows, yoy_lag)
+                meta.update({"checked_at": now, "yoy_lag": yoy_lag, "series_id": series_id})
+                self.write(series_id, rows, meta)
+                return rows
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def series(self, series_id, yoy_lag=12):
+        # Aktualisiert bei Bedarf; schlägt FRED fehl, wird der gespeicherte Stand geliefert
+        try:
+            return self.update(series_id, yoy_lag)
+        except Exception as e:
+            rows = self.load(series_id)
+            if rows is None or not len(rows):
+                raise
+            logging.error(f"FRED-Abruf {series_id} fehlgeschlagen, nutze gespeicherte Reihe: {str(e)}")
+            return rows
+
+    def latest(self, series_id, yoy_lag=12):
+        # Letzte Beobachtung als dict: Datum, Wert, Vorjahresrate (None, wenn nicht berechenbar)
+        row = self.series(series_id, yoy_lag)[-1]
+        return {
+            "date": (EPOCH + timedelta(days=int(row[0]))).isoformat(),
+            "value": float(row[1]),
+            "yoy": None if np.isnan(row[2]) else float(row[2])
+        }
+
+    def update_many(self, series_ids, yoy_lag=12):
+        results = {}
+        for series_id in dict.fromkeys(series_ids):
+            try:
+                results[series_id] = self.update(series_id, yoy_lag)
+            except Exception as e:
+                logging.error(f"Aktualisierung FRED {series_id} fehlgeschlagen: {str(e)}")
+                results[series_id] = e
+        return results
+
+
+macro_store = MacroStore()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+# Laufzeit-Metriken im Prometheus-Textformat (ohne zusätzliches Paket).
+# span() misst einzelne Abschnitte (Datenabruf, Fundamentaldaten, Prognose, Upstream-Aufrufe) als Histogramm,
+# count() zählt Ereignisse wie Rate-Limits. Innerhalb eines Requests gemessene Abschnitte können zusätzlich
+# als Server-Timing-Header ausgeliefert werden. Mit METRICS_ENABLED=0 liefern span()/timed() ein leeres
+# Objekt bzw. rufen die Funktion direkt auf, es wird nichts gemessen.
+# Werte gelten je Prozess (jeder gunicorn-Worker zählt für sich).
+
+import os
+import time
+import bisect
+import functools
+import threading
+
+from flask import g, request, has_request_context
+
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_SERVER_TIMING = os.environ.get('METRICS_SERVER_TIMING', '0') == '1'
+SERVER_TIMING_REQUEST_HEADER = 'X-Server-Timing'  # Client fordert den Header pro Anfrage an
+PREFIX = 'finanzcoach_'
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (k + '="' + str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+               for k, v in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+class _NoopSpan:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        self.registry.observe('span_seconds', seconds, span=self.name, **self.labels)
+        if exc_type is not None:
+            self.registry.count('span_errors_total', span=self.name, **self.labels)
+        if has_request_context():
+            timings = g.get('metrics_timings')
+            if timings is not None:
+                label = '.'.join([self.name] + [str(v) for v in self.labels.values()])
+                timings[label] = timings.get(label, 0.0) + seconds
+        return False
+
+
+class Metrics:
+
+    def __init__(self, enabled=METRICS_ENABLED, server_timing=METRICS_SERVER_TIMING):
+        self.enabled = enabled
+        self.server_timing = server_timing
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, _label_key(labels))
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+            if index < len(BUCKETS):
+                histogram["buckets"][index] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+    def span(self, name, **labels):
+        # Kontextmanager: with metrics.span('upstream', provider='yahoo'): ...
+        if not self.enabled:
+            return NOOP_SPAN
+        return _Span(self, name, labels)
+
+    def timed(self, name=None):
+        # Decorator für ganze Funktionen, Abschnittsname = Funktionsname
+        def decorator(fn):
+            span_name = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, span_name, {}):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def register_collector(self, collector):
+        # collector() -> Liste von (Name, Typ, Hilfetext, [(Labels-dict, Wert), ...]), wird beim Abruf gelesen
+        self._collectors.append(collector)
+
+    def init_app(self, app):
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _before_request(self):
+        if not self.enabled:
+            return None
+        g.metrics_started = time.perf_counter()
+        g.metrics_timings = {}
+        return None
+
+    def _after_request(self, response):
+        if not self.enabled or 'metrics_started' not in g:
+            return response
+        seconds = time.perf_counter() - g.metrics_started
+        self.observe('request_seconds', seconds, endpoint=request.endpoint or 'unbekannt',
+                     method=request.method, status=response.status_code)
+
+        if self.server_timing or request.headers.get(SERVER_TIMING_REQUEST_HEADER) == '1':
+            entries = [f"{label};dur={duration * 1000:.1f}" for label, duration in g.metrics_timings.items()]
+            entries.append(f"total;dur={seconds * 1000:.1f}")
+            response.headers['Server-Timing'] = ', '.join(entries)
+        return response
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: {**h, "buckets": list(h["buckets"])} for key, h in self._histograms.items()}
+
+        lines = []
+
+        def header(name, kind):
+            full = PREFIX + name
+            if name in self._help:
+                lines.append(f"# HELP {full} {self._help[name]}")
+            lines.append(f"# TYPE {full} {kind}")
+            return full
+
+        for name in sorted({name for name, _ in counters}):
+            full = header(name, 'counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{full}{_format_labels(labels)} {value}")
+
+        for name in sorted({name for name, _ in histograms}):
+            full = header(name, 'histogram')
+            for (metric, labels), h in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS, h["buckets"]):
+                    cumulative += bucket
+                    lines.append(f"{full}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{full}_bucket{_format_labels(labels, [('le', '+Inf')])} {h['count']}")
+                lines.append(f"{full}_sum{_format_labels(labels)} {h['sum']:.6f}")
+                lines.append(f"{full}_count{_format_labels(labels)} {h['count']}")
+
+        for collector in self._collectors:
+            for name, kind, text, samples in collector():
+                self._help.setdefault(name, text)
+                full = header(name, kind)
+                for labels, value in samples:
+                    lines.append(f"{full}{_format_labels(_label_key(labels))} {value}")
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+metrics.describe('span_seconds', 'Dauer einzelner Verarbeitungsschritte und Upstream-Aufrufe in Sekunden')
+metrics.describe('span_errors_total', 'Abschnitte, die mit einer Exception beendet wurden')
+metrics.describe('request_seconds', 'Antwortzeit je Endpunkt bis zum Senden der Header in Sekunden')
+metrics.describe('upstream_rate_limited_total', 'Abgewiesene Upstream-Aufrufe (eigenes Kontingent oder 429 des Anbieters)')
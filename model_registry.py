@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+# Persistente Ablage trainierter Prognosemodelle.
+# Schlüssel: Asset-Typ, Ticker, Fenstergröße (prediction_days) und Datenstand.
+
+import os
+import re
+import json
+import glob
+import logging
+import threading
+import time
+
+MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', os.path.join('data', 'models'))
+MODEL_REGISTRY_MAX_MB = float(os.environ.get('MODEL_REGISTRY_MAX_MB', '500'))
+
+
+def _safe_name(value):
+    return re.sub(r'[^A-Za-z0-9._-]', '_', str(value))
+
+
+class ModelRegistry:
+
+    def __init__(self, base_dir=MODEL_REGISTRY_DIR, max_bytes=MODEL_REGISTRY_MAX_MB * 1024 * 1024):
+        self.base_dir = base_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._refits = set()
+
+    def _prefix(self, asset_type, ticker, window):
+        return f"{_safe_name(asset_type.lower())}__{_safe_name(ticker.upper())}__w{int(window)}"
+
+    def _path(self, asset_type, ticker, window, data_through):
+        name = f"{self._prefix(asset_type, ticker, window)}__{_safe_name(data_through)}"
+        return os.path.join(self.base_dir, name)
+
+    def lookup(self, asset_type, ticker, window, data_through):
+        # Exakter Treffer oder – falls nicht vorhanden – das jüngste ältere Modell
+        pattern = os.path.join(self.base_dir, self._prefix(asset_type, ticker, window) + "__*.json")
+        candidates = []
+        for meta_path in glob.glob(pattern):
+            if ".tmp." in meta_path:
+                continue  # Metadaten, die ein anderer Prozess gerade schreibt
+            try:
+                with open(meta_path, encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if meta.get("data_through", "") <= str(data_through):
+                meta["path"] = meta_path[:-len(".json")]
+                candidates.append(meta)
+
+        if not candidates:
+            return None
+
+        entry = max(candidates, key=lambda m: m["data_through"])
+        entry["fresh"] = entry["data_through"] == str(data_through)
+        return entry
+
+    def load(self, entry):
+        from tensorflow.keras.models import load_model
+        from sklearn.preprocessing import MinMaxScaler
+        import numpy as np
+
+        model_path = entry["path"] + ".keras"
+        model = load_model(model_path, compile=False)
+
+        scaler = MinMaxScaler()
+        scaler.fit(np.array([[entry["data_min"]], [entry["data_max"]]]))
+
+        # Zeitstempel für die LRU-Verdrängung aktualisieren (mtime, da atime oft deaktiviert ist)
+        now = time.time()
+        for path in (model_path, entry["path"] + ".json"):
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+
+        return model, scaler
+
+    def save(self, asset_type, ticker, window, data_through, model, scaler, epochs):
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = self._path(asset_type, ticker, window, data_through)
+
+        # Erst in temporäre Dateien schreiben, damit parallele Worker nie halbe Modelle laden
+        tmp_model = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.keras"
+        model.save(tmp_model)
+        os.replace(tmp_model, path + ".keras")
+
+        meta = {
+            "asset_type": asset_type.lower(),
+            "ticker": ticker.upper(),
+            "window": int(window),
+            "data_through": str(data_through),
+            "epochs": int(epochs),
+            "data_min": float(scaler.data_min_[0]),
+            "data_max": float(scaler.data_max_[0]),
+            "trained_at": time.time()
+        }
+        tmp_meta = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp.json"
+        with open(tmp_meta, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, path + ".json")
+
+        self._drop_older(asset_type, ticker, window, data_through)
+        self.evict()
+        return meta
+
+    def _drop_older(self, asset_type, ticker, window, data_through):
+        # Ältere Datenstände desselben Schlüssels werden nach einem Refit nicht mehr gebraucht;
+        # neuere bleiben, falls ein verspäteter Refit einen älteren Stand speichert
+        pattern = os.path.join(self.base_dir, self._prefix(asset_type, ticker, window) + "__*.json")
+        current = self._path(asset_type, ticker, window, data_through)
+        for meta_path in glob.glob(pattern):
+            if ".tmp." in meta_path:
+                continue  # laufendes save() eines anderen Prozesses, sonst schlägt dessen os.replace fehl
+            path = meta_path[:-len(".json")]
+            if path == current:
+                continue
+            try:
+                with open(meta_path, encoding='utf-8') as f:
+                    older = json.load(f).get("data_through", "") < str(data_through)
+            except (OSError, ValueError):
+                continue
+            if older:
+                self._remove(path)
+
+    def _remove(self, path):
+        for suffix in (".json", ".keras"):
+            try:
+                os.remove(path + suffix)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.error(f"Modell {path}{suffix} konnte nicht gelöscht werden: {str(e)}")
+
+    def evict(self):
+        # LRU-Verdrängung, bis das Größenbudget eingehalten ist
+        with self._lock:
+            entries = []
+            total = 0
+            for model_path in glob.glob(os.path.join(self.base_dir, "*.keras")):
+                if ".tmp." in model_path:
+                    continue
+                try:
+                    stat = os.stat(model_path)
+                except OSError:
+                    continue
+                size = stat.st_size
+                meta_path = model_path[:-len(".keras")] + ".json"
+                if os.path.exists(meta_path):
+                    size += os.path.getsize(meta_path)
+                entries.append((stat.st_mtime, size, model_path[:-len(".keras")]))
+                total += size
+
+            entries.sort()
+            while total > self.max_bytes and entries:
+                _, size, path = entries.pop(0)
+                self._remove(path)
+                total -= size
+
+    def refit_async(self, asset_type, ticker, window, data_through, train_fn):
+        # Neue Kurse vorhanden: Modell im Hintergrund nachtrainieren, die Anfrage nutzt bis dahin das alte
+        # Nur ohne Trainings-Pool; mit Pool läuft der Refit als Auftrag über training_pool.refit
+        key = (asset_type.lower(), ticker.upper(), int(window), str(data_through))
+        with self._lock:
+            if key in self._refits:
+                return False
+            self._refits.add(key)
+
+        def _run():
+            try:
+                model, scaler, epochs = train_fn()
+                self.save(asset_type, ticker, window, data_through, model, scaler, epochs)
+            except Exception as e:
+                logging.error(f"Fehler beim Hintergrund-Refit {ticker}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refits.discard(key)
+
+        threading.Thread(target=_run, name=f"refit-{ticker}", daemon=True).start()
+        return True
+
+
+model_registry = ModelRegistry()
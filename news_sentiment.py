@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+# Nachrichten-Sentiment je Ticker aus mehreren Quellen.
+# Die Schlagzeilen aller Quellen werden parallel geladen (RSS per ElementTree, HTML per BeautifulSoup)
+# und lokal mit einem Finanz-Lexikon bewertet. Das LLM wird nur gefragt, wenn das Gesamtbild
+# uneindeutig ist: Saldo nahe null trotz klarer Signale in beide Richtungen, oder Quellen widersprechen sich.
+# Quellen-Seiten werden NEWS_LISTING_TTL lang gecacht, jede Schlagzeile wird je Ticker über den Hash
+# ihrer URL nur einmal bewertet. Die Parser arbeiten auf dem Seiteninhalt allein, für Tests/Benchmarks
+# lassen sich die Abrufe über analyse(..., fetch_source=, fetch_social=) ersetzen
+# (HTML/RSS-Fixtures: benchmarks/fixtures/news, eingehängt über benchmarks/replay.py).
+
+import os
+import re
+import math
+import hashlib
+import logging
+import xml.etree.ElementTree as ET
+from urllib.parse import quote_plus, urljoin
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import llm
+import reddit_ingest
+from cache import ttl_cache, cache_store
+from http_client import http_client
+
+NEWS_LISTING_TTL = int(os.environ.get('NEWS_LISTING_TTL', '1800'))          # Sekunden je Quellen-Seite
+NEWS_HEADLINE_TTL = int(os.environ.get('NEWS_HEADLINE_TTL', str(30 * 24 * 3600)))
+NEWS_SOURCE_TIMEOUT = float(os.environ.get('NEWS_SOURCE_TIMEOUT', '10'))
+NEWS_MAX_HEADLINES = int(os.environ.get('NEWS_MAX_HEADLINES', '20'))       # je Quelle
+NEWS_USER_AGENT = os.environ.get('NEWS_USER_AGENT', 'Mozilla/5.0 (compatible; finanzcoach/1.0)')
+NEWS_SOCIAL_SUBREDDIT = os.environ.get('NEWS_SOCIAL_SUBREDDIT', 'stocks')
+
+LABEL_THRESHOLD = 0.15    # mittlerer Score, ab dem eine Quelle/das Gesamtbild nicht mehr neutral ist
+AMBIGUOUS_SHARE = 0.25    # Anteil positiver UND negativer Schlagzeilen, ab dem ein neutraler Saldo unklar ist
+NEWS_LLM_HEADLINES = 25
+
+news_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('NEWS_WORKERS', '8')), thread_name_prefix='news')
+
+# Gewicht -> vollständige Wortformen; Treffer nur auf ganze Wörter, damit "Warner", "Dropbox", "cutting-edge"
+# oder "halten" nicht als Signal zählen. Flexionen werden ausdrücklich aufgezählt.
+LEXICON_GROUPS = [
+    # englisch
+    (1.0, "beat beats jump jumps jumped outperform outperforms outperformed"),
+    (1.2, "surge surges surged surging soar soars soared soaring upgrade upgrades upgraded bullish"),
+    (1.0, "rally rallies rallied rallying"),
+    (0.8, "gain gains gained record boost boosts boosted approve approves approved approval"),
+    (0.7, "strong stronger buyback buybacks"),
+    (0.6, "rise rises rising rose growth profit profits profitable raise raises raised"),
+    (-1.0, "miss misses missed underperform underperforms underperformed lawsuit lawsuits "
+           "warn warns warned warning warnings sell-off selloff"),
+    (-1.3, "plunge plunges plunged plunging"),
+    (-1.2, "tumble tumbles tumbled tumbling slump slumps slumped downgrade downgrades downgraded bearish"),
+    (-0.9, "drop drops dropped dropping recall recalls recalled"),
+    (-0.8, "fall falls fell falling weak weaker weakness loss losses probe probes layoff layoffs halt halts halted"),
+    (-0.7, "cut cuts slowdown"),
+    (-1.5, "fraud bankrupt bankruptcy"),
+    # deutsch
+    (0.7, "steigt steigen gestiegen steigend stark starke starken starker"),
+    (1.2, "kurssprung hochgestuft"),
+    (0.8, "rekord rekordhoch"),
+    (1.0, "übertrifft übertreffen übertroffen kaufempfehlung"),
+    (0.6, "gewinn gewinne gewinnt wachstum erhöht erhöhen"),
+    (-0.8, "fällt fallen gefallen verlust verluste verlusten stellenabbau schwach schwache schwachen schwacher"),
+    (-0.7, "sinkt sinken gesunken senkt senken"),
+    (-1.3, "einbruch"),
+    (-1.0, "verfehlt verfehlen verkaufsempfehlung klage klagen warnt warnen"),
+    (-1.2, "herabgestuft gewinnwarnung"),
+    (-1.5, "insolvenz insolvent betrug")
+]
+LEXICON = {word: weight for weight, words in LEXICON_GROUPS for word in words.split()}
+PHRASES = {"dividend hike": 1.0, "bricht ein": -1.3, "brechen ein": -1.3}
+LEXICON_VERSION = 2  # Teil des Cache-Schlüssels je Schlagzeile; bei Änderungen am Lexikon erhöhen
+NEGATIONS = {"not", "no", "never", "without", "nicht", "kein", "keine", "keinen", "ohne", "nie"}
+TOKEN_PATTERN = re.compile(r"[\w\-]+", re.UNICODE)
+
+
+def score_headline(title):
+    # Summe der Lexikon-Treffer (Verneinung in den zwei Wörtern davor dreht das Vorzeichen), auf [-1, 1] gestaucht
+    tokens = TOKEN_PATTERN.findall(title.lower())
+    total = 0.0
+    for i, token in enumerate(tokens):
+        weight = LEXICON.get(token, 0.0)
+        if weight and any(t in NEGATIONS for t in tokens[max(0, i - 2):i]):
+            weight = -weight
+        total += weight
+    text = f" {' '.join(tokens)} "
+    total += sum(w for phrase, w in PHRASES.items() if f" {phrase} " in text)
+    return math.tanh(total / 2)
+
+
+def label(score):
+    if score > LABEL_THRESHOLD:
+        return "positiv"
+    if score < -LABEL_THRESHOLD:
+        return "negativ"
+    return "neutral"
+
+
+# --- Parser: Seiteninhalt -> [(url, titel)] ---
+
+def parse_rss(content, base_url=None):
+    root = ET.fromstring(content)
+    headlines = []
+    for item in root.iter('item'):
+        title, link = item.findtext('title'), item.findtext('link')
+        if title and link:
+            headlines.append((link.strip(), title.strip()))
+    return headlines
+
+
+def _parse_links(content, base_url, selector):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+    headlines = []
+    for anchor in soup.select(selector):
+        title = anchor.get_text(" ", strip=True)
+        if title and anchor.get('href'):
+            headlines.append((urljoin(base_url, anchor['href']), title))
+    return headlines
+
+
+def parse_marketwatch(content, base_url):
+    return _parse_links(content, base_url, 'h3.article__headline a[href]')
+
+
+def parse_reuters(content, base_url):
+    return _parse_links(content, base_url, 'a[data-testid="TitleLink"], [data-testid="MediaStoryCard"] h3 a[href]')
+
+
+def parse_finviz(content, base_url):
+    return _parse_links(content, base_url, 'table#news-table a.tab-link-news')
+
+
+# Quelle -> (URL-Vorlage, Parser); {ticker} und {query} (Firmenname, URL-kodiert) werden eingesetzt
+SOURCES = {
+    "Yahoo Finance": ("https://feeds.finance.yahoo.com/rss/2.0/headline?s={ticker}&region=US&lang=en-US", parse_rss),
+    "MarketWatch": ("https://www.marketwatch.com/investing/stock/{ticker_lower}", parse_marketwatch),
+    "Google News": ("https://news.google.com/rss/search?q={query}&hl=de&gl=DE&ceid=DE:de", parse_rss),
+    "Reuters": ("https://www.reuters.com/site-search/?query={query}", parse_reuters),
+    "Finviz": ("https://finviz.com/quote.ashx?t={ticker}", parse_finviz)
+}
+SOCIAL_SOURCE = "Social Media"
+
+
+def fetch_html(url):
+    response = http_client.get('news', url, headers={'User-Agent': NEWS_USER_AGENT})
+    response.raise_for_status()
+    return response.content
+
+
+@ttl_cache('news_listing', NEWS_LISTING_TTL)
+def fetch_source(source, ticker, full_name):
+    url_template, parser = SOURCES[source]
+    url = url_template.format(ticker=quote_plus(ticker), ticker_lower=quote_plus(ticker.lower()),
+                              query=quote_plus(full_name or ticker))
+    return [list(h) for h in parser(fetch_html(url), url)[:NEWS_MAX_HEADLINES]]
+
+
+def fetch_social(ticker, full_name):
+    # Reddit-Beiträge aus dem Beitragsspeicher (reddit_ingest); bereits per LLM bewertete Beiträge behalten ihr Label
+    keyword = ticker.lower()
+    age = reddit_ingest.reddit_store.query_age(NEWS_SOCIAL_SUBREDDIT, keyword)
+    if age is None or age > reddit_ingest.REDDIT_QUERY_TTL:
+        reddit_ingest.fetch_posts(NEWS_SOCIAL_SUBREDDIT, keyword, NEWS_MAX_HEADLINES)
+    return [[f"reddit:{post_id}", text, sentiment]
+            for post_id, text, sentiment in reddit_ingest.reddit_store.posts(NEWS_SOCIAL_SUBREDDIT, keyword,
+                                                                              NEWS_MAX_HEADLINES)]
+
+
+def headline_key(ticker, url):
+    return f"v{LEXICON_VERSION}:{ticker.upper()}:{hashlib.sha1(url.encode('utf-8')).hexdigest()}"
+
+
+def score_headlines(ticker, headlines):
+    # Reddit-Beiträge mit gespeichertem LLM-Label (reddit_ingest) nutzen immer dieses Label.
+    # Sonst Bewertung je URL nur einmal: vorhandene Scores aus dem Cache, neue werden berechnet und abgelegt
+    scored = []
+    for headline in headlines:
+        url, title = headline[0], headline[1]
+        llm_label = headline[2] if len(headline) > 2 else None
+        if llm_label in reddit_ingest.LABEL_SCORES:
+            scored.append((title, float(reddit_ingest.LABEL_SCORES[llm_label])))
+            continue
+
+        key = headline_key(ticker, url)
+        entry = None
+        try:
+            entry = cache_store.get('news_headline', key)
+        except Exception as e:
+            logging.error(f"News-Cache Lesefehler {ticker}: {str(e)}")
+        if entry is not None:
+            score = entry[0]
+        else:
+            score = score_headline(title)
+            try:
+                cache_store.set('news_headline', key, score, NEWS_HEADLINE_TTL)
+            except Exception as e:
+                logging.error(f"News-Cache Schreibfehler {ticker}: {str(e)}")
+        scored.append((title, score))
+    return scored
+
+
+def collect(ticker, full_name, fetch_source=fetch_source, fetch_social=fetch_social):
+    # Alle Quellen parallel; eine langsame oder fehlerhafte Quelle liefert None statt die Analyse aufzuhalten
+    futures = {news_executor.submit(fetch_source, source, ticker, full_name): source for source in SOURCES}
+    futures[news_executor.submit(fetch_social, ticker, full_name)] = SOCIAL_SOURCE
+    done, _ = wait(futures, timeout=NEWS_SOURCE_TIMEOUT)
+
+    results = {}
+    for future, source in futures.items():
+        if future not in done:
+            logging.error(f"Zeitüberschreitung bei Nachrichtenquelle {source} für {ticker}")
+            results[source] = None
+            continue
+        try:
+            results[source] = score_headlines(ticker, future.result())
+        except Exception as e:
+            logging.error(f"Nachrichtenquelle {source} für {ticker} fehlgeschlagen: {str(e)}")
+            results[source] = None
+    return results
+
+
+def is_ambiguous(scores, source_labels):
+    if not scores:
+        return False
+    mean = sum(scores) / len(scores)
+    positive = sum(1 for s in scores if s > LABEL_THRESHOLD) / len(scores)
+    negative = sum(1 for s in scores if s < -LABEL_THRESHOLD) / len(scores)
+    mixed = abs(mean) <= LABEL_THRESHOLD and positive >= AMBIGUOUS_SHARE and negative >= AMBIGUOUS_SHARE
+    conflicting = "positiv" in source_labels and "negativ" in source_labels
+    return mixed or conflicting
+
+
+def resolve_with_llm(ticker, full_name, results):
+    # Nur die stärksten Schlagzeilen, sortiert, damit identische Lagen den LLM-Cache treffen
+    headlines = sorted(((abs(score), title) for scored in results.values() if scored for title, score in scored),
+                       reverse=True)[:NEWS_LLM_HEADLINES]
+    listing = "\n".join(f"- {title}" for _, title in sorted(headlines, key=lambda h: h[1]))
+    response = llm.chat([
+        {"role": "system", "content": "Du bist ein Sentiment-Analyse-Experte für Finanznachrichten."},
+        {"role": "user", "content": f"Aktuelle Schlagzeilen zu {full_name} ({ticker}):\n{listing}\n\n"
+                                    f"Ist das Nachrichtenbild positiv, negativ oder neutral? Antworte mit einem Wort."}
+    ], endpoint="news_sentiment", ttl=6 * 3600)
+    answer = response.strip().lower()
+    return next((l for l in ("positiv", "negativ", "neutral") if l in answer), "neutral")
+
+
+def analyse(ticker, full_name, fetch_source=fetch_source, fetch_social=fetch_social):
+    results = collect(ticker, full_name, fetch_source, fetch_social)
+
+    per_source = {}
+    for source, scored in results.items():
+        if scored is None:
+            per_source[source] = "nicht verfügbar"
+        elif not scored:
+            per_source[source] = "keine Schlagzeilen"
+        else:
+            per_source[source] = label(sum(score for _, score in scored) / len(scored))
+
+    scores = [score for scored in results.values() if scored for _, score in scored]
+    mean = sum(scores) / len(scores) if scores else 0.0
+    method = "Lexikon"
+    final = label(mean) if scores else "neutral"
+
+    if is_ambiguous(scores, set(per_source.values())):
+        try:
+            final = resolve_with_llm(ticker, full_name, results)
+            method = "GPT"
+        except Exception as e:
+            logging.error(f"GPT-Auflösung Nachrichten-Sentiment {ticker} fehlgeschlagen: {str(e)}")
+
+    return {
+        "Final": final,
+        "Final (GPT-Validiert)": final,  # bisheriger Schlüssel, bleibt für bestehende Clients erhalten
+        "Bewertung": method,
+        "Score": round(mean, 3),
+        "Schlagzeilen": len(scores),
+        **per_source
+    }
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+# Risikokennzahlen für ein Portfolio aus gespeicherten Kursreihen (price_store).
+# Die Schlusskurse aller Positionen werden auf die gemeinsamen Handelstage ausgerichtet
+# (Krypto handelt auch am Wochenende, Aktien nicht) und in eine (T, N)-Renditematrix überführt.
+# Gewichte gelten als täglich rebalanciert, die Portfolio-Rendite ist also R @ w.
+# Volatilität annualisiert mit TRADING_DAYS; VaR als positiver Verlustanteil des Portfoliowerts.
+# Monte-Carlo: multivariate Normalverteilung mit Mittelwert und Kovarianz der historischen Renditen,
+# die Pfade werden in Blöcken von höchstens PORTFOLIO_MC_CHUNK_ELEMENTS Zahlen erzeugt.
+
+import os
+from datetime import timedelta
+
+import numpy as np
+
+from price_store import EPOCH, period_start
+
+PORTFOLIO_MAX_HOLDINGS = int(os.environ.get('PORTFOLIO_MAX_HOLDINGS', '50'))
+PORTFOLIO_MC_SIMULATIONS = int(os.environ.get('PORTFOLIO_MC_SIMULATIONS', '100000'))
+PORTFOLIO_MC_MAX_SIMULATIONS = int(os.environ.get('PORTFOLIO_MC_MAX_SIMULATIONS', '1000000'))
+PORTFOLIO_MC_CHUNK_ELEMENTS = int(os.environ.get('PORTFOLIO_MC_CHUNK_ELEMENTS', '2000000'))
+TRADING_DAYS = 252
+MIN_OBSERVATIONS = 30
+
+# Wie /analyse: stock/etf aus Yahoo, bond aus Alpha Vantage, crypto aus CoinGecko
+ASSET_SOURCES = {'stock': 'yahoo', 'etf': 'yahoo', 'bond': 'alpha_vantage', 'crypto': 'coingecko'}
+
+
+def _day(value):
+    return (EPOCH + timedelta(days=int(value))).isoformat()
+
+
+def parse_holdings(raw_holdings):
+    # [{"asset_type", "ticker", "weight" | "value" | "quantity"}] -> [(asset_type, ticker, art, betrag)]
+    if not isinstance(raw_holdings, list) or not raw_holdings:
+        raise ValueError("Erwartet eine Liste von Positionen (asset_type, ticker, weight/value/quantity)")
+    if len(raw_holdings) > PORTFOLIO_MAX_HOLDINGS:
+        raise ValueError(f"Maximal {PORTFOLIO_MAX_HOLDINGS} Positionen pro Portfolio")
+
+    holdings, seen = [], set()
+    for raw in raw_holdings:
+        if not isinstance(raw, dict) or not raw.get('ticker'):
+            raise ValueError(f"Ungültige Position: {raw}")
+        asset_type = str(raw.get('asset_type', 'stock')).lower()
+        if asset_type not in ASSET_SOURCES:
+            raise ValueError(f"Unbekannter asset_type '{asset_type}' (erlaubt: {', '.join(ASSET_SOURCES)})")
+        kinds = [kind for kind in ('weight', 'value', 'quantity') if raw.get(kind) is not None]
+        if len(kinds) != 1:
+            raise ValueError(f"Position {raw['ticker']}: genau eins von weight, value oder quantity angeben")
+        try:
+            amount = float(raw[kinds[0]])
+        except (TypeError, ValueError):
+            raise ValueError(f"Position {raw['ticker']}: {kinds[0]} ist keine Zahl")
+        if not np.isfinite(amount) or amount < 0:
+            raise ValueError(f"Position {raw['ticker']}: {kinds[0]} muss eine nicht-negative Zahl sein")
+        key = (asset_type, str(raw['ticker']).upper())
+        if key in seen:
+            raise ValueError(f"Position {raw['ticker']} ist doppelt angegeben")
+        seen.add(key)
+        holdings.append((asset_type, str(raw['ticker']), kinds[0], amount))
+
+    if len({kind for _, _, kind, _ in holdings}) > 1:
+        raise ValueError("Alle Positionen müssen dieselbe Angabe nutzen (weight, value oder quantity)")
+    return holdings
+
+
+def align_closes(series, period=None):
+    # series: Liste von (n,6)-Balken -> (Tage (T,), Schlusskurse (T, N)) auf den gemeinsamen Tagen
+    start = period_start(period)
+    first_day = (start - EPOCH).days if start is not None else -np.inf
+    days = None
+    for bars in series:
+        bar_days = bars[:, 0][bars[:, 0] >= first_day]
+        days = bar_days if days is None else np.intersect1d(days, bar_days, assume_unique=True)
+    closes = np.column_stack([bars[np.searchsorted(bars[:, 0], days), 4] for bars in series])
+    return days, closes
+
+
+def weights_from(holdings, last_closes):
+    amounts = np.array([amount for _, _, _, amount in holdings])
+    if holdings[0][2] == 'quantity':
+        amounts = amounts * last_closes
+    total = amounts.sum()
+    if total <= 0:
+        raise ValueError("Summe der Positionen muss größer als 0 sein")
+    return amounts / total
+
+
+def max_drawdown(returns):
+    # returns (T, N) -> (Rückgang, Index des Hochs, Index des Tiefs) je Spalte; Index 0 = Wert vor der ersten Rendite
+    values = np.cumprod(np.vstack([np.ones((1, returns.shape[1])), 1 + returns]), axis=0)
+    drawdowns = values / np.maximum.accumulate(values, axis=0) - 1
+    trough = drawdowns.argmin(axis=0)
+    before = np.where(np.arange(len(values))[:, None] <= trough, values, -np.inf)
+    return -drawdowns.min(axis=0), before.argmax(axis=0), trough
+
+
+def horizon_returns(returns, horizon):
+    # Überlappende Renditen über horizon Tage (zusammengesetzt)
+    if horizon == 1:
+        return returns
+    log_values = np.concatenate([[0.], np.cumsum(np.log1p(returns))])
+    return np.expm1(log_values[horizon:] - log_values[:-horizon])
+
+
+def historical_var(portfolio_returns, confidence, horizon):
+    returns = horizon_returns(portfolio_returns, horizon)
+    if len(returns) < MIN_OBSERVATIONS:
+        return None
+    return round(float(-np.quantile(returns, 1 - confidence)), 6)
+
+
+def _cov_factor(cov):
+    # Cholesky; bei nur semidefiniter Kovarianz (z. B. perfekt korrelierte Positionen) über Eigenzerlegung
+    try:
+        return np.linalg.cholesky(cov)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(cov)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+
+def monte_carlo_var(mean, cov, weights, confidence, horizon, simulations, seed=None):
+    # Je Block: Z (S, horizon, N) -> Tagesrenditen der Assets -> Portfolio -> über den Horizont verzinst.
+    # Es bleiben nur die S Endrenditen je Block, der Speicher hängt also nicht von simulations ab.
+    rng = np.random.default_rng(seed)
+    factor = _cov_factor(cov)
+    n_assets = len(weights)
+    chunk = max(1, PORTFOLIO_MC_CHUNK_ELEMENTS // (horizon * n_assets))
+
+    outcomes = np.empty(simulations)
+    for offset in range(0, simulations, chunk):
+        size = min(chunk, simulations - offset)
+        shocks = rng.standard_normal((size, horizon, n_assets))
+        asset_returns = shocks @ factor.T + mean
+        portfolio_returns = asset_returns @ weights
+        outcomes[offset:offset + size] = np.expm1(np.log1p(portfolio_returns).sum(axis=1))
+    return round(float(-np.quantile(outcomes, 1 - confidence)), 6)
+
+
+def analyse(holdings, series, period='3y', confidence=0.95, horizon=1, simulations=PORTFOLIO_MC_SIMULATIONS,
+            seed=None):
+    # holdings aus parse_holdings, series: Balken je Position in derselben Reihenfolge
+    if not 0.5 <= confidence < 1:
+        raise ValueError("confidence muss zwischen 0.5 und 1 liegen")
+    if not 1 <= horizon <= TRADING_DAYS:
+        raise ValueError(f"horizon_days muss zwischen 1 und {TRADING_DAYS} liegen")
+    if not 1 <= simulations <= PORTFOLIO_MC_MAX_SIMULATIONS:
+        raise ValueError(f"simulations muss zwischen 1 und {PORTFOLIO_MC_MAX_SIMULATIONS} liegen")
+
+    days, closes = align_closes(series, period)
+    if len(days) < MIN_OBSERVATIONS + 1:
+        raise ValueError(f"Zu wenige gemeinsame Handelstage ({len(days)}) für eine Risikoanalyse")
+
+    returns = closes[1:] / closes[:-1] - 1
+    weights = weights_from(holdings, closes[-1])
+    portfolio_returns = returns @ weights
+
+    cov = np.atleast_2d(np.cov(returns, rowvar=False))
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = cov / np.outer(std, std)
+
+    asset_drawdown, _, _ = max_drawdown(returns)
+    drawdown, peak, trough = (value[0] for value in max_drawdown(portfolio_returns[:, None]))
+
+    tickers = [ticker for _, ticker, _, _ in holdings]
+    return {
+        "zeitraum": {"von": _day(days[0]), "bis": _day(days[-1]), "beobachtungen": len(returns)},
+        "positionen": [{
+            "asset_type": asset_type,
+            "ticker": ticker,
+            "gewicht": round(float(weights[j]), 6),
+            "volatilitaet": round(float(std[j] * np.sqrt(TRADING_DAYS)), 6),
+            "max_drawdown": round(float(asset_drawdown[j]), 6)
+        } for j, (asset_type, ticker, _, _) in enumerate(holdings)],
+        "volatilitaet": round(float(np.sqrt(weights @ cov @ weights * TRADING_DAYS)), 6),
+        "kovarianz": {"ticker": tickers, "matrix": np.round(cov * TRADING_DAYS, 8).tolist()},
+        "korrelation": {"ticker": tickers, "matrix": np.round(np.nan_to_num(corr), 6).tolist()},
+        "var": {
+            "konfidenz": confidence,
+            "horizont_tage": horizon,
+            "historisch": historical_var(portfolio_returns, confidence, horizon),
+            "monte_carlo": monte_carlo_var(returns.mean(axis=0), cov, weights, confidence, horizon,
+                                           simulations, seed),
+            "simulationen": simulations
+        },
+        "max_drawdown": {
+            "wert": round(float(drawdown), 6),
+            "hoch": _day(days[peak]),
+            "tief": _day(days[trough])
+        }
+    }
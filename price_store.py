@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+
+# Lokaler Kursspeicher: eine memory-mapped NumPy-Datei pro Quelle und Ticker.
+# Spalten: Tag (Tage seit 1970-01-01), Open, High, Low, Close, Volume – aufsteigend sortiert.
+# Bei jeder Anfrage werden nur die Balken nach dem letzten gespeicherten Datum nachgeladen.
+
+import os
+import re
+import json
+import time
+import fcntl
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from http_client import http_client, RateLimitExceeded
+from metrics import metrics
+
+PRICE_STORE_DIR = os.environ.get('PRICE_STORE_DIR', os.path.join('data', 'prices'))
+PRICE_STORE_HISTORY = os.environ.get('PRICE_STORE_HISTORY', '10y')            # Erstbefüllung Yahoo
+PRICE_STORE_CHECK_INTERVAL = int(os.environ.get('PRICE_STORE_CHECK_INTERVAL', '900'))  # Sekunden zwischen Delta-Abfragen
+PRICE_STORE_FULL_REFRESH_DAYS = int(os.environ.get('PRICE_STORE_FULL_REFRESH_DAYS', '30'))
+PRICE_STORE_BULK_CHUNK = int(os.environ.get('PRICE_STORE_BULK_CHUNK', '50'))  # Ticker je yf.download im Sammelabruf
+
+COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+ALPHA_COLUMNS = {
+    '1. open': 'Open',
+    '2. high': 'High',
+    '3. low': 'Low',
+    '4. close': 'Close',
+    '5. volume': 'Volume'
+}
+
+# Relative Abweichung am Überlappungsbalken, ab der eine Neuberechnung (Split/Dividende) angenommen wird
+ADJUSTMENT_TOLERANCE = 1e-6
+
+EPOCH = date(1970, 1, 1)
+
+
+def _safe_name(value):
+    return re.sub(r'[^A-Za-z0-9._-]', '_', str(value))
+
+
+def period_start(period, today=None):
+    # yfinance-Periodenangaben ('5y', '6mo', '1wk', '5d', 'ytd', 'max') in ein Startdatum übersetzen
+    today = today or date.today()
+    if period in (None, 'max'):
+        return None
+    if period == 'ytd':
+        return date(today.year, 1, 1)
+
+    match = re.fullmatch(r'(\d+)(y|mo|wk|d)', period)
+    if not match:
+        raise ValueError(f"Unbekannte Periode: {period}")
+    n, unit = int(match.group(1)), match.group(2)
+    if unit == 'y':
+        return (pd.Timestamp(today) - pd.DateOffset(years=n)).date()
+    if unit == 'mo':
+        return (pd.Timestamp(today) - pd.DateOffset(months=n)).date()
+    if unit == 'wk':
+        return today - timedelta(weeks=n)
+    return today - timedelta(days=n)
+
+
+def frame_to_bars(df):
+    # DataFrame mit DatetimeIndex und OHLCV-Spalten -> (n, 6)-Array, aufsteigend, ohne doppelte Tage
+    if df is None or df.empty:
+        return np.empty((0, 6))
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    df = df.rename(columns=ALPHA_COLUMNS)
+
+    index = pd.to_datetime(df.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    days = (index.normalize() - pd.Timestamp(EPOCH)).days.to_numpy(dtype=np.float64)
+
+    bars = np.column_stack([days] + [pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=np.float64)
+                                     if c in df.columns else np.full(len(df), np.nan) for c in COLUMNS])
+    bars = bars[~np.isnan(bars[:, 4])]
+    bars = bars[np.argsort(bars[:, 0], kind='stable')]
+    # Bei doppelten Tagen gewinnt der zuletzt gelieferte Balken
+    keep = np.append(bars[1:, 0] != bars[:-1, 0], True) if len(bars) else np.array([], dtype=bool)
+    return bars[keep]
+
+
+def bars_to_frame(bars):
+    df = pd.DataFrame(np.array(bars[:, 1:]), columns=COLUMNS,
+                      index=pd.to_datetime(bars[:, 0].astype('int64'), unit='D'))
+    df.index.name = 'Date'
+    return df
+
+
+def fetch_yahoo(ticker, start=None):
+    import yfinance as yf
+
+    http_client.acquire('yahoo')
+    with metrics.span('upstream', provider='yahoo'):
+        if start is None:
+            df = yf.download(ticker, period=PRICE_STORE_HISTORY, auto_adjust=True, progress=False)
+        else:
+            df = yf.download(ticker, start=start.isoformat(), auto_adjust=True, progress=False)
+    return frame_to_bars(df)
+
+
+def fetch_alpha_vantage(ticker, start=None, api_key=None):
+    from alpha_vantage.timeseries import TimeSeries
+
+    # 'compact' liefert die letzten 100 Handelstage – reicht für kleine Lücken und spart Kontingent
+    outputsize = 'compact' if start is not None and (date.today() - start).days < 130 else 'full'
+    ts = TimeSeries(key=api_key, output_format='pandas')
+    http_client.acquire('alpha_vantage')
+    with metrics.span('upstream', provider='alpha_vantage'):
+        data, _ = ts.get_daily(symbol=ticker, outputsize=outputsize)
+    bars = frame_to_bars(data)
+    if start is not None:
+        bars = bars[bars[:, 0] >= (start - EPOCH).days]
+    return bars
+
+
+def fetch_coingecko(ticker, start=None):
+    from services import services
+
+    # Tagesauflösung erzwingen, sonst liefert CoinGecko bei kurzen Zeiträumen Stundenwerte.
+    # Der letzte Punkt ist der aktuelle Kurs und wird als Balken des heutigen Tages gespeichert.
+    days = 365 if start is None else min(max((date.today() - start).days + 1, 2), 365)
+    http_client.acquire('coingecko')
+    with metrics.span('upstream', provider='coingecko'):
+        coin_data = services.coingecko.get_coin_market_chart_by_id(id=ticker, vs_currency='usd', days=days,
+                                                                   interval='daily')
+    prices = coin_data.get('prices', [])
+    if not prices:
+        return np.empty((0, 6))
+    df = pd.DataFrame({'Close': [p[1] for p in prices]},
+                      index=pd.to_datetime([p[0] for p in prices], unit='ms'))
+    bars = frame_to_bars(df)
+    if start is not None:
+        bars = bars[bars[:, 0] >= (start - EPOCH).days]
+    return bars
+
+
+def _split_download(df, tickers):
+    # Multi-Ticker-Download von yfinance (group_by='ticker') in Balken je Ticker zerlegen
+    result = {}
+    for ticker in tickers:
+        if isinstance(df.columns, pd.MultiIndex):
+            if ticker not in df.columns.get_level_values(0):
+                continue
+            sub = df[ticker]
+        elif len(tickers) == 1:
+            sub = df
+        else:
+            continue
+        result[ticker] = frame_to_bars(sub)
+    return result
+
+
+def fetch_yahoo_bulk(full, delta):
+    # yf.download für alle Ticker ohne Historie, einer für alle Delta-Abrufe (ab dem frühesten Startdatum im Block),
+    # jeweils in Blöcken zu PRICE_STORE_BULK_CHUNK Tickern; jeder Block verbraucht ein Yahoo-Token.
+    # Ist das Kontingent erschöpft, bleibt der Rest ungeladen und update_many lädt ihn einzeln.
+    import yfinance as yf
+
+    downloads = [(full[i:i + PRICE_STORE_BULK_CHUNK], {'period': PRICE_STORE_HISTORY})
+                 for i in range(0, len(full), PRICE_STORE_BULK_CHUNK)]
+    tickers = list(delta)
+    for i in range(0, len(tickers), PRICE_STORE_BULK_CHUNK):
+        chunk = tickers[i:i + PRICE_STORE_BULK_CHUNK]
+        downloads.append((chunk, {'start': min(delta[t] for t in chunk).isoformat()}))
+
+    result = {}
+    for chunk, window in downloads:
+        try:
+            http_client.acquire('yahoo')
+        except RateLimitExceeded as e:
+            logging.error(f"Sammelabruf yahoo abgebrochen: {str(e)}")
+            break
+        with metrics.span('upstream', provider='yahoo'):
+            df = yf.download(chunk, auto_adjust=True, progress=False, group_by='ticker', threads=True, **window)
+        result.update(_split_download(df, chunk))
+    return result
+
+
+def fetch_coingecko_bulk(full, delta):
+    # Ist nur der heutige Balken offen, reicht ein gemeinsamer /simple/price-Aufruf für alle Coins
+    from services import services
+
+    today = date.today()
+    intraday = [ticker for ticker, start in delta.items() if start >= today - timedelta(days=1)]
+    if not intraday:
+        return {}
+
+    http_client.acquire('coingecko')
+    with metrics.span('upstream', provider='coingecko'):
+        quotes = services.coingecko.get_price(ids=intraday, vs_currencies='usd')
+    day = float((today - EPOCH).days)
+    result = {}
+    for ticker in intraday:
+        price = quotes.get(ticker, {}).get('usd')
+        if price is not None:
+            result[ticker] = np.array([[day, np.nan, np.nan, np.nan, float(price), np.nan]])
+    return result
+
+
+FETCHERS = {
+    'yahoo': fetch_yahoo,
+    'alpha_vantage': fetch_alpha_vantage,
+    'coingecko': fetch_coingecko
+}
+
+BULK_FETCHERS = {
+    'yahoo': fetch_yahoo_bulk,
+    'coingecko': fetch_coingecko_bulk
+}
+
+
+class PriceStore:
+
+    def __init__(self, base_dir=PRICE_STORE_DIR):
+        self.base_dir = base_dir
+
+    def path(self, source, ticker):
+        return os.path.join(self.base_dir, f"{_safe_name(source)}__{_safe_name(ticker.upper())}")
+
+    def load(self, source, ticker):
+        path = self.path(source, ticker) + ".npy"
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r')
+
+    def tickers(self, source):
+        # Alle gespeicherten Ticker einer Quelle (Dateinamen ohne Indikator- und Temp-Dateien)
+        prefix = f"{_safe_name(source)}__"
+        try:
+            names = os.listdir(self.base_dir)
+        except OSError:
+            return []
+        return sorted(name[len(prefix):-len(".npy")] for name in names
+                      if name.startswith(prefix) and name.endswith(".npy")
+                      and not name.endswith((".ind.npy", ".tmp.npy")))
+
+    def meta(self, source, ticker):
+        try:
+            with open(self.path(source, ticker) + ".json", encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write(self, source, ticker, bars, meta):
+        os.makedirs(self.base_dir, exist_ok=True)
+        path = self.path(source, ticker)
+        tmp = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, np.ascontiguousarray(bars, dtype=np.float64))
+        os.replace(tmp, path + ".npy")
+        with open(f"{path}.{os.getpid()}.tmp.json", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(f"{path}.{os.getpid()}.tmp.json", path + ".json")
+
+    def plan(self, source, ticker, force=False, stored=None, meta=None):
+        # ('fresh', None): kürzlich geprüft; ('full', None): Historie komplett laden;
+        # ('delta', start): ab start nachladen (vorletzter Balken als Abgleichspunkt)
+        stored = self.load(source, ticker) if stored is None else stored
+        meta = self.meta(source, ticker) if meta is None else meta
+        now = time.time()
+
+        if stored is None or not len(stored):
+            return 'full', None
+        if not force and now - meta.get("checked_at", 0) < PRICE_STORE_CHECK_INTERVAL:
+            return 'fresh', None
+        if force or now - meta.get("full_refresh_at", 0) > PRICE_STORE_FULL_REFRESH_DAYS * 86400:
+            return 'full', None
+        # Der letzte Balken kann ein unvollständiger Intraday-Balken sein: Abgleich am vorletzten
+        anchor = stored[-2] if len(stored) > 1 else stored[-1]
+        return 'delta', EPOCH + timedelta(days=int(anchor[0]))
+
+    def update(self, source, ticker, force=False, fetch=None, **fetch_kwargs):
+        # Nur neue Balken nachladen; bei Kursanpassungen (Split/Dividende) komplett neu laden.
+        # Rückgabe: (bars, neue_balken)
+        fetch = fetch or FETCHERS[source]
+        os.makedirs(self.base_dir, exist_ok=True)
+
+        with open(self.path(source, ticker) + ".lock", 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                stored = self.load(source, ticker)
+                meta = self.meta(source, ticker)
+                now = time.time()
+                mode, start = self.plan(source, ticker, force, stored, meta)
+
+                if mode == 'fresh':
+                    return stored, 0
+
+                if mode == 'delta':
+                    anchor_day = float((start - EPOCH).days)
+                    anchor = stored[stored[:, 0] == anchor_day][0]
+                    fresh = fetch(ticker, start=start, **fetch_kwargs)
+
+                    overlap = fresh[fresh[:, 0] == anchor_day]
+                    if len(overlap) and abs(overlap[0, 4] - anchor[4]) > ADJUSTMENT_TOLERANCE * abs(anchor[4]):
+                        logging.warning(f"Kursanpassung erkannt für {ticker}, lade Historie neu")
+                    else:
+                        # Der letzte Balken wird durch die frisch geladene Version ersetzt
+                        kept = stored[stored[:, 0] <= anchor_day]
+                        new_bars = fresh[fresh[:, 0] > anchor_day]
+                        if not len(new_bars):
+                            new_bars = stored[stored[:, 0] > anchor_day]
+                        bars = np.concatenate([np.asarray(kept), new_bars])
+                        meta["checked_at"] = now
+                        self.write(source, ticker, bars, meta)
+                        return self.load(source, ticker), max(len(bars) - len(stored), 0)
+
+                bars = fetch(ticker, start=None, **fetch_kwargs)
+                if not len(bars):
+                    return (stored if stored is not None else bars), 0
+                self.write(source, ticker, bars, {"checked_at": now, "full_refresh_at": now})
+                return self.load(source, ticker), len(bars)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def update_many(self, source, tickers, **fetch_kwargs):
+        # Mehrere Ticker mit möglichst wenigen Upstream-Aufrufen aktualisieren.
+        # Rückgabe: dict ticker -> bars (oder Exception bei Fehlern)
+        tickers = list(dict.fromkeys(tickers))
+        bulk = BULK_FETCHERS.get(source)
+
+        plans = {ticker: self.plan(source, ticker) for ticker in tickers}
+        prefetched = {}
+        if bulk is not None:
+            full = [t for t, (mode, _) in plans.items() if mode == 'full']
+            delta = {t: start for t, (mode, start) in plans.items() if mode == 'delta'}
+            try:
+                prefetched = bulk(full, delta)
+            except Exception as e:
+                logging.error(f"Sammelabruf {source} fehlgeschlagen, lade einzeln: {str(e)}")
+
+        results = {}
+        for ticker in tickers:
+            def fetch(symbol, start=None, _ticker=ticker, **kwargs):
+                bars = prefetched.get(_ticker)
+                mode, planned_start = plans[_ticker]
+                # Vorab geladene Daten nur nutzen, wenn sie den angefragten Zeitraum abdecken
+                if bars is None or (start is None and mode != 'full') or (start is not None and start != planned_start):
+                    return FETCHERS[source](symbol, start=start, **kwargs)
+                return bars
+
+            try:
+                results[ticker], _ = self.update(source, ticker, fetch=fetch, **fetch_kwargs)
+            except Exception as e:
+                logging.error(f"Aktualisierung {source} {ticker} fehlgeschlagen: {str(e)}")
+                stored = self.load(source, ticker)
+                results[ticker] = stored if stored is not None else e
+        return results
+
+    def bars(self, source, ticker, **fetch_kwargs):
+        # Aktualisiert den Speicher; schlägt der Abruf fehl, werden die gespeicherten Kurse geliefert
+        try:
+            bars, _ = self.update(source, ticker, **fetch_kwargs)
+        except Exception as e:
+            bars = self.load(source, ticker)
+            if bars is None:
+                raise
+            logging.error(f"Delta-Abruf {source} {ticker} fehlgeschlagen, nutze gespeicherte Kurse: {str(e)}")
+        return bars
+
+    def frame(self, source, ticker, period=None, **fetch_kwargs):
+        # Gewünschten Zeitraum als DataFrame (Index 'Date') im Format von yf.download
+        bars = self.bars(source, ticker, **fetch_kwargs)
+        return bars_to_frame(slice_period(bars, period))
+
+
+def slice_period(bars, period):
+    start = period_start(period)
+    if start is None or not len(bars):
+        return bars
+    return bars[np.searchsorted(bars[:, 0], (start - EPOCH).days):]
+
+
+price_store = PriceStore()
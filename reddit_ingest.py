@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+# Reddit-Ingestion mit lokalem Beitragsspeicher (SQLite).
+# Beiträge aus subreddit.search werden gestreamt und über ihre Reddit-ID dedupliziert gespeichert,
+# das Sentiment wird je Beitrag genau einmal bewertet und mitgespeichert. Unbewertete Beiträge gehen
+# in Stapeln an das LLM, deren Größe ein Token-Budget begrenzt. Das Ergebnis für Subreddit + Suchbegriff
+# wird aus den gespeicherten Einzelbewertungen zusammengezählt.
+# Wiederholte Anfragen innerhalb von REDDIT_QUERY_TTL rufen weder Reddit noch das LLM auf.
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+import llm
+from services import services
+from metrics import metrics
+
+REDDIT_DB_PATH = os.environ.get('REDDIT_DB_PATH', os.path.join('data', 'reddit.sqlite'))
+REDDIT_QUERY_TTL = int(os.environ.get('REDDIT_QUERY_TTL', '900'))          # Sekunden bis zur nächsten Suche
+REDDIT_BATCH_TOKENS = int(os.environ.get('REDDIT_BATCH_TOKENS', '3000'))    # Token-Budget je LLM-Stapel
+REDDIT_POST_MAX_CHARS = int(os.environ.get('REDDIT_POST_MAX_CHARS', '800'))
+REDDIT_RETENTION_DAYS = int(os.environ.get('REDDIT_RETENTION_DAYS', '30'))  # so lange nicht mehr gesehene Beiträge werden gelöscht
+REDDIT_PURGE_EVERY = int(os.environ.get('REDDIT_PURGE_EVERY', '200'))      # Suchen je Aufräumlauf
+REDDIT_SCORE_BACKOFF = int(os.environ.get('REDDIT_SCORE_BACKOFF', '900'))   # Sekunden Pause je Fehlversuch
+REDDIT_SCORE_MAX_ATTEMPTS = int(os.environ.get('REDDIT_SCORE_MAX_ATTEMPTS', '5'))  # danach bleibt der Beitrag unbewertet
+CHARS_PER_TOKEN = 4  # grobe Schätzung, wie im LLM-Gateway
+
+LABELS = ("positiv", "neutral", "negativ")
+LABEL_SCORES = {"positiv": 1, "neutral": 0, "negativ": -1}
+AGGREGATE_THRESHOLD = 0.15  # Saldo (positiv - negativ) / Anzahl, ab dem die Tendenz nicht mehr neutral ist
+
+BATCH_PROMPT = """Bewerte das Sentiment jedes Reddit-Beitrags zum Thema "{keyword}" als "positiv", "neutral" oder "negativ".
+Antworte ausschließlich mit einem JSON-Objekt {{"<id>": "<sentiment>", ...}} für alle Beiträge.
+
+{posts}"""
+
+
+def post_text(title, selftext):
+    return f"{title} {selftext or ''}".strip()[:REDDIT_POST_MAX_CHARS]
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def pack_batches(posts, budget=REDDIT_BATCH_TOKENS):
+    # posts: [(id, text)] -> Liste von Stapeln, jeder Stapel bleibt (bis auf Einzelbeiträge) unter dem Budget
+    overhead = estimate_tokens(BATCH_PROMPT)
+    batches, current, used = [], [], overhead
+    for post_id, text in posts:
+        cost = estimate_tokens(text) + 4
+        if current and used + cost > budget:
+            batches.append(current)
+            current, used = [], overhead
+        current.append((post_id, text))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_labels(response):
+    # Antwort des LLM -> {id: label}; Text vor/nach dem JSON-Objekt wird ignoriert
+    start, end = response.find('{'), response.rfind('}')
+    if start < 0 or end < start:
+        raise ValueError(f"Keine JSON-Antwort: {response[:80]}")
+    labels = {}
+    for post_id, label in json.loads(response[start:end + 1]).items():
+        label = str(label).strip().lower()
+        if label in LABELS:
+            labels[str(post_id)] = label
+    return labels
+
+
+class RedditStore:
+
+    def __init__(self, path=REDDIT_DB_PATH, retention_days=REDDIT_RETENTION_DAYS, purge_every=REDDIT_PURGE_EVERY):
+        self.path = path
+        self.retention_days = retention_days
+        self.purge_every = purge_every
+        self._writes = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS posts (
+                    id TEXT PRIMARY KEY,
+                    subreddit TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    created_utc REAL,
+                    fetched_at REAL NOT NULL,
+                    sentiment TEXT,
+                    scored_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS query_posts (
+                    subreddit TEXT NOT NULL,
+                    keyword TEXT NOT NULL,
+                    post_id TEXT NOT NULL,
+                    PRIMARY KEY (subreddit, keyword, post_id)
+                );
+                CREATE TABLE IF NOT EXISTS queries (
+                    subreddit TEXT NOT NULL,
+                    keyword TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (subreddit, keyword)
+                );
+                CREATE TABLE IF NOT EXISTS score_attempts (
+                    post_id TEXT PRIMARY KEY,
+                    attempts INTEGER NOT NULL,
+                    attempted_at REAL NOT NULL
+                );
+            """)
+            self._local.conn = conn
+        return conn
+
+    def query_age(self, subreddit, keyword):
+        row = self._conn().execute("SELECT fetched_at FROM queries WHERE subreddit = ? AND keyword = ?",
+                                   (subreddit, keyword)).fetchone()
+        return None if row is None else time.time() - row[0]
+
+    def add_posts(self, subreddit, keyword, posts):
+        # posts: Iterator über (id, text, created_utc); bekannte IDs werden nur der Suche zugeordnet und
+        # bekommen einen neuen fetched_at (zuletzt gesehen), Text und Bewertung bleiben.
+        # Keine umschließende Transaktion, damit der Schreib-Lock nicht über das Nachladen von Reddit gehalten wird.
+        now = time.time()
+        conn = self._conn()
+        new = 0
+        for post_id, text, created_utc in posts:
+            if conn.execute("SELECT 1 FROM posts WHERE id = ?", (post_id,)).fetchone() is None:
+                new += 1
+            conn.execute("""
+                INSERT INTO posts (id, subreddit, text, created_utc, fetched_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET fetched_at = excluded.fetched_at
+            """, (post_id, subreddit, text, created_utc, now))
+            conn.execute("INSERT OR IGNORE INTO query_posts (subreddit, keyword, post_id) VALUES (?, ?, ?)",
+                         (subreddit, keyword, post_id))
+        conn.execute("INSERT OR REPLACE INTO queries (subreddit, keyword, fetched_at) VALUES (?, ?, ?)",
+                     (subreddit, keyword, now))
+        self._maybe_purge()
+        return new
+
+    def _maybe_purge(self):
+        if self.purge_every <= 0 or self.retention_days <= 0:
+            return
+        with self._lock:
+            self._writes += 1
+            if self._writes < self.purge_every:
+                return
+            self._writes = 0
+        try:
+            self.purge(self.retention_days * 86400)
+        except sqlite3.Error as e:
+            logging.error(f"Reddit-Speicher aufräumen fehlgeschlagen: {str(e)}")
+
+    def purge(self, max_age):
+        # Beiträge, die seit max_age Sekunden in keiner Suche mehr vorkamen (fetched_at = zuletzt gesehen),
+        # samt Zuordnungen und alter Suchen löschen; ältere Treffer, die Reddit weiter liefert, bleiben bewertet
+        cutoff = time.time() - max_age
+        conn = self._conn()
+        deleted = conn.execute("DELETE FROM posts WHERE fetched_at < ?", (cutoff,)).rowcount
+        conn.execute("DELETE FROM query_posts WHERE post_id NOT IN (SELECT id FROM posts)")
+        conn.execute("DELETE FROM score_attempts WHERE post_id NOT IN (SELECT id FROM posts)")
+        conn.execute("DELETE FROM queries WHERE fetched_at < ?", (cutoff,))
+        return deleted
+
+    def unscored(self, subreddit, keyword, limit):
+        # Beiträge nach fehlgeschlagener Bewertung erst nach attempts * REDDIT_SCORE_BACKOFF Sekunden erneut,
+        # nach REDDIT_SCORE_MAX_ATTEMPTS Versuchen gar nicht mehr
+        return self._conn().execute("""
+            SELECT p.id, p.text FROM posts p JOIN query_posts q ON q.post_id = p.id
+            LEFT JOIN score_attempts a ON a.post_id = p.id
+            WHERE q.subreddit = ? AND q.keyword = ? AND p.sentiment IS NULL
+              AND (a.post_id IS NULL OR (a.attempts < ? AND a.attempted_at + a.attempts * ? <= ?))
+            ORDER BY p.created_utc DESC LIMIT ?
+        """, (subreddit, keyword, REDDIT_SCORE_MAX_ATTEMPTS, REDDIT_SCORE_BACKOFF, time.time(), limit)).fetchall()
+
+    def set_sentiments(self, labels):
+        now = time.time()
+        conn = self._conn()
+        conn.executemany("UPDATE posts SET sentiment = ?, scored_at = ? WHERE id = ?",
+                         [(label, now, post_id) for post_id, label in labels.items()])
+        conn.executemany("DELETE FROM score_attempts WHERE post_id = ?", [(post_id,) for post_id in labels])
+
+    def record_failures(self, post_ids):
+        # Fehlgeschlagene oder unlesbare Bewertung vermerken, damit der Stapel nicht bei jeder Anfrage erneut ans LLM geht
+        now = time.time()
+        self._conn().executemany("""
+            INSERT INTO score_attempts (post_id, attempts, attempted_at) VALUES (?, 1, ?)
+            ON CONFLICT (post_id) DO UPDATE SET attempts = attempts + 1, attempted_at = excluded.attempted_at
+        """, [(post_id, now) for post_id in post_ids])
+
+    def posts(self, subreddit, keyword, limit):
+        return self._conn().execute("""
+            SELECT p.id, p.text, p.sentiment FROM posts p JOIN query_posts q ON q.post_id = p.id
+            WHERE q.subreddit = ? AND q.keyword = ?
+            ORDER BY p.created_utc DESC LIMIT ?
+        """, (subreddit, keyword, limit)).fetchall()
+
+
+reddit_store = RedditStore()
+
+
+def fetch_posts(subreddit_name, keyword, limit):
+    # praw lädt seitenweise beim Iterieren; Beiträge gehen direkt in den Speicher, ohne Zwischenliste
+    with metrics.span('upstream', provider='reddit'):
+        search = services.reddit.subreddit(subreddit_name).search(keyword, limit=limit)
+        return reddit_store.add_posts(subreddit_name, keyword,
+                                      ((post.id, post_text(post.title, post.selftext), post.created_utc)
+                                       for post in search))
+
+
+def score_posts(posts, keyword):
+    # Unbewertete Beiträge in Stapeln bewerten; fehlende oder fehlerhafte Antworten bleiben offen
+    batches = pack_batches(posts)
+    prompts = [[
+        {"role": "system", "content": "Du bewertest das Sentiment von Reddit-Beiträgen präzise und knapp."},
+        {"role": "user", "content": BATCH_PROMPT.format(
+            keyword=keyword, posts="\n".join(f"[{post_id}] {text}" for post_id, text in batch))}
+    ] for batch in batches]
+
+    labels = {}
+    failed = []
+    for batch, response in zip(batches, llm.gateway.chat_many(prompts, endpoint="reddit_post_sentiment")):
+        ids = {post_id for post_id, _ in batch}
+        if isinstance(response, Exception):
+            logging.error(f"Reddit-Bewertung fehlgeschlagen ({len(batch)} Beiträge): {str(response)}")
+            failed.extend(ids)
+            continue
+        try:
+            answer = parse_labels(response)
+        except ValueError as e:
+            logging.error(f"Reddit-Bewertung nicht lesbar: {str(e)}")
+            failed.extend(ids)
+            continue
+        labels.update({post_id: label for post_id, label in answer.items() if post_id in ids})
+        failed.extend(ids - set(answer))
+
+    reddit_store.set_sentiments(labels)
+    if failed:
+        reddit_store.record_failures(failed)
+    return len(labels)
+
+
+def aggregate(rows):
+    counts = {label: 0 for label in LABELS}
+    for _, _, sentiment in rows:
+        if sentiment in counts:
+            counts[sentiment] += 1
+    scored = sum(counts.values())
+    balance = sum(LABEL_SCORES[label] * n for label, n in counts.items()) / scored if scored else 0.0
+    if not scored:
+        overall = None
+    elif balance > AGGREGATE_THRESHOLD:
+        overall = "positiv"
+    elif balance < -AGGREGATE_THRESHOLD:
+        overall = "negativ"
+    else:
+        overall = "neutral"
+    return {"sentiment": overall, "saldo": round(balance, 3), "verteilung": counts, "bewertet": scored}
+
+
+def subreddit_sentiment(subreddit_name, keyword, limit=50):
+    subreddit_name, keyword = subreddit_name.lower(), keyword.lower()
+    new_posts = 0
+    age = reddit_store.query_age(subreddit_name, keyword)
+    if age is None or age > REDDIT_QUERY_TTL:
+        new_posts = fetch_posts(subreddit_name, keyword, limit)
+
+    pending = reddit_store.unscored(subreddit_name, keyword, limit)
+    newly_scored = score_posts(pending, keyword) if pending else 0
+
+    rows = reddit_store.posts(subreddit_name, keyword, limit)
+    return {
+        **aggregate(rows),
+        "beitraege": len(rows),
+        "neu_geladen": new_posts,
+        "neu_bewertet": newly_scored,
+        "beispiele": [text for _, text, _ in rows[:5]]
+    }
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+# Antwort-Cache für Flask-Endpunkte mit Frische-Regel je Route.
+# Liefert ETag/Last-Modified, beantwortet bedingte Anfragen mit 304 und
+# aktualisiert abgelaufene Einträge im Hintergrund (stale-while-revalidate).
+# Gespeichert wird im gemeinsamen SQLite-Cache, alle Worker teilen sich die Einträge.
+# Wie im Funktions-Cache werden Fehler nie gespeichert: Antworten mit Fehlerwerten (cache.is_failure),
+# "Fehler"-Schlüsseln oder Platzhaltern wie "Prognosedaten nicht verfügbar" gehen mit no-store raus,
+# ebenso Antworten, die per mark_degraded() als Notlösung markiert sind (z. B. GPT-Schätzung statt Daten).
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from email.utils import formatdate
+
+from flask import request, g, Response
+
+from cache import cache_store, record, is_failure
+
+NAMESPACE = 'response'
+REFRESH_ENVIRON_KEY = 'response_cache.refresh'
+DEGRADED_VALUES = {"nicht verfügbar", "Prognosedaten nicht verfügbar", "Prognose-Kapazität ausgelastet"}
+
+
+def mark_degraded():
+    # Aktuelle Antwort nicht cachen (Fallback-Werte, die nicht wie Fehler aussehen)
+    g.response_cache_degraded = True
+
+
+def is_degraded(payload):
+    if isinstance(payload, dict):
+        return "Fehler" in payload or any(is_degraded(v) for v in payload.values())
+    if isinstance(payload, list):
+        return any(is_degraded(v) for v in payload)
+    if isinstance(payload, str):
+        return payload in DEGRADED_VALUES or is_failure(payload)
+    return False
+
+
+class ResponseCache:
+
+    def __init__(self, app=None, policies=None, store=None):
+        self.policies = {}
+        self.store = store or cache_store
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app, policies)
+
+    def init_app(self, app, policies=None):
+        # policies: Endpunktname -> (max_age, stale_while_revalidate) in Sekunden
+        self.app = app
+        self.policies.update(policies or {})
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def _key(self):
+        return request.full_path
+
+    def _policy(self):
+        if request.method != 'GET' or request.endpoint not in self.policies:
+            return None
+        return self.policies[request.endpoint]
+
+    def _before_request(self):
+        policy = self._policy()
+        if policy is None:
+            return None
+
+        g.response_cache_key = self._key()
+        if request.environ.get(REFRESH_ENVIRON_KEY):
+            return None
+
+        max_age, stale_while_revalidate = policy
+        try:
+            entry = self.store.get(NAMESPACE, g.response_cache_key, allow_stale=True)
+        except Exception as e:
+            logging.error(f"Antwort-Cache Lesefehler {g.response_cache_key}: {str(e)}")
+            entry = None
+
+        if entry is None:
+            record(NAMESPACE, "misses")
+            return None
+
+        cached, stored_at, expires_at = entry
+        now = time.time()
+        if now >= expires_at + stale_while_revalidate:
+            record(NAMESPACE, "misses")
+            return None
+
+        state = 'HIT'
+        if now >= expires_at:
+            state = 'STALE'
+            self._refresh_async(g.response_cache_key)
+        record(NAMESPACE, "hits")
+
+        g.response_cache_served = True
+        response = Response(cached["body"], status=cached["status"], mimetype=cached["mimetype"])
+        self._decorate(response, cached["etag"], stored_at, max_age, stale_while_revalidate)
+        response.headers['Age'] = str(int(max(0, now - stored_at)))
+        response.headers['X-Cache'] = state
+        return response.make_conditional(request)
+
+    def _after_request(self, response):
+        key = g.pop('response_cache_key', None)
+        if key is None or g.pop('response_cache_served', False):
+            return response
+
+        max_age, stale_while_revalidate = self.policies[request.endpoint]
+        if response.status_code != 200 or response.is_streamed or response.direct_passthrough:
+            return response
+
+        body = response.get_data()
+        if g.pop('response_cache_degraded', False) or self._degraded_body(response, body):
+            response.headers['Cache-Control'] = 'no-store'
+            response.headers['X-Cache'] = 'BYPASS'
+            return response
+
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        now = time.time()
+        try:
+            self.store.set(NAMESPACE, key, {
+                "body": body.decode('utf-8'),
+                "status": response.status_code,
+                "mimetype": response.mimetype,
+                "etag": etag
+            }, max_age)
+        except Exception as e:
+            logging.error(f"Antwort-Cache Schreibfehler {key}: {str(e)}")
+
+        self._decorate(response, etag, now, max_age, stale_while_revalidate)
+        response.headers['X-Cache'] = 'MISS'
+        return response.make_conditional(request)
+
+    def _degraded_body(self, response, body):
+        if not response.is_json:
+            return False
+        try:
+            return is_degraded(json.loads(body))
+        except ValueError:
+            return True
+
+    def _decorate(self, response, etag, stored_at, max_age, stale_while_revalidate):
+        response.set_etag(etag)
+        response.headers['Last-Modified'] = formatdate(stored_at, usegmt=True)
+        response.headers['Cache-Control'] = f"public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}"
+
+    def _refresh_async(self, key):
+        # Nur ein Refresh pro Schlüssel und Prozess gleichzeitig
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def _run():
+            try:
+                with self.app.test_client() as client:
+                    client.get(key, environ_overrides={REFRESH_ENVIRON_KEY: True})
+            except Exception as e:
+                logging.error(f"Hintergrund-Aktualisierung {key} fehlgeschlagen: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=_run, name='response-cache-refresh', daemon=True).start()
+
+    def warm(self, path):
+        # Eintrag synchron neu berechnen (z. B. aus dem Scheduler)
+        with self.app.test_client() as client:
+            return client.get(path, environ_overrides={REFRESH_ENVIRON_KEY: True}).status_code
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+# Hintergrund-Scheduler für Prefetch-Jobs (Kurse, Fundamentaldaten, Makro, Rohstoffe).
+# Läuft als Daemon-Thread neben Flask. Über einen Datei-Lock übernimmt immer nur ein
+# Prozess (z. B. ein gunicorn-Worker) die Ausführung, die anderen warten als Reserve.
+# Zeitpläne im Cron-Format: "Minute Stunde Tag Monat Wochentag" (0 = Sonntag).
+
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', '0') == '1'
+SCHEDULER_TZ = os.environ.get('SCHEDULER_TZ', 'Europe/Berlin')
+SCHEDULER_LOCK_PATH = os.environ.get('SCHEDULER_LOCK_PATH', os.path.join('data', 'scheduler.lock'))
+WATCHLIST_PATH = os.environ.get('WATCHLIST_PATH', 'watchlist.json')
+
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+
+def _parse_field(expr, low, high):
+    values = set()
+    for part in expr.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+        if part == '*':
+            start, end = low, high
+        elif '-' in part:
+            start, end = (int(v) for v in part.split('-'))
+        else:
+            start = end = int(part)
+            if step > 1:
+                end = high
+        if start < low or end > high or start > end:
+            raise ValueError(f"Cron-Feld außerhalb des Bereichs {low}-{high}: {expr}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+
+    def __init__(self, expr):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron-Ausdruck braucht 5 Felder: {expr}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(f, low, high) for f, (low, high) in zip(fields, CRON_FIELDS))
+        # Wie bei cron: sind Tag und Wochentag eingeschränkt, reicht einer der beiden
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def _day_matches(self, moment):
+        day = moment.day in self.days
+        weekday = (moment.isoweekday() % 7) in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment):
+        # Nächster passender Zeitpunkt strikt nach moment (minutengenau)
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=5 * 366)  # deckt auch Schaltjahres-Termine ab
+        while candidate < limit:
+            if candidate.month not in self.months:
+                candidate = (candidate.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"Cron-Ausdruck trifft nie zu: {self.expr}")
+
+
+def load_watchlist(path=WATCHLIST_PATH):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logging.warning(f"Watchlist {path} nicht gefunden, Prefetch ohne Einträge")
+        return {}
+    except ValueError as e:
+        logging.error(f"Watchlist {path} ist kein gültiges JSON: {str(e)}")
+        return {}
+
+
+class Scheduler:
+
+    def __init__(self, tz=SCHEDULER_TZ, lock_path=SCHEDULER_LOCK_PATH):
+        self.tz = ZoneInfo(tz)
+        self.lock_path = lock_path
+        self.jobs = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+        self._lock = threading.Lock()
+
+    def add(self, name, cron, fn):
+        with self._lock:
+            self.jobs[name] = {
+                "name": name,
+                "cron": CronSchedule(cron),
+                "fn": fn,
+                "next_run": None,
+                "last_run": None,
+                "last_duration": None,
+                "last_error": None,
+                "runs": 0
+            }
+
+    def now(self):
+        return datetime.now(self.tz)
+
+    def wait(self, seconds):
+        # Für Jobs: pausieren, aber beim Beenden sofort aufwachen. True = Scheduler wird gestoppt
+        return self._stop.wait(seconds)
+
+    @property
+    def stopping(self):
+        return self._stop.is_set()
+
+    def _acquire_leadership(self):
+        if self._lock_file is not None:
+            return True
+        os.makedirs(os.path.dirname(self.lock_path) or '.', exist_ok=True)
+        lock_file = open(self.lock_path, 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        lock_file.write(str(os.getpid()))
+        lock_file.flush()
+        self._lock_file = lock_file
+        logging.info(f"Scheduler läuft in Prozess {os.getpid()}")
+        return True
+
+    def run_job(self, name):
+        job = self.jobs[name]
+        started = time.monotonic()
+        job["last_run"] = self.now().isoformat()
+        try:
+            job["fn"]()
+            job["last_error"] = None
+        except Exception as e:
+            logging.error(f"Scheduler-Job {name} fehlgeschlagen: {str(e)}")
+            job["last_error"] = str(e)
+        job["last_duration"] = round(time.monotonic() - started, 3)
+        job["runs"] += 1
+
+    def _loop(self):
+        while not self._stop.is_set():
+            if not self._acquire_leadership():
+                # Ein anderer Prozess führt die Jobs aus; später erneut prüfen, falls er wegfällt
+                self._stop.wait(60)
+                continue
+
+            now = self.now()
+            for job in self.jobs.values():
+                if job["next_run"] is None:
+                    job["next_run"] = job["cron"].next_after(now)
+
+            due = sorted((job for job in self.jobs.values() if job["next_run"] <= now), key=lambda j: j["next_run"])
+            for job in due:
+                if self._stop.is_set():
+                    break
+                self.run_job(job["name"])
+                job["next_run"] = job["cron"].next_after(self.now())
+
+            upcoming = min((job["next_run"] for job in self.jobs.values()), default=None)
+            timeout = 60 if upcoming is None else min(60, max(1.0, (upcoming - self.now()).total_seconds()))
+            self._stop.wait(timeout)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='prefetch-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def status(self):
+        return {
+            "enabled": self._thread is not None and self._thread.is_alive(),
+            "leader": self._lock_file is not None,
+            "jobs": [{
+                "name": job["name"],
+                "cron": job["cron"].expr,
+                "next_run": job["next_run"].isoformat() if job["next_run"] else None,
+                "last_run": job["last_run"],
+                "last_duration": job["last_duration"],
+                "last_error": job["last_error"],
+                "runs": job["runs"]
+            } for job in self.jobs.values()]
+        }
+
+
+scheduler = Scheduler()
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+# Screener über viele Ticker gleichzeitig, direkt auf dem lokalen Kursspeicher.
+# Die letzten SCREENER_LOOKBACK_BARS Balken aller Ticker werden rechtsbündig in ein (T, N)-Panel gelegt
+# (Zeile -1 = jeweils letzter gespeicherter Balken), damit jede Spalte eine lückenlose Reihe bleibt.
+# MA50/MA100/MA200 und RSI der letzten Zeile rechnet indicators.compute_latest für alle Spalten auf einmal
+# (Fenstermittel bzw. Matrix-Vektor-Produkt statt Schritt für Schritt). Beim RSI reicht das Rückblickfenster,
+# weil das Gewicht älterer Balken (13/14)^T verschwindend klein ist.
+# Die Kursenden werden je Ticker im Prozess gehalten und nur neu gelesen, wenn sich die Datei geändert hat.
+# Filter: Bedingungen wie "close>ma200 and rsi<30" oder "close>=1.05*ma50", verknüpft mit "and" bzw. ",".
+
+import os
+import re
+import time
+from datetime import timedelta
+
+import numpy as np
+
+from price_store import price_store, FETCHERS, EPOCH
+from indicators import compute_latest
+
+SCREENER_LOOKBACK_BARS = int(os.environ.get('SCREENER_LOOKBACK_BARS', '750'))
+SCREENER_MAX_TICKERS = int(os.environ.get('SCREENER_MAX_TICKERS', '5000'))
+
+BAR_FIELDS = {'open': 1, 'high': 2, 'low': 3, 'close': 4, 'volume': 5}
+INDICATOR_FIELDS = {'ma50': 'MA50', 'ma100': 'MA100', 'ma200': 'MA200', 'rsi': 'RSI'}
+FIELDS = list(BAR_FIELDS) + list(INDICATOR_FIELDS)
+
+OPERATORS = {
+    '<=': np.less_equal, '>=': np.greater_equal, '==': np.equal, '!=': np.not_equal,
+    '<': np.less, '>': np.greater
+}
+CONDITION_PATTERN = re.compile(r'^(.+?)(<=|>=|==|!=|<|>)(.+)$')
+SPLIT_PATTERN = re.compile(r'\s+and\s+|,', re.IGNORECASE)
+
+
+def _parse_operand(text):
+    # "ma200", "30", "1.05*ma200" -> (Faktor, Feld oder None)
+    factor, field = 1.0, None
+    for part in text.split('*'):
+        part = part.strip().lower()
+        if part in FIELDS and field is None:
+            field = part
+            continue
+        try:
+            factor *= float(part)
+        except ValueError:
+            raise ValueError(f"Unbekanntes Feld oder Zahl im Filter: '{part}' (erlaubt: {', '.join(FIELDS)})")
+    return factor, field
+
+
+def parse_filter(expr):
+    conditions = []
+    for clause in SPLIT_PATTERN.split(expr or ''):
+        clause = clause.strip()
+        if not clause:
+            continue
+        match = CONDITION_PATTERN.match(clause.replace(' ', ''))
+        if not match:
+            raise ValueError(f"Ungültige Bedingung: '{clause}'")
+        left, op, right = match.groups()
+        conditions.append((_parse_operand(left), op, _parse_operand(right)))
+    return conditions
+
+
+_tails = {}  # (source, ticker) -> (mtime_ns, lookback, letzte Balken)
+
+
+def _tail(source, ticker, lookback):
+    path = price_store.path(source, ticker) + ".npy"
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _tails.get((source, ticker.upper()))
+    if cached is not None and cached[0] == mtime and cached[1] == lookback:
+        return cached[2]
+    bars = price_store.load(source, ticker)
+    if bars is None:
+        return None
+    tail = np.array(bars[-lookback:])
+    _tails[(source, ticker.upper())] = (mtime, lookback, tail)
+    return tail
+
+
+def load_panel(source, tickers, lookback=SCREENER_LOOKBACK_BARS):
+    # Nur gespeicherte Kurse (kein Download); Ticker ohne Historie kommen in missing
+    found, missing, series = [], [], []
+    for ticker in tickers:
+        bars = _tail(source, ticker, lookback)
+        if bars is None or not len(bars):
+            missing.append(ticker)
+            continue
+        found.append(ticker)
+        series.append(bars)
+
+    length = max((len(bars) for bars in series), default=0)
+    closes = np.full((length, len(series)), np.nan)
+    last = np.full((len(series), 6), np.nan)
+    for j, bars in enumerate(series):
+        closes[length - len(bars):, j] = bars[:, 4]
+        last[j] = bars[-1]
+    return found, missing, closes, last
+
+
+def latest_values(closes, last):
+    # Indikatoren der letzten Zeile; Ergebnis: Feld -> (N,)-Vektor
+    values = {field: last[:, column] for field, column in BAR_FIELDS.items()}
+    latest = compute_latest(closes)
+    values.update({field: latest[name] for field, name in INDICATOR_FIELDS.items()})
+    return values
+
+
+def apply_filter(values, conditions, n):
+    mask = np.ones(n, dtype=bool)
+    for (left_factor, left_field), op, (right_factor, right_field) in conditions:
+        left = left_factor * (values[left_field] if left_field else 1.0)
+        right = right_factor * (values[right_field] if right_field else 1.0)
+        with np.errstate(invalid='ignore'):
+            mask &= OPERATORS[op](left, right)  # NaN (z. B. MA200 bei zu kurzer Historie) erfüllt nie
+    return mask
+
+
+def screen(source='yahoo', tickers=None, expr=None, sort=None, limit=None):
+    # sort: Feldname, mit "-" davor absteigend (z. B. "-rsi"); tickers=None -> alle gespeicherten Ticker
+    started = time.perf_counter()
+    conditions = parse_filter(expr)
+    descending = bool(sort) and sort.startswith('-')
+    sort = sort.lstrip('-').lower() if sort else None
+    if sort is not None and sort not in FIELDS:
+        raise ValueError(f"Unbekanntes Sortierfeld '{sort}' (erlaubt: {', '.join(FIELDS)})")
+
+    if source not in FETCHERS:
+        raise ValueError(f"Unbekannte Quelle '{source}' (erlaubt: {', '.join(FETCHERS)})")
+    tickers = price_store.tickers(source) if tickers is None \
+        else list(dict.fromkeys(t.strip() for t in tickers if t.strip()))
+    if len(tickers) > SCREENER_MAX_TICKERS:
+        raise ValueError(f"Maximal {SCREENER_MAX_TICKERS} Ticker pro Abfrage")
+
+    found, missing, closes, last = load_panel(source, tickers)
+    values = latest_values(closes, last)
+    hits = np.flatnonzero(apply_filter(values, conditions, len(found)))
+
+    if sort is not None:
+        key = values[sort][hits]
+        # NaN immer ans Ende, unabhängig von der Richtung
+        key = np.where(np.isnan(key), -np.inf if descending else np.inf, key)
+        order = np.argsort(-key if descending else key, kind='stable')
+        hits = hits[order]
+    total = len(hits)
+    if limit:
+        hits = hits[:limit]
+
+    rows = []
+    for j in hits:
+        row = {"ticker": found[j], "datum": (EPOCH + timedelta(days=int(last[j, 0]))).isoformat()}
+        for field in FIELDS:
+            value = values[field][j]
+            row[field] = None if np.isnan(value) else round(float(value), 4)
+        rows.append(row)
+
+    return {
+        "quelle": source,
+        "universum": len(tickers),
+        "mit_daten": len(found),
+        "ohne_daten": missing,
+        "treffer_gesamt": total,
+        "treffer": rows,
+        "filter": expr or "",
+        "dauer_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+# Registry für externe API-Clients. Die Clients (und ihre teils schweren Pakete)
+# werden erst beim ersten Zugriff importiert und erzeugt, danach wiederverwendet.
+# So startet ein Worker schnell, auch wenn er nur einen Teil der Endpunkte bedient.
+
+import os
+import threading
+
+
+class ServiceRegistry:
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory):
+        with self._lock:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Unbekannter Dienst: {name}")
+                self._instances[name] = self._factories[name]()
+            return self._instances[name]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self.get(name)
+        except KeyError:
+            raise AttributeError(name)
+
+    def loaded(self):
+        return sorted(self._instances)
+
+    def reset(self, name=None):
+        # Instanzen verwerfen (z. B. nach geänderten Zugangsdaten oder in Tests)
+        with self._lock:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+
+def _fred():
+    from fredapi import Fred
+    return Fred(api_key=os.environ.get('FRED_API_KEY'))
+
+
+def _reddit():
+    import praw
+    return praw.Reddit(
+        client_id=os.environ.get('REDDIT_CLIENT_ID'),
+        client_secret=os.environ.get('REDDIT_SECRET'),
+        user_agent=os.environ.get('REDDIT_USER_AGENT')
+    )
+
+
+def _coingecko():
+    from pycoingecko import CoinGeckoAPI
+    from http_client import http_client
+    client = CoinGeckoAPI()
+    # Gemeinsamer Verbindungspool mit Retry/Backoff statt der eigenen Session von pycoingecko
+    client.session = http_client.session('coingecko')
+    client.request_timeout = http_client.providers['coingecko']["timeout"]
+    return client
+
+
+def _fundamental_data():
+    from alpha_vantage.fundamentaldata import FundamentalData
+    return FundamentalData(key=os.getenv('API_KEY'), output_format='json')
+
+
+def _timeseries():
+    from alpha_vantage.timeseries import TimeSeries
+    return TimeSeries(key=os.getenv('API_KEY'), output_format='pandas')
+
+
+services = ServiceRegistry()
+services.register('fred', _fred)
+services.register('reddit', _reddit)
+services.register('coingecko', _coingecko)
+services.register('fundamental_data', _fundamental_data)
+services.register('timeseries', _timeseries)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+# Prognose-Engine aus forecasting.py gegen die ursprüngliche Keras-Schleife (model.predict je Prognosetag).
+# Aufruf aus dem Projektverzeichnis: python -m unittest discover tests
+
+import os
+import tempfile
+import unittest
+import importlib.util
+
+TMP_DIR = tempfile.mkdtemp(prefix='finanzcoach-test-')
+os.environ.setdefault('MODEL_REGISTRY_DIR', os.path.join(TMP_DIR, 'models'))
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '-1')
+os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+
+import numpy as np
+
+import forecasting
+
+PREDICTION_DAYS = 12
+DAYS_TO_PREDICT = 8
+
+
+def train_small_model(seed):
+    import tensorflow as tf
+    tf.keras.utils.set_random_seed(seed)
+    series = np.sin(np.arange(150) / (6 + seed)) * 0.4 + 0.5
+    return forecasting.train_lstm_model(series.reshape(-1, 1), PREDICTION_DAYS, epochs=2), series
+
+
+def keras_forecast(model, series):
+    # Referenz: wie früher in predict_stock_price, Fenster nach jedem Tag um die Prognose verschieben
+    window = np.asarray(series[-PREDICTION_DAYS:], dtype=np.float32)
+    predictions = []
+    for _ in range(DAYS_TO_PREDICT):
+        value = model.predict(window.reshape(1, PREDICTION_DAYS, 1), verbose=0)[0, 0]
+        predictions.append(value)
+        window = np.append(window[1:], value)
+    return np.array(predictions)
+
+
+@unittest.skipUnless(importlib.util.find_spec('tensorflow'), "TensorFlow nicht installiert")
+class ForecastBatchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.models = [train_small_model(seed) for seed in (1, 2)]
+
+    def test_matches_keras_predict_loop(self):
+        for model, series in self.models:
+            expected = keras_forecast(model, series)
+            actual = forecasting.forecast(model, series, PREDICTION_DAYS, DAYS_TO_PREDICT)
+            np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-5)
+
+    def test_batch_matches_single_forecasts(self):
+        weights = [forecasting.extract_lstm_weights(model) for model, _ in self.models]
+        windows = [series[-PREDICTION_DAYS:] for _, series in self.models]
+        batch = forecasting.forecast_batch(weights, windows, DAYS_TO_PREDICT)
+        self.assertEqual(batch.shape, (2, DAYS_TO_PREDICT))
+        for row, (model, series) in zip(batch, self.models):
+            np.testing.assert_allclose(row, keras_forecast(model, series), rtol=1e-4, atol=1e-5)
+
+    def test_mismatched_batch_rejected(self):
+        weights = [forecasting.extract_lstm_weights(self.models[0][0])]
+        with self.assertRaises(ValueError):
+            forecasting.forecast_batch(weights, np.zeros((2, PREDICTION_DAYS)), DAYS_TO_PREDICT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# Inkrementelle Indikatoren aus indicators.py gegen die frühere pandas-Berechnung in get_stock_data
+# (rolling(window).mean(), RSI über ewm(com=13, adjust=False)); erwartet bitgleiche Ergebnisse.
+# Aufruf aus dem Projektverzeichnis: python -m unittest discover tests
+
+import os
+import tempfile
+import unittest
+
+TMP_DIR = tempfile.mkdtemp(prefix='finanzcoach-test-')
+os.environ.setdefault('PRICE_STORE_DIR', os.path.join(TMP_DIR, 'prices'))
+
+import numpy as np
+import pandas as pd
+
+import indicators
+
+
+def pandas_indicators(closes):
+    df = pd.DataFrame({'Close': closes})
+    df['MA50'] = df['Close'].rolling(window=50).mean()
+    df['MA100'] = df['Close'].rolling(window=100).mean()
+    df['MA200'] = df['Close'].rolling(window=200).mean()
+
+    delta = df['Close'].diff(1)
+    up = delta.clip(lower=0)
+    down = -1 * delta.clip(upper=0)
+    ema_up = up.ewm(com=13, adjust=False).mean()
+    ema_down = down.ewm(com=13, adjust=False).mean()
+    rs = ema_up / ema_down
+    df['RSI'] = 100 - (100 / (1 + rs))
+    return df
+
+
+class ComputePanelTest(unittest.TestCase):
+
+    def assert_matches_pandas(self, closes):
+        panel = indicators.compute_panel(closes)
+        expected = pandas_indicators(closes)
+        for name in indicators.INDICATOR_COLUMNS:
+            np.testing.assert_array_equal(panel[name][:, 0], expected[name].to_numpy(), err_msg=name)
+
+    def test_random_walk(self):
+        rng = np.random.default_rng(7)
+        self.assert_matches_pandas(100 * np.exp(np.cumsum(rng.normal(0, 0.02, 600))))
+
+    def test_large_values(self):
+        # Kahan-Kompensation muss auch bei großen Beträgen exakt wie pandas rechnen
+        rng = np.random.default_rng(11)
+        self.assert_matches_pandas(1e6 + rng.normal(0, 1e3, 400))
+
+    def test_constant_series(self):
+        # Konstante Fenster: MA exakt der Kurs, RSI 0/0 -> NaN
+        self.assert_matches_pandas(np.full(300, 42.5))
+
+    def test_short_series(self):
+        self.assert_matches_pandas(np.array([10., 11., 10.5]))
+
+    def test_panel_columns_and_late_start(self):
+        # Zweite Reihe beginnt später (führende NaN), jede Spalte muss der Einzelrechnung entsprechen
+        rng = np.random.default_rng(3)
+        a = 50 + np.cumsum(rng.normal(0, 1, 320))
+        b = 20 + np.cumsum(rng.normal(0, 0.5, 320))
+        b[:70] = np.nan
+        panel = indicators.compute_panel(np.column_stack([a, b]))
+        for j, closes in enumerate((a, b)):
+            expected = pandas_indicators(closes)
+            for name in indicators.INDICATOR_COLUMNS:
+                np.testing.assert_array_equal(panel[name][:, j], expected[name].to_numpy(), err_msg=name)
+
+    def test_incremental_state_matches_full_run(self):
+        rng = np.random.default_rng(5)
+        closes = 100 + np.cumsum(rng.normal(0, 1, 450))
+        state = indicators.init_state(1)
+        first = indicators.compute_series(closes[:260], state)
+        state = indicators.state_from_json(indicators.state_to_json(state))
+        second = indicators.compute_series(closes[260:], state)
+        np.testing.assert_array_equal(np.vstack([first, second]), indicators.compute_series(closes))
+
+
+class ComputeHistoryTest(unittest.TestCase):
+
+    def test_matches_pandas(self):
+        rng = np.random.default_rng(13)
+        for closes in (100 * np.exp(np.cumsum(rng.normal(0, 0.02, 600))), np.full(250, 7.25), np.array([3., 4.])):
+            values, _ = indicators.compute_history(closes)
+            expected = pandas_indicators(closes)
+            for k, name in enumerate(indicators.INDICATOR_COLUMNS):
+                np.testing.assert_array_equal(values[:, k], expected[name].to_numpy(), err_msg=name)
+
+    def test_state_continues_incrementally(self):
+        # Angehängte Balken aus dem abgeleiteten Zustand: gleich bis auf Rundung in der letzten Stelle
+        rng = np.random.default_rng(17)
+        closes = 100 + np.cumsum(rng.normal(0, 1, 500))
+        closes[430:433] = np.nan
+        _, state = indicators.compute_history(closes[:420])
+        state = indicators.state_from_json(indicators.state_to_json(state))
+        appended = indicators.compute_series(closes[420:], state)
+        expected = indicators.compute_series(closes)[420:]
+        np.testing.assert_array_equal(np.isnan(appended), np.isnan(expected))
+        np.testing.assert_allclose(appended, expected, rtol=1e-12)
+
+    def test_constant_series_stays_exact(self):
+        closes = np.full(320, 42.5)
+        _, state = indicators.compute_history(closes[:300])
+        np.testing.assert_array_equal(indicators.compute_series(closes[300:], state),
+                                      indicators.compute_series(closes)[300:])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+# Parser und Lexikon aus news_sentiment.py gegen die lokalen HTML/RSS-Fixtures (benchmarks/fixtures/news).
+# Aufruf aus dem Projektverzeichnis: python -m unittest discover tests
+
+import os
+import tempfile
+import unittest
+
+TMP_DIR = tempfile.mkdtemp(prefix='finanzcoach-test-')
+os.environ.setdefault('CACHE_DB_PATH', os.path.join(TMP_DIR, 'cache.sqlite'))
+os.environ.setdefault('REDDIT_DB_PATH', os.path.join(TMP_DIR, 'reddit.sqlite'))
+os.environ.setdefault('LLM_BACKEND', 'fake')
+
+import news_sentiment
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures', 'news')
+
+# Quelle -> Fixture-Datei, Basis-URL wie in SOURCES
+FIXTURES = {
+    "Yahoo Finance": ('yahoo_rss.xml', "https://feeds.finance.yahoo.com/rss/2.0/headline?s=BENCH"),
+    "MarketWatch": ('marketwatch.html', "https://www.marketwatch.com/investing/stock/bench"),
+    "Google News": ('google_news_rss.xml', "https://news.google.com/rss/search?q=Benchmark+AG"),
+    "Reuters": ('reuters.html', "https://www.reuters.com/site-search/?query=Benchmark+AG"),
+    "Finviz": ('finviz.html', "https://finviz.com/quote.ashx?t=BENCH")
+}
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def parse_fixture(source):
+    name, base_url = FIXTURES[source]
+    _, parser = news_sentiment.SOURCES[source]
+    return parser(read_fixture(name), base_url)
+
+
+class ParserTest(unittest.TestCase):
+
+    def test_yahoo_rss(self):
+        headlines = parse_fixture("Yahoo Finance")
+        self.assertEqual(len(headlines), 4)
+        self.assertEqual(headlines[0], ("https://finance.yahoo.com/news/benchmark-beats-estimates-120000.html",
+                                        "Benchmark AG beats quarterly estimates as services revenue hits record"))
+
+    def test_google_news_rss(self):
+        headlines = parse_fixture("Google News")
+        self.assertEqual([title for _, title in headlines], [
+            "Benchmark AG: Aktie steigt nach Rekordquartal - Handelsblatt",
+            "Benchmark AG senkt Prognose für Wearables - FAZ",
+            "Benchmark AG erhöht Dividende und Rückkaufprogramm - Börse Online"
+        ])
+
+    def test_marketwatch_resolves_relative_links(self):
+        headlines = parse_fixture("MarketWatch")
+        self.assertEqual(len(headlines), 3)
+        self.assertEqual(headlines[1][1], "Benchmark supplier warns on weak smartphone demand")
+        self.assertEqual(headlines[2][0],
+                         "https://www.marketwatch.com/story/benchmark-is-not-a-bargain-at-these-levels-11714850000")
+
+    def test_reuters_title_links_and_story_cards(self):
+        headlines = parse_fixture("Reuters")
+        self.assertEqual([title for _, title in headlines], [
+            "Benchmark profit rises on services growth",
+            "Benchmark faces lawsuit over battery claims",
+            "Benchmark sets date for annual meeting"
+        ])
+        self.assertTrue(all(url.startswith("https://www.reuters.com/") for url, _ in headlines))
+
+    def test_finviz_news_table(self):
+        headlines = parse_fixture("Finviz")
+        self.assertEqual(len(headlines), 3)
+        self.assertEqual(headlines[0], ("https://finviz.com/news/101/benchmark-rally-continues",
+                                        "Benchmark rally continues as buyback boosts shares"))
+
+
+class LexiconTest(unittest.TestCase):
+
+    def test_labels_on_fixture_headlines(self):
+        scores = dict((title, news_sentiment.score_headline(title))
+                      for source in FIXTURES for _, title in parse_fixture(source))
+        self.assertEqual(news_sentiment.label(scores["Benchmark shares jump after earnings beat"]), "positiv")
+        self.assertEqual(news_sentiment.label(scores["Benchmark faces lawsuit over battery claims"]), "negativ")
+        self.assertEqual(news_sentiment.label(scores["Benchmark AG senkt Prognose für Wearables - FAZ"]), "negativ")
+        self.assertEqual(news_sentiment.label(scores["Benchmark sets date for annual meeting"]), "neutral")
+
+    def test_negation(self):
+        self.assertLess(news_sentiment.score_headline("Benchmark did not beat estimates"), 0)
+
+    def test_whole_words_only(self):
+        for title in ("Warner Bros shares slip", "Dropbox unveils cute cutting-edge app",
+                      "Team beaten by rivals", "Anleger halten an ihrer Haltung fest"):
+            self.assertEqual(news_sentiment.score_headline(title), 0.0, title)
+
+
+class AnalyseTest(unittest.TestCase):
+
+    def test_analyse_on_fixtures(self):
+        def fetch_source(source, ticker, full_name):
+            return [list(h) for h in parse_fixture(source)]
+
+        result = news_sentiment.analyse("FIXTURE", "Benchmark AG", fetch_source=fetch_source,
+                                        fetch_social=lambda ticker, full_name: [])
+        self.assertEqual(result["Schlagzeilen"], 16)
+        self.assertEqual(result[news_sentiment.SOCIAL_SOURCE], "keine Schlagzeilen")
+        self.assertIn(result["Final"], ("positiv", "negativ", "neutral"))
+        self.assertEqual(result["Final (GPT-Validiert)"], result["Final"])
+
+    def test_stored_reddit_label_wins(self):
+        scored = news_sentiment.score_headlines("FIXTURE", [["reddit:abc", "Benchmark is great", "negativ"]])
+        self.assertEqual(scored, [("Benchmark is great", -1.0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+# Eigener Prozess-Pool für Modelltraining und -laden (TensorFlow), getrennt von den Request-Threads.
+# Jeder Worker-Prozess bekommt ein festes Kern-Budget (TF intra/inter-op Threads, OMP/BLAS),
+# die Warteschlange ist begrenzt: ist sie voll, wird TrainingPoolFull ausgelöst (-> 503 an den Client).
+# Der Request-Prozess erhält nur NumPy-Gewichte und Skalierer zurück und importiert TensorFlow nie.
+# TRAINING_POOL_WORKERS=0 schaltet den Pool ab, dann läuft alles wie bisher im eigenen Prozess.
+
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+TRAINING_POOL_WORKERS = int(os.environ.get('TRAINING_POOL_WORKERS', '1'))
+TRAINING_CORE_BUDGET = int(os.environ.get('TRAINING_CORE_BUDGET', str(max(1, (os.cpu_count() or 2) // 2))))
+TRAINING_MAX_QUEUE = int(os.environ.get('TRAINING_MAX_QUEUE', '8'))
+TRAINING_POLL_INTERVAL = 0.5  # Sekunden zwischen Prüfungen auf Verbindungsabbruch
+
+
+class TrainingPoolFull(Exception):
+    pass
+
+
+class TrainingCancelled(Exception):
+    pass
+
+
+def _init_worker(threads):
+    # Läuft einmal je Worker-Prozess, bevor TensorFlow geladen wird
+    os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
+    os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "TF_NUM_INTRAOP_THREADS"):
+        os.environ[var] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = str(min(2, threads))
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(min(2, threads))
+
+
+def _prepare_job(values, asset_type, ticker, data_through, prediction_days, epochs):
+    # Veraltete Modelle werden hier nicht nachtrainiert, sondern als "stale" gemeldet;
+    # der Request-Prozess reicht den Refit als eigenen Auftrag in den Pool ein (Warteschlange + Kern-Budget)
+    from forecasting import prepare_forecast
+    stale = []
+    prepared = prepare_forecast(values, asset_type, ticker, data_through, prediction_days, epochs,
+                                on_stale=lambda: stale.append(True))
+    prepared["stale"] = bool(stale)
+    return prepared
+
+
+def _refresh_job(values, asset_type, ticker, data_through, prediction_days, epochs):
+    from forecasting import refresh_model
+    return refresh_model(values, asset_type, ticker, data_through, prediction_days, epochs)
+
+
+class TrainingPool:
+
+    def __init__(self, workers=TRAINING_POOL_WORKERS, core_budget=TRAINING_CORE_BUDGET, max_queue=TRAINING_MAX_QUEUE):
+        self.workers = workers
+        self.threads_per_worker = max(1, core_budget // max(workers, 1))
+        self.max_queue = max_queue
+        self._executor = None
+        self._pending = 0
+        self._stats = {"submitted": 0, "rejected": 0, "cancelled": 0, "failed": 0, "completed": 0}
+        self._refits = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def _get_executor(self):
+        # Erst beim ersten Auftrag starten; "spawn", damit kein geforkter Flask-/Thread-Zustand mitkommt
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'),
+                                                 initializer=_init_worker, initargs=(self.threads_per_worker,))
+        return self._executor
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                self._stats["cancelled"] += 1
+            elif future.exception() is not None:
+                self._stats["failed"] += 1
+            else:
+                self._stats["completed"] += 1
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise TrainingPoolFull(f"Trainings-Warteschlange voll ({self._pending} Aufträge)")
+            try:
+                future = self._get_executor().submit(fn, *args)
+            except BrokenProcessPool:
+                # Abgestürzter Worker (z. B. Speicher): Pool neu aufbauen
+                logging.error("Trainings-Pool defekt, starte neu")
+                self._executor = None
+                future = self._get_executor().submit(fn, *args)
+            self._pending += 1
+            self._stats["submitted"] += 1
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, fn, *args, cancelled=None):
+        # Wartet auf das Ergebnis; wird cancelled gesetzt (Client weg), wird ein noch wartender Auftrag verworfen.
+        # Ein bereits laufendes Training wird zu Ende gerechnet und landet trotzdem in der Modell-Registry.
+        future = self.submit(fn, *args)
+        while True:
+            try:
+                return future.result(timeout=TRAINING_POLL_INTERVAL)
+            except FuturesTimeout:
+                if cancelled is not None and cancelled.is_set():
+                    future.cancel()
+                    raise TrainingCancelled("Client hat die Verbindung getrennt")
+            except BrokenProcessPool:
+                with self._lock:
+                    self._executor = None
+                raise
+
+    def refit(self, values, asset_type, ticker, data_through, prediction_days=60, epochs=50):
+        # Nachtrainieren ohne zu warten; je Schlüssel höchstens ein Auftrag, volle Warteschlange -> auslassen
+        key = (str(asset_type).lower(), str(ticker).upper(), int(prediction_days), str(data_through))
+        with self._lock:
+            if key in self._refits:
+                return False
+            self._refits.add(key)
+        try:
+            future = self.submit(_refresh_job, values, asset_type, ticker, data_through, prediction_days, epochs)
+        except TrainingPoolFull as e:
+            logging.error(f"Refit {ticker} ausgelassen: {str(e)}")
+            with self._lock:
+                self._refits.discard(key)
+            return False
+
+        def _finished(future):
+            with self._lock:
+                self._refits.discard(key)
+            if not future.cancelled() and future.exception() is not None:
+                logging.error(f"Fehler beim Hintergrund-Refit {ticker}: {str(future.exception())}")
+
+        future.add_done_callback(_finished)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "workers": self.workers,
+                "threads_per_worker": self.threads_per_worker,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                **self._stats
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+training_pool = TrainingPool()
+
+
+def prepare(values, asset_type=None, ticker=None, data_through=None, prediction_days=60, epochs=50, cancelled=None):
+    # Modell laden/trainieren (im Pool) und Prognose vorbereiten; Ergebnis für forecasting.forecast_prepared
+    if not training_pool.enabled:
+        from forecasting import prepare_forecast
+        return prepare_forecast(values, asset_type, ticker, data_through, prediction_days, epochs)
+    prepared = training_pool.run(_prepare_job, values, asset_type, ticker, data_through, prediction_days, epochs,
+                                 cancelled=cancelled)
+    if prepared.pop("stale", False):
+        training_pool.refit(values, asset_type, ticker, data_through, prediction_days, epochs)
+    return prepared
+
+
+def refresh(values, asset_type, ticker, data_through, prediction_days=60, epochs=50, cancelled=None):
+    if not training_pool.enabled:
+        return _refresh_job(values, asset_type, ticker, data_through, prediction_days, epochs)
+    return training_pool.run(_refresh_job, values, asset_type, ticker, data_through, prediction_days, epochs,
+                             cancelled=cancelled)